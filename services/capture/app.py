@@ -1,17 +1,13 @@
+import asyncio
 import os
 import time
 import threading
 from collections import deque
-from typing import Optional, Deque, Tuple
+from typing import Any, Deque, Dict, Optional, Tuple
 
 import uvicorn
 import requests
 import cv2
-from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.requests import RequestsInstrumentor
 import uuid
@@ -21,6 +17,9 @@ from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTEN
 from fastapi.responses import Response
 
 from camera import CameraConfig, read_frames
+from common.stream import StreamClient
+from common.profiler import install_profiler
+from common.tracing import Tracing
 
 
 app = FastAPI(title="EdgeSight QA - Capture")
@@ -33,16 +32,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# OpenTelemetry minimal bootstrap
+otel_spans = Counter("otel_spans_total", "Finished spans by sampling outcome (sampled, kept, dropped, queue_full)", ["decision"])
+otel_export_spans = Counter("otel_export_spans_total", "Spans sent to the OTLP exporter", ["result"])
+otel_export_ms = Histogram("otel_export_ms", "OTLP span export batch latency (ms)", buckets=(1,5,10,25,50,100,250,500,1000,5000))
+otel_export_queue = Gauge("otel_export_queue_depth", "Spans waiting in the batch span processor for export")
+
+
+def _on_otel_export(n: int, ok: bool, ms: float) -> None:
+    otel_export_spans.labels("ok" if ok else "failed").inc(n)
+    otel_export_ms.observe(ms)
+
+
+# OpenTelemetry bootstrap: parent-based ratio sampling, keeping defect/error/slow traces (common/tracing.py)
+tracing = Tracing(on_span=lambda decision, n: otel_spans.labels(decision).inc(n), on_export=_on_otel_export)
+otel_export_queue.set_function(tracing.queue_depth)
+
+
 def _init_tracing():
     if os.getenv("OTEL_ENABLED", "1").lower() in ("1", "true", "yes"):
-        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://otel-collector:4317")
-        insecure = os.getenv("OTEL_EXPORTER_OTLP_INSECURE", "1").lower() in ("1", "true", "yes")
-        resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "capture")})
-        provider = TracerProvider(resource=resource)
-        exporter = OTLPSpanExporter(endpoint=endpoint, insecure=insecure)
-        provider.add_span_processor(BatchSpanProcessor(exporter))
-        trace.set_tracer_provider(provider)
+        tracing.install(os.getenv("OTEL_SERVICE_NAME", "capture"))
         FastAPIInstrumentor().instrument_app(app)
         RequestsInstrumentor().instrument()
 
@@ -55,12 +63,37 @@ latency_est_ms = Histogram("capture_latency_est_ms", "Estimated capture-to-send
 running_gauge = Gauge("capture_running", "1 if capture loop is running, else 0")
 fps_gauge = Gauge("capture_fps", "Approximate frames per second captured")
 send_failures = Counter("capture_send_failures_total", "Failed HTTP sends to preprocess")
+stream_inflight = Gauge("capture_stream_inflight", "Frames sent over the preprocess stream awaiting a reply")
 
 
 _capture_thread: Optional[threading.Thread] = None
 _stop_flag = threading.Event()
 _ready = False
 _buffer: Deque[Tuple[int, int, bytes]] = deque(maxlen=int(os.getenv("BUFFER_MAX", "50")))
+# frame ids restart with the process; downstream keys frames by camera, session and frame id
+SESSION_ID = uuid.uuid4().hex[:12]
+
+# Optional long-lived stream to preprocess (ws://preprocess:9002/frame/stream). Frames are
+# pipelined: the capture thread only blocks while the stream is out of credits.
+_stream: Optional[StreamClient] = None
+_stream_loop: Optional[asyncio.AbstractEventLoop] = None
+if os.getenv("PREPROCESS_STREAM_URL"):
+    _stream = StreamClient(os.environ["PREPROCESS_STREAM_URL"])
+    _stream_loop = asyncio.new_event_loop()
+    threading.Thread(target=_stream_loop.run_forever, name="capture-stream", daemon=True).start()
+    stream_inflight.set_function(lambda: _stream.inflight)
+
+
+def _on_stream_reply(fut: "asyncio.Future") -> None:
+    if fut.cancelled() or fut.exception() is not None:
+        send_failures.inc()
+    else:
+        frames_sent.inc()
+
+
+async def _stream_send(header, payload: bytes) -> None:
+    reply = await _stream.send(header, payload, timeout=1.5)
+    reply.add_done_callback(_on_stream_reply)
 
 
 @app.get("/healthz")
@@ -73,6 +106,10 @@ def readyz():
     return ({"status": "ready"} if _ready else Response(status_code=503))
 
 
+# /debug/profile and the event_loop_lag_ms histogram (common/profiler.py)
+install_profiler(app)
+
+
 @app.get("/metrics")
 def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -92,6 +129,10 @@ def _capture_loop():
         )
         print(f"[capture] source={cfg.source} fps_cap={cfg.fps_cap} size={cfg.width}x{cfg.height}", flush=True)
         preprocess_url = os.getenv("PREPROCESS_URL", "http://preprocess:9002/frame")
+        # e.g. "line-1/cam-A/bracket"; selects the model in the inference registry
+        model_key = os.getenv("MODEL_KEY", "")
+        camera_id = os.getenv("CAMERA_ID", "")
+        session = SESSION_ID
         backoff = 0.2
         frame_counter = 0
         window_start = time.time()
@@ -156,7 +197,9 @@ def _capture_loop():
             # send preview opportunistically
             try:
                 preview_url = os.getenv("PREVIEW_URL", "http://results_adapter:9004/frame_preview")
-                corr_header = {"X-Correlation-ID": f"f{frame_id}"}
+                corr_header = {"X-Correlation-ID": f"f{frame_id}", "X-Frame-ID": str(frame_id), "X-Capture-Session": session}
+                if camera_id:
+                    corr_header["X-Camera-ID"] = camera_id
                 try:
                     from opentelemetry import trace as _trace
                     span = _trace.get_current_span()
@@ -175,16 +218,25 @@ def _capture_loop():
                 t0 = time.perf_counter()
                 try:
                     corr_id = str(uuid.uuid4())
-                    resp = requests.post(
-                        preprocess_url,
-                        data={"frame_id": str(fid), "ts_monotonic_ns": str(ts), "corr_id": corr_id},
-                        files={"image": (f"{fid}.jpg", payload, "image/jpeg")},
-                        headers={"X-Correlation-ID": corr_id},
-                        timeout=1.5,
-                    )
-                    if resp.status_code >= 400:
-                        raise RuntimeError(f"bad status {resp.status_code}")
-                    frames_sent.inc()
+                    form = {"frame_id": str(fid), "ts_monotonic_ns": str(ts), "corr_id": corr_id, "session": session}
+                    if model_key:
+                        form["model_key"] = model_key
+                    if camera_id:
+                        form["camera_id"] = camera_id  # preprocess shards inference replicas by camera
+                    if _stream is not None:
+                        # counted as sent or failed when the reply arrives
+                        asyncio.run_coroutine_threadsafe(_stream_send(form, payload), _stream_loop).result(timeout=2.0)
+                    else:
+                        resp = requests.post(
+                            preprocess_url,
+                            data=form,
+                            files={"image": (f"{fid}.jpg", payload, "image/jpeg")},
+                            headers={"X-Correlation-ID": corr_id},
+                            timeout=1.5,
+                        )
+                        if resp.status_code >= 400:
+                            raise RuntimeError(f"bad status {resp.status_code}")
+                        frames_sent.inc()
                     latency_est_ms.observe((time.perf_counter() - t0) * 1000.0)
                     _buffer.popleft()
                     backoff = 0.2
@@ -223,6 +275,16 @@ def stop():
     return {"status": "stopping"}
 
 
+@app.get("/config")
+def get_config():
+    return tracing.settings.to_dict()
+
+
+@app.patch("/config")
+def patch_config(cfg: Dict[str, Any]):
+    return {"updated": tracing.settings.update(cfg)}
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "9001")))
 
@@ -25,7 +25,9 @@ def open_capture(source: str) -> cv2.VideoCapture:
 
 def read_frames(cfg: CameraConfig) -> Iterator[Tuple[int, int, 'cv2.Mat']]:
     if cfg.source == "synthetic":
-        return _read_synthetic(cfg)
+        # read_frames is itself a generator, so the synthetic one has to be delegated to
+        yield from _read_synthetic(cfg)
+        return
     cap = open_capture(cfg.source)
     if not cap.isOpened():
         raise RuntimeError(f"Failed to open camera source: {cfg.source}")
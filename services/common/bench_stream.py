@@ -0,0 +1,138 @@
+"""Per-request HTTP vs the long-lived frame stream for one pipeline hop.
+
+Starts a local server with an ``/infer``-shaped multipart endpoint and the
+same handler behind ``common.stream.serve``, then pushes frames through both
+from one client: HTTP one request at a time with a new client per frame (what
+preprocess does today) and with a kept-alive client, and the stream with
+``--credits`` frames in flight. ``--work-ms`` is the handler's (blocking)
+service time.
+
+    python -m services.common.bench_stream --frames 300 --payload-kb 2700 --work-ms 5 --credits 4
+"""
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, File, Form, UploadFile, WebSocket
+
+from services.common.stream import StreamClient, serve
+
+
+def _app(work_s: float) -> FastAPI:
+    app = FastAPI()
+
+    def _work(frame_id: str, data: bytes) -> dict:
+        time.sleep(work_s)
+        return {"frame_id": frame_id, "n": len(data), "detections": []}
+
+    @app.post("/infer")
+    def infer(frame_id: str = Form(...), tensor: UploadFile = File(...)):
+        return _work(frame_id, tensor.file.read())
+
+    @app.websocket("/infer/stream")
+    async def infer_stream(websocket: WebSocket):
+        await serve(websocket, lambda h, p: _work(str(h["frame_id"]), p), credits=64)
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _summary(lat_ms, wall_s) -> dict:
+    lat = sorted(lat_ms)
+    return {
+        "fps": round(len(lat) / wall_s, 1),
+        "p50_ms": round(statistics.median(lat), 2),
+        "p99_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.99))], 2),
+    }
+
+
+async def bench_http(url: str, frames: int, payload: bytes, keepalive: bool) -> dict:
+    lat = []
+    shared = httpx.AsyncClient() if keepalive else None
+    t_start = time.perf_counter()
+    for i in range(frames):
+        t0 = time.perf_counter()
+        client = shared or httpx.AsyncClient()
+        try:
+            r = await client.post(url, data={"frame_id": str(i)}, files={"tensor": ("t.npy", payload, "application/octet-stream")}, timeout=10)
+            r.raise_for_status()
+        finally:
+            if shared is None:
+                await client.aclose()
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    wall = time.perf_counter() - t_start
+    if shared is not None:
+        await shared.aclose()
+    return _summary(lat, wall)
+
+
+async def bench_stream(url: str, frames: int, payload: bytes, credits: int) -> dict:
+    client = StreamClient(url)
+    lat = []
+    sem = asyncio.Semaphore(credits)  # client-side window; the server grants more than this
+    t_start = time.perf_counter()
+
+    async def _one(i: int) -> None:
+        t0 = time.perf_counter()
+        try:
+            fut = await client.send({"frame_id": i}, payload)
+            await fut
+        finally:
+            sem.release()
+        lat.append((time.perf_counter() - t0) * 1000.0)
+
+    tasks = []
+    for i in range(frames):
+        await sem.acquire()
+        tasks.append(asyncio.create_task(_one(i)))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - t_start
+    await client.close()
+    return _summary(lat, wall)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--payload-kb", type=int, default=2700, help="3x360x640 float32 tensor is ~2700 KB, a JPEG ~40 KB")
+    ap.add_argument("--work-ms", type=float, default=5.0)
+    ap.add_argument("--credits", type=int, default=4)
+    args = ap.parse_args()
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(_app(args.work_ms / 1000.0), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    payload = bytes(args.payload_kb * 1024)
+    http_url = f"http://127.0.0.1:{port}/infer"
+    ws_url = f"ws://127.0.0.1:{port}/infer/stream"
+
+    async def _run():
+        await bench_http(http_url, 5, payload, True)  # warm up
+        return {
+            "http_per_request": await bench_http(http_url, args.frames, payload, False),
+            "http_keepalive": await bench_http(http_url, args.frames, payload, True),
+            "stream_credits_1": await bench_stream(ws_url, args.frames, payload, 1),
+            f"stream_credits_{args.credits}": await bench_stream(ws_url, args.frames, payload, args.credits),
+        }
+
+    out = asyncio.run(_run())
+    server.should_exit = True
+    print(json.dumps({"frames": args.frames, "payload_kb": args.payload_kb, "work_ms": args.work_ms, **out}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""JSON to/from bytes through orjson when it is installed, the stdlib otherwise."""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib gives the same documents, just slower
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+        except TypeError:
+            pass  # e.g. non-str keys or ints past 64 bits; the stdlib copes
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
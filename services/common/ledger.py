@@ -0,0 +1,167 @@
+"""Governance decision-log record format, shared by the results adapter and the exporter.
+
+Two line types live in a ``decision.log.jsonl``:
+
+* per-record signature: ``{"record": {...}, "sig": hex}``; the signature covers
+  ``canonical(record)``.
+* batch signature: a header ``{"batch": {"seq", "count", "prev", "root", "sig"}}``
+  followed by ``count`` lines ``{"record": {...}, "seq": n, "proof": [...]}``. The
+  header signs the Merkle root of the batch's record hashes, chained to the
+  previous batch root; each proof lets one record be verified on its own.
+
+Version 2 record lines carry ``"v": 2`` and put ``"record"`` last, holding the
+exact compact bytes that were signed (``canonical_v2``). ``parse_line`` keeps
+those bytes, so verification never depends on re-encoding the record the same
+way (orjson and the stdlib differ on some floats). Lines without ``v`` are
+version 1 and verify against ``canonical``.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    from common.jsonenc import dumps, loads
+except ImportError:  # imported from the repo root (tests)
+    from services.common.jsonenc import dumps, loads
+
+ZERO_ROOT = "00" * 32
+RECORD_KEY = b'"record":'
+
+
+def canonical(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, sort_keys=True).encode()
+
+
+def canonical_v2(record: Dict[str, Any]) -> bytes:
+    return dumps(record, sort_keys=True)
+
+
+def signed_line(body: bytes, sig: str) -> bytes:
+    """A v2 per-record line around already-encoded record bytes."""
+    return b'{"v":2,"sig":"' + sig.encode() + b'",' + RECORD_KEY + body + b"}"
+
+
+def parse_line(line: Union[bytes, str]) -> Dict[str, Any]:
+    """``json.loads`` for log lines that also keeps a v2 record's signed bytes."""
+    raw = line.encode() if isinstance(line, str) else line
+    wrapped = loads(raw)
+    if isinstance(wrapped, dict) and wrapped.get("v") == 2:
+        raw = raw.rstrip(b"\r\n")
+        i = raw.find(RECORD_KEY)
+        if i >= 0 and raw.endswith(b"}"):
+            wrapped["_signed"] = raw[i + len(RECORD_KEY):-1]
+    return wrapped
+
+
+def signed_bytes(wrapped: Dict[str, Any]) -> bytes:
+    if wrapped.get("v") == 2:
+        return wrapped.get("_signed") or canonical_v2(wrapped["record"])
+    return canonical(wrapped["record"])
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_tree(leaves: List[bytes]) -> Tuple[bytes, List[List[str]]]:
+    """Root plus one proof per leaf; proof entries are "L<hex>"/"R<hex>" sibling hashes.
+
+    An odd node at the end of a level is carried up unchanged.
+    """
+    if not leaves:
+        return hashlib.sha256(b"").digest(), []
+    proofs: List[List[str]] = [[] for _ in leaves]
+    # positions[i] = index of leaf i's ancestor in the current level
+    positions = list(range(len(leaves)))
+    level = list(leaves)
+    while len(level) > 1:
+        nxt = []
+        for j in range(0, len(level), 2):
+            nxt.append(_node(level[j], level[j + 1]) if j + 1 < len(level) else level[j])
+        for i, pos in enumerate(positions):
+            sib = pos ^ 1
+            if sib < len(level):
+                proofs[i].append(("L" if sib < pos else "R") + level[sib].hex())
+            positions[i] = pos // 2
+        level = nxt
+    return level[0], proofs
+
+
+def root_from_proof(leaf: bytes, proof: List[str]) -> bytes:
+    h = leaf
+    for step in proof:
+        sib = bytes.fromhex(step[1:])
+        h = _node(sib, h) if step[0] == "L" else _node(h, sib)
+    return h
+
+
+def batch_message(header: Dict[str, Any]) -> bytes:
+    return canonical({k: header[k] for k in ("seq", "count", "prev", "root")})
+
+
+def encode_batch(bodies: List[bytes], seq: int, prev: str, signing_key) -> Tuple[List[bytes], str]:
+    """v2 log lines (header first) for a batch-signed group of encoded records, and the new chain head."""
+    root, proofs = merkle_tree([leaf_hash(b) for b in bodies])
+    header = {"seq": seq, "count": len(bodies), "prev": prev, "root": root.hex()}
+    header["sig"] = signing_key.sign(batch_message(header)).signature.hex()
+    lines = [json.dumps({"batch": header}).encode()]
+    for body, proof in zip(bodies, proofs):
+        lines.append(b'{"v":2,"seq":%d,"proof":' % seq + dumps(proof) + b"," + RECORD_KEY + body + b"}")
+    return lines, header["root"]
+
+
+def verify_header(verify_key, header: Dict[str, Any]) -> bool:
+    try:
+        verify_key.verify(batch_message(header), bytes.fromhex(header["sig"]))
+        return True
+    except Exception:
+        return False
+
+
+def verify_wrapped(verify_key, wrapped: Dict[str, Any], header: Optional[Dict[str, Any]] = None, header_ok: Optional[bool] = None) -> bool:
+    """Verify one record line; batch-signed records need their batch header."""
+    try:
+        data = signed_bytes(wrapped)
+        if "sig" in wrapped:
+            verify_key.verify(data, bytes.fromhex(wrapped["sig"]))
+            return True
+        if header is None or header.get("seq") != wrapped.get("seq"):
+            return False
+        if header_ok is None:
+            header_ok = verify_header(verify_key, header)
+        return bool(header_ok) and root_from_proof(leaf_hash(data), wrapped["proof"]).hex() == header["root"]
+    except Exception:
+        return False
+
+
+class LedgerVerifier:
+    """Streaming verifier over log lines in file order.
+
+    ``feed`` returns None for batch headers and True/False for records. Chain
+    breaks (a header whose ``prev`` is not the previous root) are counted in
+    ``chain_breaks``. Only the first header fed may start a chain: a
+    ``ZERO_ROOT`` after that means the chain was restarted mid-file.
+    """
+
+    def __init__(self, verify_key):
+        self.verify_key = verify_key
+        self.header: Optional[Dict[str, Any]] = None
+        self.header_ok = False
+        self.last_root: Optional[str] = None
+        self.chain_breaks = 0
+
+    def feed(self, wrapped: Dict[str, Any]) -> Optional[bool]:
+        if "batch" in wrapped:
+            header = wrapped["batch"]
+            self.header = header
+            self.header_ok = verify_header(self.verify_key, header)
+            prev = header.get("prev")
+            if self.last_root is not None and prev != self.last_root:
+                self.chain_breaks += 1
+            self.last_root = header.get("root")
+            return None
+        return verify_wrapped(self.verify_key, wrapped, self.header, self.header_ok)
@@ -0,0 +1,222 @@
+"""On-demand wall-clock sampling profiler and event-loop lag monitor.
+
+``SamplingProfiler.run(seconds, hz)`` samples every thread's Python stack from
+a helper thread using ``sys._current_frames()``. It catches the asyncio loop,
+executor threads, the capture thread and paho/asyncua threads alike, and it
+needs no tracing hooks. Cost grows with the sample rate and stack depth, not
+with the request rate. Only one profile runs at a time, and the length and
+rate are capped, so it is safe to run briefly on a loaded line. Output is
+collapsed stacks (``thread;outer;...;leaf count``), the input format for
+flamegraph.pl, speedscope and Grafana's flame graph panel.
+
+``EventLoopLagMonitor`` sleeps for a fixed interval on the loop and reports
+how late it woke up. A lag of tens of milliseconds means something is
+blocking the loop.
+
+``install_profiler(app)`` wires both into a service: ``GET /debug/profile``
+(off with ``PROFILE_ENABLED=false``) and the ``event_loop_lag_ms`` histogram.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAX_DEPTH = 128
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+class Profile:
+    def __init__(self, stacks: Counter, samples: int, duration_s: float, hz: float, sampler_cpu_s: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration_s = duration_s
+        self.hz = hz
+        self.sampler_cpu_s = sampler_cpu_s
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def top(self, n: int = 20) -> List[Dict[str, Any]]:
+        """Leaf frames by sample count (where threads actually were), across threads."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"frame": f, "samples": c} for f, c in leaves.most_common(n)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "duration_s": round(self.duration_s, 3),
+            "hz": self.hz,
+            "sampler_cpu_s": round(self.sampler_cpu_s, 4),
+            "top": self.top(),
+            "stacks": dict(self.stacks.most_common()),
+        }
+
+
+class SamplingProfiler:
+    def __init__(self, max_seconds: float = 60.0, max_hz: float = 250.0):
+        self.max_seconds = max_seconds
+        self.max_hz = max_hz
+        self._busy = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+
+    @classmethod
+    def from_env(cls) -> "SamplingProfiler":
+        return cls(
+            max_seconds=float(os.getenv("PROFILE_MAX_S", "60")),
+            max_hz=float(os.getenv("PROFILE_MAX_HZ", "250")),
+        )
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{os.path.basename(code.co_filename)}:{name}".replace(";", ":").replace(" ", "_")
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame) -> str:
+        out = []
+        while frame is not None and len(out) < MAX_DEPTH:
+            out.append(self._label(frame.f_code))
+            frame = frame.f_back
+        out.reverse()
+        return ";".join(out)
+
+    def run(self, seconds: float, hz: float = 100.0, thread: Optional[str] = None) -> Profile:
+        """Block for ``seconds`` sampling all threads (optionally those whose name contains ``thread``)."""
+        seconds = min(max(0.1, seconds), self.max_seconds)
+        hz = min(max(1.0, hz), self.max_hz)
+        if not self._busy.acquire(blocking=False):
+            raise ProfilerBusy("a profile is already running")
+        try:
+            me = threading.get_ident()
+            stacks: Counter = Counter()
+            samples = 0
+            interval = 1.0 / hz
+            cpu0 = time.thread_time()
+            t0 = time.perf_counter()
+            deadline = t0 + seconds
+            next_tick = t0
+            while True:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                frames = sys._current_frames()
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    name = names.get(ident, f"thread-{ident}")
+                    if thread and thread not in name:
+                        continue
+                    stacks[name.replace(";", ":").replace(" ", "_") + ";" + self._stack(frame)] += 1
+                frames = frame = None  # don't keep other threads' frames alive between ticks
+                samples += 1
+                next_tick += interval
+                now = time.perf_counter()
+                if next_tick >= deadline:
+                    break
+                if next_tick > now:
+                    time.sleep(next_tick - now)
+                else:
+                    next_tick = now  # fell behind: skip ticks rather than burst
+            return Profile(stacks, samples, time.perf_counter() - t0, hz, time.thread_time() - cpu0)
+        finally:
+            self._labels.clear()
+            self._busy.release()
+
+    async def profile(self, seconds: float, hz: float = 100.0, thread: Optional[str] = None) -> Profile:
+        """``run`` on a thread of its own, so a saturated executor cannot delay or starve it."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def _target() -> None:
+            try:
+                result = self.run(seconds, hz, thread)
+            except BaseException as e:
+                loop.call_soon_threadsafe(lambda exc=e: fut.done() or fut.set_exception(exc))
+            else:
+                loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(result))
+
+        threading.Thread(target=_target, name="profiler", daemon=True).start()
+        return await fut
+
+
+class EventLoopLagMonitor:
+    """Reports ``on_lag(ms)`` every ``interval_s``: how much later than asked the loop woke up."""
+
+    def __init__(self, on_lag: Callable[[float], None], interval_s: float = 0.25):
+        self.on_lag = on_lag
+        self.interval_s = interval_s
+        self.max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval_s)
+            lag_ms = max(0.0, (loop.time() - t0 - self.interval_s) * 1000.0)
+            self.max_ms = max(self.max_ms, lag_ms)
+            try:
+                self.on_lag(lag_ms)
+            except Exception:
+                pass
+
+    def start(self) -> None:
+        if self._task is None and self.interval_s > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+_loop_lag_ms = None
+
+
+def _loop_lag_histogram():
+    # one per process: the edge monolith serves several stages from one registry
+    global _loop_lag_ms
+    if _loop_lag_ms is None:
+        from prometheus_client import Histogram
+        _loop_lag_ms = Histogram("event_loop_lag_ms", "How late the event loop woke from a fixed sleep (ms)", buckets=(1,2,5,10,20,50,100,250,500,1000))
+    return _loop_lag_ms
+
+
+def install_profiler(app) -> Tuple[Any, Callable[[], None]]:
+    """Add ``/debug/profile`` and start the loop-lag monitor on ``app``'s startup.
+
+    Returns the router and the startup hook, already registered on ``app``.
+    """
+    from fastapi import APIRouter
+    from fastapi.responses import JSONResponse, Response
+
+    enabled = os.getenv("PROFILE_ENABLED", "true").lower() in ("1", "true", "yes")
+    profiler = SamplingProfiler.from_env()
+    loop_lag = EventLoopLagMonitor(_loop_lag_histogram().observe, interval_s=float(os.getenv("LOOP_LAG_INTERVAL_S", "0.25")))
+    router = APIRouter()
+
+    @router.get("/debug/profile")
+    async def debug_profile(seconds: float = 5.0, hz: float = 100.0, thread: Optional[str] = None, format: str = "collapsed"):
+        """Sample every thread's stack for ``seconds``; collapsed stacks for flamegraph.pl/speedscope, or ``format=json``."""
+        if not enabled:
+            return Response(status_code=404)
+        try:
+            prof = await profiler.profile(seconds, hz, thread)
+        except ProfilerBusy as e:
+            return JSONResponse({"error": str(e)}, status_code=409)
+        if format == "json":
+            return prof.to_dict()
+        return Response(prof.collapsed(), media_type="text/plain")
+
+    app.include_router(router)
+    app.add_event_handler("startup", loop_lag.start)
+    app.add_event_handler("shutdown", loop_lag.stop)
+    return router, loop_lag.start
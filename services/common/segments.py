@@ -0,0 +1,213 @@
+"""Decision-log segment files in a governance day directory.
+
+``decision.log.jsonl`` is the active segment. When it reaches the size limit it
+is renamed to ``decision.<NNNNNN>.jsonl`` and later compressed into
+``decision.<NNNNNN>.jsonl.zb``:
+
+    b"ESZB1\n" | zlib block | zlib block | ... | index JSON | u64 index length | b"ESZBEND1"
+
+Every block holds whole lines and starts at a line that can be verified on its
+own (a batch header or a self-signed record), so readers can seek to any block
+through the index and verification can be split along block boundaries.
+Offsets used by readers are always offsets into the uncompressed text.
+"""
+import json
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ACTIVE = "decision.log.jsonl"
+MAGIC = b"ESZB1\n"
+FOOTER = b"ESZBEND1"
+_SEGMENT_RE = re.compile(r"^decision\.(\d{6})\.jsonl(\.zb)?$")
+
+
+def segment_id(path: Path) -> Optional[str]:
+    m = _SEGMENT_RE.match(path.name)
+    return m.group(1) if m else None
+
+
+def list_segments(day_dir: Path) -> List[Path]:
+    """Closed segments in order (compressed copy preferred), then the active one."""
+    closed: Dict[str, Path] = {}
+    for p in day_dir.glob("decision.*.jsonl*"):
+        sid = segment_id(p)
+        if sid is None:
+            continue
+        if sid not in closed or p.suffix == ".zb":
+            closed[sid] = p
+    out = [closed[k] for k in sorted(closed)]
+    active = day_dir / ACTIVE
+    if active.exists():
+        out.append(active)
+    return out
+
+
+def next_segment_path(day_dir: Path) -> Path:
+    ids = [int(s) for s in (segment_id(p) for p in day_dir.glob("decision.*.jsonl*")) if s]
+    return day_dir / f"decision.{(max(ids) + 1 if ids else 1):06d}.jsonl"
+
+
+def is_chunk_start(line: bytes) -> bool:
+    # A chunk may start at a batch header or a self-signed record, never inside a batch
+    try:
+        d = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(d, dict) and ("batch" in d or "sig" in d)
+
+
+def read_index(path: Path) -> Dict[str, Any]:
+    with path.open("rb") as f:
+        f.seek(-(8 + len(FOOTER)), os.SEEK_END)
+        tail = f.read()
+        if tail[8:] != FOOTER:
+            raise ValueError(f"{path}: not a compressed segment")
+        (n,) = struct.unpack("<Q", tail[:8])
+        f.seek(-(8 + len(FOOTER) + n), os.SEEK_END)
+        return json.loads(f.read(n))
+
+
+def segment_size(path: Path) -> int:
+    """Uncompressed size of a segment."""
+    if path.suffix == ".zb":
+        return int(read_index(path)["raw_size"])
+    return path.stat().st_size
+
+
+def iter_lines(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """(offset, line) for every line that starts in [start, end)."""
+    if path.suffix != ".zb":
+        with path.open("rb") as f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                if end is not None and pos >= end:
+                    break
+                yield pos, line
+                pos += len(line)
+        return
+    blocks = read_index(path)["blocks"]
+    with path.open("rb") as f:
+        for raw_off, comp_off, comp_len, raw_len in blocks:
+            if raw_off + raw_len <= start:
+                continue
+            if end is not None and raw_off >= end:
+                break
+            f.seek(comp_off)
+            data = zlib.decompress(f.read(comp_len))
+            pos = raw_off
+            for line in data.splitlines(keepends=True):
+                if pos >= start and (end is None or pos < end):
+                    yield pos, line
+                pos += len(line)
+
+
+def iter_lines_reversed(path: Path, window: int = 1 << 16) -> Iterator[bytes]:
+    """Lines from the end of a segment backwards, without reading the whole file."""
+    if path.suffix == ".zb":
+        blocks = read_index(path)["blocks"]
+        with path.open("rb") as f:
+            for _, comp_off, comp_len, _ in reversed(blocks):
+                f.seek(comp_off)
+                for line in reversed(zlib.decompress(f.read(comp_len)).splitlines()):
+                    if line:
+                        yield line
+        return
+    with path.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        carry = b""
+        while pos > 0:
+            n = min(window, pos)
+            pos -= n
+            f.seek(pos)
+            lines = (f.read(n) + carry).split(b"\n")
+            carry = lines[0]  # may continue in the previous window
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line
+        if carry:
+            yield carry
+
+
+def plan_chunks(path: Path, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Byte ranges of about ``chunk_bytes`` that each start at a verifiable line."""
+    if path.suffix == ".zb":
+        index = read_index(path)
+        bounds = [0]
+        for raw_off, _, _, _ in index["blocks"][1:]:
+            if raw_off - bounds[-1] >= chunk_bytes:
+                bounds.append(raw_off)
+        bounds.append(int(index["raw_size"]))
+        return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    size = path.stat().st_size
+    bounds = [0]
+    with path.open("rb") as f:
+        target = chunk_bytes
+        while target < size:
+            f.seek(target)
+            f.readline()  # skip the partial line
+            pos = f.tell()
+            while pos < size:
+                line = f.readline()
+                if is_chunk_start(line):
+                    break
+                pos += len(line)
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+            target = pos + chunk_bytes
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def compress_segment(path: Path, block_bytes: int = 1 << 20, level: int = 6) -> Path:
+    """Write ``<segment>.zb`` next to a closed plain segment, then remove the plain file."""
+    out = path.with_name(path.name + ".zb")
+    tmp = out.with_name(out.name + ".tmp")
+    blocks: List[List[int]] = []
+    raw_off = 0
+
+    with path.open("rb") as src, tmp.open("wb") as dst:
+        dst.write(MAGIC)
+        buf: List[bytes] = []
+        size = 0
+
+        def _emit() -> None:
+            nonlocal raw_off, buf, size
+            if not buf:
+                return
+            comp = zlib.compress(b"".join(buf), level)
+            blocks.append([raw_off, dst.tell(), len(comp), size])
+            dst.write(comp)
+            raw_off += size
+            buf, size = [], 0
+
+        for line in src:
+            if size >= block_bytes and is_chunk_start(line):
+                _emit()
+            buf.append(line)
+            size += len(line)
+        _emit()
+        index = json.dumps({"raw_size": raw_off, "blocks": blocks}).encode()
+        dst.write(index + struct.pack("<Q", len(index)) + FOOTER)
+        dst.flush()
+        os.fsync(dst.fileno())
+    tmp.replace(out)
+    path.unlink()
+    return out
+
+
+def disk_usage(path: Path) -> int:
+    total = 0
+    for p in path.rglob("*"):
+        try:
+            if p.is_file():
+                total += p.stat().st_size
+        except OSError:
+            pass
+    return total
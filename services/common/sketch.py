@@ -0,0 +1,129 @@
+"""Streaming quantile sketches (DDSketch-style) shared by the adapter and the exporter."""
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class LatencySketch:
+    """Log-bucketed latency histogram; quantiles within ``alpha`` relative error.
+
+    Buckets are keyed by ``ceil(log(x) / log(gamma))`` so two sketches merge by
+    adding counts, which is what lets day rollups combine without raw samples.
+    At most ``max_bins`` buckets are kept; past that the lowest buckets are
+    collapsed together, which only costs accuracy at the very bottom quantiles.
+    """
+
+    def __init__(self, alpha: float = 0.01, max_bins: int = 2048):
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float, n: int = 1) -> None:
+        self.count += n
+        self.sum += value * n
+        if value <= 0:
+            self.zeros += n
+            return
+        k = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[k] = self.buckets.get(k, 0) + n
+        if len(self.buckets) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        keys = sorted(self.buckets)
+        extra = len(keys) - self.max_bins
+        into = keys[extra]
+        for k in keys[:extra]:
+            self.buckets[into] += self.buckets.pop(k)
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        for k, n in other.buckets.items():
+            self.buckets[k] = self.buckets.get(k, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        if len(self.buckets) > self.max_bins:
+            self._collapse()
+        return self
+
+    def _value(self, k: int) -> float:
+        return 2 * self.gamma ** k / (self.gamma + 1)
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Several quantiles in one pass over the sorted buckets."""
+        qs = list(qs)
+        if self.count == 0:
+            return [0.0] * len(qs)
+        order = sorted(range(len(qs)), key=lambda i: qs[i])
+        out = [0.0] * len(qs)
+        keys = sorted(self.buckets)
+        seen = self.zeros
+        j = 0
+        for i in order:
+            rank = qs[i] * (self.count - 1)
+            if rank < self.zeros:
+                continue
+            while j < len(keys) and seen + self.buckets[keys[j]] <= rank:
+                seen += self.buckets[keys[j]]
+                j += 1
+            out[i] = self._value(keys[min(j, len(keys) - 1)])
+        return out
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"alpha": self.alpha, "zeros": self.zeros, "sum": self.sum, "buckets": {str(k): n for k, n in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "LatencySketch":
+        s = cls(alpha=d.get("alpha", 0.01))
+        s.zeros = int(d.get("zeros", 0))
+        s.sum = float(d.get("sum", 0.0))
+        s.buckets = {int(k): int(n) for k, n in d.get("buckets", {}).items()}
+        s.count = s.zeros + sum(s.buckets.values())
+        return s
+
+
+class RollingSketch:
+    """Time-sliced sketches for rolling windows (e.g. last 1 m / 5 m / 1 h).
+
+    Values land in the slot for ``now // slot_s``; a window query merges the
+    slots it covers. Memory is bounded by ``horizon_s / slot_s`` sketches.
+    """
+
+    def __init__(self, slot_s: float = 10.0, horizon_s: float = 3600.0, alpha: float = 0.01):
+        self.slot_s = slot_s
+        self.slots = max(1, int(math.ceil(horizon_s / slot_s)))
+        self.alpha = alpha
+        self._ring: List[Optional[LatencySketch]] = [None] * self.slots
+        self._ids: List[int] = [-1] * self.slots
+        self._lock = threading.Lock()
+
+    def add(self, value: float, now: Optional[float] = None) -> None:
+        sid = int((time.time() if now is None else now) // self.slot_s)
+        i = sid % self.slots
+        with self._lock:
+            if self._ids[i] != sid:
+                self._ring[i] = LatencySketch(self.alpha)
+                self._ids[i] = sid
+            self._ring[i].add(value)
+
+    def window(self, seconds: float, now: Optional[float] = None) -> LatencySketch:
+        cur = int((time.time() if now is None else now) // self.slot_s)
+        first = cur - min(self.slots, max(1, int(math.ceil(seconds / self.slot_s)))) + 1
+        out = LatencySketch(self.alpha)
+        with self._lock:
+            for sk, sid in zip(self._ring, self._ids):
+                if sk is not None and first <= sid <= cur:
+                    out.merge(sk)
+        return out
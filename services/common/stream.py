@@ -0,0 +1,251 @@
+"""Long-lived frame stream between pipeline stages over one WebSocket.
+
+Every WebSocket binary message is one frame:
+
+    u32 header length (big endian) | JSON header | payload bytes
+
+The server opens with ``{"credit": N}``: the client may have at most N
+requests in flight. Each reply carries ``"credit": 1`` back, so a slow stage
+throttles its caller instead of queueing without bound. Requests are handled
+concurrently and replies go out as they finish, echoing the request's
+``frame_id`` and ``seq`` (the client's per-connection request number, used for
+matching since frame ids repeat across cameras); a reply with ``"error"``
+fails only that request.
+"""
+import asyncio
+import inspect
+import struct
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+try:
+    from common.jsonenc import dumps, loads
+except ImportError:  # imported from the repo root (tests)
+    from services.common.jsonenc import dumps, loads
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+except ImportError:  # optional: only stream clients need it, servers use Starlette's WebSocket
+    ws_connect = None
+
+_LEN = struct.Struct(">I")
+Message = Tuple[Dict[str, Any], bytes]
+Handler = Callable[[Dict[str, Any], bytes], Union[Awaitable[Any], Any]]
+
+
+def encode(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    h = dumps(header)
+    return _LEN.pack(len(h)) + h + payload
+
+
+def decode(data: bytes) -> Message:
+    if len(data) < _LEN.size:
+        raise ValueError("short stream message")
+    (n,) = _LEN.unpack_from(data)
+    if _LEN.size + n > len(data):
+        raise ValueError("truncated stream header")
+    return loads(data[_LEN.size:_LEN.size + n]), data[_LEN.size + n:]
+
+
+async def serve(websocket, handler: Handler, credits: int = 8, on_request: Optional[Callable[[], None]] = None) -> None:
+    """Run one stream connection on a Starlette/FastAPI ``WebSocket``.
+
+    ``handler(header, payload)`` returns a reply header dict or a
+    ``(header, payload)`` tuple; plain functions run in the default executor.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    tasks: set = set()
+
+    async def _reply(header: Dict[str, Any], payload: bytes = b"") -> None:
+        async with send_lock:
+            await websocket.send_bytes(encode(header, payload))
+
+    async def _run(header: Dict[str, Any], payload: bytes) -> None:
+        fid, seq = header.get("frame_id"), header.get("seq")
+        try:
+            if inspect.iscoroutinefunction(handler):
+                out = await handler(header, payload)
+            else:
+                out = await asyncio.get_running_loop().run_in_executor(None, handler, header, payload)
+            rh, rp = out if isinstance(out, tuple) else (out, b"")
+            rh = dict(rh or {})
+        except Exception as e:
+            rh, rp = {"error": str(e) or type(e).__name__}, b""
+        rh["frame_id"] = fid
+        if seq is not None:
+            rh["seq"] = seq
+        rh["credit"] = 1
+        try:
+            await _reply(rh, rp)
+        except Exception:
+            pass  # connection is gone; the client fails its pending requests
+
+    await _reply({"credit": max(1, credits)})
+    try:
+        while True:
+            data = await websocket.receive_bytes()
+            if on_request:
+                on_request()
+            try:
+                header, payload = decode(data)
+            except Exception:
+                await _reply({"error": "bad_message", "frame_id": None, "credit": 1})
+                continue
+            t = asyncio.create_task(_run(header, payload))
+            tasks.add(t)
+            t.add_done_callback(tasks.discard)
+    except Exception:
+        pass  # WebSocketDisconnect or a broken socket
+    finally:
+        for t in list(tasks):
+            t.cancel()
+
+
+class StreamError(RuntimeError):
+    pass
+
+
+class StreamClient:
+    """Client side of ``serve``: one connection, many frames in flight.
+
+    ``send`` waits for a credit, writes the frame and returns a future for its
+    reply without waiting for it, so a caller can keep the pipe full;
+    ``request`` is send-and-wait. The connection is (re)opened lazily, and
+    when it drops every pending request fails with ``StreamError``.
+    """
+
+    def __init__(self, url: str, open_timeout: float = 5.0, max_size: int = 64 * 1024 * 1024):
+        self.url = url
+        self.open_timeout = open_timeout
+        self.max_size = max_size
+        self._ws = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._seq = 0
+        self._credits = 0
+        self._credit_cond: Optional[asyncio.Condition] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self.sent = 0
+        self.completed = 0
+        self.failed = 0
+        self.connects = 0
+
+    @property
+    def inflight(self) -> int:
+        return len(self._pending)
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    async def _ensure(self) -> None:
+        if self._credit_cond is None:
+            self._credit_cond = asyncio.Condition()
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._ws is not None:
+                return
+            if ws_connect is None:
+                raise StreamError("websockets is not installed")
+            ws = await ws_connect(self.url, open_timeout=self.open_timeout, max_size=self.max_size, compression=None)
+            hello, _ = decode(await asyncio.wait_for(ws.recv(), self.open_timeout))
+            async with self._credit_cond:
+                self._credits = int(hello.get("credit", 1))
+            self._ws = ws
+            self._reader = asyncio.create_task(self._read(ws))
+            self.connects += 1
+
+    async def _read(self, ws) -> None:
+        try:
+            async for data in ws:
+                header, payload = decode(data)
+                grant = int(header.pop("credit", 0) or 0)
+                if grant:
+                    async with self._credit_cond:
+                        self._credits += grant
+                        self._credit_cond.notify(grant)
+                fut = self._pending.pop(header.pop("seq", None), None)
+                if fut is None or fut.done():
+                    continue
+                if "error" in header:
+                    self.failed += 1
+                    fut.set_exception(StreamError(header["error"]))
+                else:
+                    self.completed += 1
+                    fut.set_result((header, payload))
+        except Exception:
+            pass
+        finally:
+            await self._drop(ws)
+
+    async def _drop(self, ws) -> None:
+        if self._ws is not ws:  # already dropped (or replaced by a newer connection)
+            try:
+                await ws.close()
+            except Exception:
+                pass
+            return
+        self._ws = None
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                self.failed += 1
+                fut.set_exception(StreamError("stream closed"))
+        async with self._credit_cond:
+            self._credits = 0
+            self._credit_cond.notify_all()  # waiters re-check and reconnect
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+    async def send(self, header: Dict[str, Any], payload: bytes = b"", timeout: Optional[float] = None) -> asyncio.Future:
+        await self._ensure()
+        ws = self._ws
+        async with self._credit_cond:
+            if self._credits <= 0:
+                await asyncio.wait_for(self._credit_cond.wait_for(lambda: self._credits > 0 or self._ws is not ws), timeout)
+            if self._ws is not ws or ws is None:
+                raise StreamError("stream closed")
+            self._credits -= 1
+        fut = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        key = self._seq
+        self._pending[key] = fut
+        try:
+            await ws.send(encode({**header, "seq": key}, payload))
+        except Exception as e:
+            self._pending.pop(key, None)
+            await self._drop(ws)
+            raise StreamError(f"send failed: {e}") from e
+        self.sent += 1
+        return fut
+
+    async def request(self, header: Dict[str, Any], payload: bytes = b"", timeout: Optional[float] = None) -> Message:
+        fut = await self.send(header, payload, timeout=timeout)
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            # the late reply still returns its credit; it just has no one to deliver to
+            for key, pending in list(self._pending.items()):
+                if pending is fut:
+                    del self._pending[key]
+            raise
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            await self._drop(self._ws)
+        if self._reader is not None:
+            self._reader.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "connected": self.connected,
+            "credits": self._credits,
+            "inflight": self.inflight,
+            "sent": self.sent,
+            "completed": self.completed,
+            "failed": self.failed,
+            "connects": self.connects,
+        }
@@ -0,0 +1,329 @@
+"""OpenTelemetry setup shared by the services: head sampling plus defect-biased keep.
+
+Head sampling is parent-based. A request that arrives with a ``traceparent``
+follows the caller's decision, so a trace is sampled in every service or in
+none. New traces are sampled with probability ``ratio``, chosen from the
+trace id so every service agrees.
+
+With ``keep`` on, unsampled traces are still recorded but not exported.
+Their spans are held until the local root span ends (the server span of the
+request, or for a frame stream the ``frame_span`` of each frame, so nothing
+waits on the connection). The whole local trace is then exported if any of its spans:
+failed (status ERROR), was marked with ``keep(reason)`` (for example a frame
+with detections), or, for the local root, took longer than ``slow_ms``.
+Everything else is dropped without reaching the exporter. Recording still
+costs span creation, so ``keep=False`` gives the cheapest pure head
+sampling. Sampling settings can be changed at runtime with ``update()``.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult
+from opentelemetry.trace import Link, SpanContext, SpanKind, StatusCode, TraceFlags
+
+KEEP_ATTR = "edgesight.keep"
+_ID_LIMIT = (1 << 64) - 1
+
+
+def keep(reason: str, span: Any = None) -> None:
+    """Ask for the current trace to be exported even if head sampling skipped it."""
+    try:
+        (span or trace.get_current_span()).set_attribute(KEEP_ATTR, reason)
+    except Exception:
+        pass
+
+
+@contextmanager
+def frame_span(name: str, header: Dict[str, Any], tracer: Any = None) -> Iterator[Any]:
+    """Server span for one frame received on a stream connection (common/stream.py).
+
+    It continues the trace in the frame header's ``traceparent`` or starts a
+    new one, linked to the connection span. Each frame is then a local root of
+    its own, sampled and kept per frame like an HTTP request.
+    """
+    conn = trace.get_current_span().get_span_context()
+    links = [Link(conn)] if conn.is_valid else None
+    ctx = propagate.extract({k: v for k, v in header.items() if isinstance(v, str)})
+    with (tracer or trace.get_tracer(__name__)).start_as_current_span(name, context=ctx, kind=SpanKind.SERVER, links=links) as span:
+        if header.get("frame_id") is not None:
+            span.set_attribute("frame_id", str(header["frame_id"]))
+        yield span
+
+
+def inject(header: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the current ``traceparent`` to an outgoing stream frame header."""
+    propagate.inject(header)
+    return header
+
+
+class SamplingSettings:
+    def __init__(self, ratio: float = 1.0, keep: bool = True, slow_ms: float = 200.0):
+        self.ratio = ratio
+        self.keep = keep
+        self.slow_ms = slow_ms
+
+    @classmethod
+    def from_env(cls) -> "SamplingSettings":
+        return cls(
+            ratio=float(os.getenv("OTEL_TRACES_SAMPLER_ARG", "0.1")),
+            keep=os.getenv("OTEL_KEEP_ENABLED", "true").lower() in ("1", "true", "yes"),
+            slow_ms=float(os.getenv("OTEL_KEEP_SLOW_MS", "200")),
+        )
+
+    @property
+    def ratio(self) -> float:
+        return self._ratio
+
+    @ratio.setter
+    def ratio(self, value: float) -> None:
+        self._ratio = min(1.0, max(0.0, float(value)))
+        self._bound = round(self._ratio * (_ID_LIMIT + 1))
+
+    def head_sampled(self, trace_id: int) -> bool:
+        return (trace_id & _ID_LIMIT) < self._bound
+
+    def update(self, cfg: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply ``trace_ratio`` / ``trace_keep`` / ``trace_slow_ms`` from a /config body."""
+        updated: Dict[str, Any] = {}
+        if cfg.get("trace_ratio") is not None:
+            self.ratio = float(cfg["trace_ratio"])
+            updated["trace_ratio"] = self.ratio
+        if cfg.get("trace_keep") is not None:
+            self.keep = bool(cfg["trace_keep"])
+            updated["trace_keep"] = self.keep
+        if cfg.get("trace_slow_ms") is not None:
+            self.slow_ms = float(cfg["trace_slow_ms"])
+            updated["trace_slow_ms"] = self.slow_ms
+        return updated
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_ratio": self.ratio, "trace_keep": self.keep, "trace_slow_ms": self.slow_ms}
+
+
+class HeadSampler(Sampler):
+    """ParentBased(TraceIdRatio) whose ratio reads ``settings`` on every call.
+
+    Unsampled spans are RECORD_ONLY while ``settings.keep`` is on, so the
+    keep processor can still export them.
+    """
+
+    def __init__(self, settings: SamplingSettings):
+        self.settings = settings
+
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None) -> SamplingResult:
+        parent = trace.get_current_span(parent_context).get_span_context()
+        if parent.is_valid:
+            sampled = parent.trace_flags.sampled
+            trace_state = parent.trace_state
+        else:
+            sampled = self.settings.head_sampled(trace_id)
+        if sampled:
+            decision = Decision.RECORD_AND_SAMPLE
+        else:
+            decision = Decision.RECORD_ONLY if self.settings.keep else Decision.DROP
+        return SamplingResult(decision, attributes if decision != Decision.DROP else None, trace_state)
+
+    def get_description(self) -> str:
+        return f"EdgeSightHeadSampler{{ratio={self.settings.ratio},keep={self.settings.keep}}}"
+
+
+def _as_sampled(span: ReadableSpan) -> ReadableSpan:
+    # the batch processor only exports spans whose context carries the sampled flag
+    ctx = span.context
+    return ReadableSpan(
+        name=span.name,
+        context=SpanContext(ctx.trace_id, ctx.span_id, ctx.is_remote, TraceFlags(TraceFlags.SAMPLED), ctx.trace_state),
+        parent=span.parent,
+        resource=span.resource,
+        attributes=span.attributes,
+        events=span.events,
+        links=span.links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=getattr(span, "instrumentation_scope", None),
+    )
+
+
+class KeepSpanProcessor(SpanProcessor):
+    """Passes sampled spans to ``delegate``; holds unsampled ones per trace until the local root ends."""
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        settings: SamplingSettings,
+        max_traces: int = 1024,
+        max_spans: int = 256,
+        on_span: Optional[Callable[[str, int], None]] = None,
+        queue_full: Optional[Callable[[], bool]] = None,
+    ):
+        self.delegate = delegate
+        self.settings = settings
+        self.max_traces = max(1, max_traces)
+        self.max_spans = max(1, max_spans)
+        self.on_span = on_span
+        self.queue_full = queue_full
+        self._held: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        self._reasons: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, decision: str, n: int = 1) -> None:
+        if self.on_span and n:
+            self.on_span(decision, n)
+
+    def _forward(self, span: ReadableSpan, decision: str) -> None:
+        if self.queue_full is not None and self.queue_full():
+            decision = "queue_full"  # the batch processor is about to discard a span
+        self.delegate.on_end(span)
+        self._count(decision)
+
+    def _reason(self, span: ReadableSpan, local_root: bool) -> Optional[str]:
+        if span.status.status_code == StatusCode.ERROR:
+            return "error"
+        attrs = span.attributes or {}
+        if attrs.get(KEEP_ATTR):
+            return str(attrs[KEEP_ATTR])
+        if local_root and span.end_time and span.start_time:
+            if (span.end_time - span.start_time) / 1e6 > self.settings.slow_ms:
+                return "slow"
+        return None
+
+    def on_start(self, span, parent_context=None) -> None:
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        ctx = span.context
+        if ctx is None:
+            return
+        if ctx.trace_flags.sampled:
+            self._forward(span, "sampled")
+            return
+        local_root = span.parent is None or span.parent.is_remote
+        reason = self._reason(span, local_root)
+        evicted: List[ReadableSpan] = []
+        with self._lock:
+            held = self._held.setdefault(ctx.trace_id, [])
+            held.append(span)
+            if len(held) > self.max_spans:
+                # a long-lived root (a stream connection) would otherwise grow without bound
+                evicted.append(held.pop(0))
+            if reason and ctx.trace_id not in self._reasons:
+                self._reasons[ctx.trace_id] = reason
+            if not local_root:
+                while len(self._held) > self.max_traces:
+                    tid, spans = self._held.popitem(last=False)
+                    self._reasons.pop(tid, None)
+                    evicted.extend(spans)
+                spans = []
+            else:
+                spans = self._held.pop(ctx.trace_id)
+                reason = self._reasons.pop(ctx.trace_id, None)
+        self._count("dropped", len(evicted))
+        if not spans:
+            return
+        if reason:
+            for s in spans:
+                self._forward(_as_sampled(s), "kept")
+        else:
+            self._count("dropped", len(spans))
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+class CountingExporter(SpanExporter):
+    """Wraps an exporter and reports ``on_export(n_spans, ok, ms)`` per batch."""
+
+    def __init__(self, exporter: SpanExporter, on_export: Optional[Callable[[int, bool, float], None]] = None):
+        self.exporter = exporter
+        self.on_export = on_export
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        t0 = time.perf_counter()
+        try:
+            result = self.exporter.export(spans)
+        except Exception:
+            result = SpanExportResult.FAILURE
+        if self.on_export:
+            self.on_export(len(spans), result == SpanExportResult.SUCCESS, (time.perf_counter() - t0) * 1000.0)
+        return result
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+
+def _bsp_queue(bsp: BatchSpanProcessor):
+    # SDK internals moved between releases; depth is best-effort
+    inner = getattr(bsp, "_batch_processor", bsp)
+    return getattr(inner, "_queue", None) or getattr(inner, "queue", None)
+
+
+class Tracing:
+    """Builds and installs the tracer provider; keeps the live settings for /config.
+
+    ``on_span(decision, n)`` counts finished spans as sampled, kept, dropped or
+    queue_full (handed over while the export queue was full); ``on_export(n,
+    ok, ms)`` reports each export batch.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[SamplingSettings] = None,
+        on_span: Optional[Callable[[str, int], None]] = None,
+        on_export: Optional[Callable[[int, bool, float], None]] = None,
+    ):
+        self.settings = settings or SamplingSettings.from_env()
+        self.on_span = on_span
+        self.on_export = on_export
+        self.provider: Optional[TracerProvider] = None
+        self._bsp: Optional[BatchSpanProcessor] = None
+        self._queue_max = 2048
+
+    def build(self, exporter: SpanExporter, resource: Optional[Resource] = None, **bsp_kwargs) -> TracerProvider:
+        self._queue_max = int(bsp_kwargs.get("max_queue_size") or os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "2048"))
+        self._bsp = BatchSpanProcessor(CountingExporter(exporter, self.on_export), **bsp_kwargs)
+        provider = TracerProvider(resource=resource or Resource.create({}), sampler=HeadSampler(self.settings))
+        provider.add_span_processor(
+            KeepSpanProcessor(
+                self._bsp,
+                self.settings,
+                max_traces=int(os.getenv("OTEL_KEEP_MAX_TRACES", "1024")),
+                max_spans=int(os.getenv("OTEL_KEEP_MAX_SPANS", "256")),
+                on_span=self.on_span,
+                queue_full=lambda: self.queue_depth() >= self._queue_max,
+            )
+        )
+        self.provider = provider
+        return provider
+
+    def install(self, service_name: str) -> None:
+        """OTLP/gRPC exporter from the usual OTEL_EXPORTER_OTLP_* envs, set as the global provider."""
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://otel-collector:4317")
+        insecure = os.getenv("OTEL_EXPORTER_OTLP_INSECURE", "1").lower() in ("1", "true", "yes")
+        provider = self.build(OTLPSpanExporter(endpoint=endpoint, insecure=insecure), Resource.create({"service.name": service_name}))
+        trace.set_tracer_provider(provider)
+
+    def queue_depth(self) -> int:
+        if self._bsp is None:
+            return 0
+        q = _bsp_queue(self._bsp)
+        try:
+            return len(q) if q is not None else 0
+        except Exception:
+            return 0
@@ -0,0 +1,172 @@
+"""Edge monolith: capture, preprocess, inference and the results adapter in one process.
+
+For one-camera boxes. The stages run as threads joined by bounded in-memory
+queues (frames and tensors are passed by reference, no JPEG/multipart hops),
+and results go straight into the results adapter's handler. The HTTP surface
+is the results adapter's own app (/metrics, /events, /preview/*, /frames/*,
+/governance/*) plus the inference /config fields and /pipeline/stats.
+
+    python services/edge_monolith/main.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# the stage modules live in their own service directories and import each other bare
+_SERVICES = Path(os.getenv("EDGESIGHT_SERVICES_DIR", Path(__file__).resolve().parent.parent))
+for _sub in ("", "capture", "preprocess", "inference", "results_adapter"):
+    _p = str(_SERVICES / _sub)
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+import cv2  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import Body  # noqa: E402
+from prometheus_client import Counter, Gauge, Histogram  # noqa: E402
+
+import app as adapter  # noqa: E402  (results_adapter/app.py)
+from camera import CameraConfig, read_frames  # noqa: E402
+from infer import InferenceEngine  # noqa: E402
+from ops import run_pipeline  # noqa: E402
+from pipeline import Frame, Pipeline  # noqa: E402
+
+app = adapter.app
+
+pipeline_stage_ms = Histogram("pipeline_stage_ms", "Edge monolith per-stage time (ms)", ["stage"], buckets=(0.5,1,2,5,10,20,50,100,200,500))
+pipeline_e2e_ms = Histogram("pipeline_e2e_ms", "Edge monolith capture-to-result latency (ms)", buckets=(1,5,10,20,50,100,200,500,1000))
+pipeline_dropped = Counter("pipeline_frames_dropped_total", "Frames dropped from a full stage queue", ["queue"])
+pipeline_queue_depth = Gauge("pipeline_queue_depth", "Frames waiting in a stage queue", ["queue"])
+
+CAMERA_ID = os.getenv("CAMERA_ID", "")
+SESSION_ID = uuid.uuid4().hex[:12]  # frame ids restart with the process
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "90"))
+engine = InferenceEngine(os.getenv("MODEL_PATH", "/app/assets/yolov8n.onnx"))
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _camera_frames():
+    cfg = CameraConfig(
+        source=os.getenv("CAMERA_URL", "synthetic"),
+        fps_cap=float(os.getenv("FRAME_RATE_CAP", "10")),
+        width=int(os.getenv("FRAME_WIDTH", "640")),
+        height=int(os.getenv("FRAME_HEIGHT", "360")),
+    )
+    return read_frames(cfg)
+
+
+def _encode_jpeg(image) -> Optional[bytes]:
+    # still needed once per frame for the live preview and the defect-frame archive
+    ok, jpg = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+    return jpg.tobytes() if ok else None
+
+
+def _on_preview(frame: Frame) -> None:
+    if _loop is not None:
+        _loop.call_soon_threadsafe(adapter.publish_preview, frame.jpeg, CAMERA_ID or None, str(frame.frame_id), SESSION_ID)
+
+
+def _on_result(frame: Frame) -> None:
+    e2e = frame.latency_ms()
+    pipeline_e2e_ms.observe(e2e)
+    payload: Dict[str, Any] = {
+        "frame_id": str(frame.frame_id),
+        "detections": frame.detections,
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "model_hash": os.getenv("MODEL_HASH", "demo"),
+        "config_digest": os.getenv("CONFIG_DIGEST", "demo"),
+        "latency_ms": e2e,
+        "session": SESSION_ID,
+    }
+    if CAMERA_ID:
+        payload["camera_id"] = CAMERA_ID
+    if _loop is None:
+        return
+    fut = asyncio.run_coroutine_threadsafe(adapter.handle_result(payload, str(uuid.uuid4())), _loop)
+    # waiting here back-pressures the inference thread; stage queues then drop the oldest frames
+    fut.result(timeout=5)
+
+
+pipeline = Pipeline(
+    _camera_frames,
+    run_pipeline,
+    engine.run,
+    _on_result,
+    on_preview=_on_preview,
+    encode_jpeg=_encode_jpeg,
+    queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", "2")),
+    on_stage=lambda stage, ms: pipeline_stage_ms.labels(stage).observe(ms),
+    on_drop=lambda q: pipeline_dropped.labels(q).inc(),
+)
+pipeline_queue_depth.labels("preprocess").set_function(pipeline.to_preprocess.depth)
+pipeline_queue_depth.labels("inference").set_function(pipeline.to_infer.depth)
+
+# /config answers for the adapter and the inference engine together
+app.router.routes = [r for r in app.router.routes if getattr(r, "path", None) != "/config"]
+
+
+@app.on_event("startup")
+async def _start_pipeline():
+    global _loop
+    _loop = asyncio.get_running_loop()
+    if os.getenv("CAPTURE_AUTOSTART", "true").lower() in ("1", "true", "yes"):
+        pipeline.start()
+
+
+@app.on_event("shutdown")
+async def _stop_pipeline():
+    await asyncio.get_running_loop().run_in_executor(None, pipeline.stop)
+
+
+@app.get("/config")
+def get_config():
+    return {
+        **adapter.get_config(),
+        "conf_threshold": engine.conf_threshold,
+        "offline_force": engine.offline_force,
+        "gpu_in_use": bool(engine.gpu_in_use),
+        "providers": list(engine.providers or []),
+        "ready": bool(engine.ready),
+        "mode": "edge_monolith",
+    }
+
+
+@app.patch("/config")
+async def patch_config(cfg: Dict[str, Any] = Body(...)):
+    updated = (await adapter.patch_config(cfg))["updated"]
+    if cfg.get("conf_threshold") is not None:
+        engine.set_threshold(float(cfg["conf_threshold"]))
+        updated["conf_threshold"] = engine.conf_threshold
+    offline_force = cfg.get("offline_force") or cfg.get("demo_force")
+    if offline_force is not None:
+        engine.set_offline_force(bool(offline_force))
+        updated["offline_force"] = engine.offline_force
+    return {"updated": updated}
+
+
+@app.get("/pipeline/stats")
+def pipeline_stats():
+    return pipeline.stats()
+
+
+@app.post("/start")
+def start():
+    if pipeline.running:
+        return {"status": "already_running"}
+    pipeline.start()
+    return {"status": "started"}
+
+
+@app.post("/stop")
+def stop():
+    if not pipeline.running:
+        return {"status": "not_running"}
+    pipeline.stop()
+    return {"status": "stopped"}
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "9004")))
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+class Frame:
+    """One frame moving through the stages; arrays are handed on by reference."""
+
+    __slots__ = ("frame_id", "ts_ns", "t0", "image", "jpeg", "tensor", "detections", "stage_ms")
+
+    def __init__(self, frame_id: int, ts_ns: int, image: Any):
+        self.frame_id = frame_id
+        self.ts_ns = ts_ns
+        self.t0 = time.perf_counter()
+        self.image = image
+        self.jpeg: Optional[bytes] = None
+        self.tensor: Any = None
+        self.detections: List[Dict[str, Any]] = []
+        self.stage_ms: Dict[str, float] = {}
+
+    def latency_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000.0
+
+
+class StageQueue:
+    """Bounded hand-off between two stage threads.
+
+    When full, the oldest frame is dropped: a slow stage should work on the
+    newest frame, not a backlog, exactly like the capture buffer does.
+    """
+
+    def __init__(self, name: str, maxsize: int = 2, on_drop: Optional[Callable[[str], None]] = None):
+        self.name = name
+        self._items: Deque[Frame] = deque()
+        self.maxsize = max(1, maxsize)
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._cond = threading.Condition()
+
+    def put(self, item: Frame) -> None:
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                if self.on_drop:
+                    self.on_drop(self.name)
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: float = 0.5) -> Optional[Frame]:
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def depth(self) -> int:
+        return len(self._items)
+
+
+class Pipeline:
+    """capture -> preprocess -> inference, one thread per stage, in one process.
+
+    ``frames`` yields (frame_id, ts_ns, image) like ``camera.read_frames``;
+    ``preprocess`` and ``infer`` are ``ops.run_pipeline`` and
+    ``InferenceEngine.run``. ``on_preview`` gets each frame after JPEG encoding
+    (if ``encode_jpeg`` is set) and ``on_result`` each inferred frame.
+    """
+
+    def __init__(
+        self,
+        frames: Callable[[], Iterator[Tuple[int, int, Any]]],
+        preprocess: Callable[[Any], Any],
+        infer: Callable[[Any], List[Dict[str, Any]]],
+        on_result: Callable[[Frame], None],
+        on_preview: Optional[Callable[[Frame], None]] = None,
+        encode_jpeg: Optional[Callable[[Any], Optional[bytes]]] = None,
+        queue_size: int = 2,
+        on_stage: Optional[Callable[[str, float], None]] = None,
+        on_drop: Optional[Callable[[str], None]] = None,
+    ):
+        self.frames = frames
+        self.preprocess = preprocess
+        self.infer = infer
+        self.on_result = on_result
+        self.on_preview = on_preview
+        self.encode_jpeg = encode_jpeg
+        self.on_stage = on_stage
+        self.to_preprocess = StageQueue("preprocess", queue_size, on_drop)
+        self.to_infer = StageQueue("inference", queue_size, on_drop)
+        self.captured = 0
+        self.completed = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture, name="stage-capture", daemon=True),
+            threading.Thread(target=self._stage, args=(self.to_preprocess, self._preprocess, self.to_infer), name="stage-preprocess", daemon=True),
+            threading.Thread(target=self._stage, args=(self.to_infer, self._infer, None), name="stage-inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _timed(self, frame: Frame, stage: str, t0: float) -> None:
+        ms = (time.perf_counter() - t0) * 1000.0
+        frame.stage_ms[stage] = ms
+        if self.on_stage:
+            self.on_stage(stage, ms)
+
+    def _capture(self) -> None:
+        gen = None
+        while not self._stop.is_set():
+            try:
+                if gen is None:
+                    gen = self.frames()
+                t0 = time.perf_counter()
+                fid, ts_ns, image = next(gen)
+            except StopIteration:
+                return
+            except Exception as e:
+                print(f"[edge] frame read error: {e}", flush=True)
+                self.errors += 1
+                gen = None
+                time.sleep(0.1)
+                continue
+            frame = Frame(fid, ts_ns, image)
+            self.captured += 1
+            if self.encode_jpeg is not None:
+                frame.jpeg = self.encode_jpeg(image)
+            self._timed(frame, "capture", t0)
+            if self.on_preview is not None and frame.jpeg:
+                try:
+                    self.on_preview(frame)
+                except Exception:
+                    pass
+            self.to_preprocess.put(frame)
+
+    def _preprocess(self, frame: Frame) -> None:
+        frame.tensor = self.preprocess(frame.image)
+        frame.image = None  # the tensor is all later stages need
+
+    def _infer(self, frame: Frame) -> None:
+        frame.detections = self.infer(frame.tensor)
+        frame.tensor = None
+
+    def _stage(self, inq: StageQueue, work: Callable[[Frame], None], outq: Optional[StageQueue]) -> None:
+        stage = inq.name
+        while not self._stop.is_set() or inq.depth():
+            frame = inq.get(timeout=0.2)
+            if frame is None:
+                if self._stop.is_set():
+                    return
+                continue
+            t0 = time.perf_counter()
+            try:
+                work(frame)
+            except Exception as e:
+                print(f"[edge] {stage} failed for frame {frame.frame_id}: {e}", flush=True)
+                self.errors += 1
+                continue
+            self._timed(frame, stage, t0)
+            if outq is not None:
+                outq.put(frame)
+                continue
+            self.completed += 1
+            try:
+                self.on_result(frame)
+            except Exception as e:
+                print(f"[edge] result handling failed for frame {frame.frame_id}: {e}", flush=True)
+                self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "captured": self.captured,
+            "completed": self.completed,
+            "errors": self.errors,
+            "queues": {q.name: {"depth": q.depth(), "max": q.maxsize, "dropped": q.dropped} for q in (self.to_preprocess, self.to_infer)},
+        }
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import numpy as np
+
+from services.edge_monolith.pipeline import Frame, Pipeline, StageQueue
+
+
+def test_stage_queue_drops_oldest_when_full():
+    dropped = []
+    q = StageQueue("preprocess", maxsize=2, on_drop=dropped.append)
+    for i in range(5):
+        q.put(Frame(i, 0, None))
+    assert q.depth() == 2
+    assert q.dropped == 3 and dropped == ["preprocess"] * 3
+    assert [q.get(timeout=0).frame_id, q.get(timeout=0).frame_id] == [3, 4]
+    assert q.get(timeout=0.01) is None
+
+
+def test_pipeline_passes_frames_by_reference_in_order():
+    images = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(20)]
+    seen_images, seen_tensors, results = [], [], []
+    done = threading.Event()
+
+    def frames():
+        for i, img in enumerate(images):
+            yield i, i, img
+            time.sleep(0.002)
+
+    def preprocess(img):
+        seen_images.append(img)
+        return img.astype(np.float32)
+
+    def infer(tensor):
+        seen_tensors.append(tensor)
+        return [{"class_id": 0, "score": float(tensor[0, 0, 0]), "bbox": [0, 0, 1, 1]}]
+
+    def on_result(frame):
+        results.append(frame)
+        if len(results) == len(images):
+            done.set()
+
+    p = Pipeline(frames, preprocess, infer, on_result, queue_size=len(images))
+    p.start()
+    assert done.wait(5)
+    p.stop()
+
+    assert all(a is b for a, b in zip(seen_images, images))
+    assert [f.frame_id for f in results] == list(range(len(images)))
+    assert [f.detections[0]["score"] for f in results] == [float(i) for i in range(len(images))]
+    assert all(f.image is None and f.tensor is None for f in results)
+    assert set(results[0].stage_ms) == {"capture", "preprocess", "inference"}
+    stats = p.stats()
+    assert stats["captured"] == stats["completed"] == len(images)
+    assert stats["errors"] == 0 and not stats["running"]
+
+
+def test_pipeline_counts_stage_errors_and_keeps_going():
+    results = []
+
+    def frames():
+        for i in range(6):
+            yield i, i, i
+            time.sleep(0.002)
+
+    def infer(x):
+        if x == 3:
+            raise ValueError("bad frame")
+        return []
+
+    p = Pipeline(frames, lambda x: x, infer, results.append, queue_size=8)
+    p.start()
+    deadline = time.time() + 5
+    while p.stats()["completed"] + p.stats()["errors"] < 6 and time.time() < deadline:
+        time.sleep(0.01)
+    p.stop()
+    assert p.errors == 1
+    assert [f.frame_id for f in results] == [0, 1, 2, 4, 5]
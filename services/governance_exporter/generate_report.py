@@ -1,14 +1,27 @@
 import argparse
-import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
 from pathlib import Path
-from statistics import median
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import subprocess
 
 from jinja2 import Environment, FileSystemLoader
 from nacl.signing import VerifyKey
 
+try:
+    from common.ledger import LedgerVerifier, ZERO_ROOT, parse_line
+    from common.segments import iter_lines, list_segments, plan_chunks
+    from common.sketch import LatencySketch
+except ImportError:  # imported from the repo root (tests)
+    from services.common.ledger import LedgerVerifier, ZERO_ROOT, parse_line
+    from services.common.segments import iter_lines, list_segments, plan_chunks
+    from services.common.sketch import LatencySketch
+
+INVALID_KEEP = 1000
+
 
 def find_logs(base_dir: Path, start: date, end: date) -> List[Path]:
     paths = []
@@ -18,10 +31,9 @@ def find_logs(base_dir: Path, start: date, end: date) -> List[Path]:
         except ValueError:
             continue
         if start <= d <= end:
-            f = p / "decision.log.jsonl"
-            if f.exists():
-                paths.append(f)
-    return sorted(paths)
+            paths.append(p)
+    # plain and compressed segments in write order, per day
+    return [seg for day in sorted(paths) for seg in list_segments(day)]
 
 
 def load_verify_key(keys_dir: Path) -> VerifyKey:
@@ -29,26 +41,110 @@ def load_verify_key(keys_dir: Path) -> VerifyKey:
     return VerifyKey(pk_path.read_bytes())
 
 
-def verify_and_aggregate(logs: List[Path], vk: VerifyKey) -> Dict[str, Any]:
-    total = 0
-    detections = 0
-    latencies = []
+def _verify_chunk(task: Tuple[str, int, int, bytes]) -> Dict[str, Any]:
+    path, start, end, pk = task
+    verifier = LedgerVerifier(VerifyKey(pk))
+    sketch = LatencySketch()
+    out: Dict[str, Any] = {"path": path, "start": start, "bytes": end - start, "total": 0, "invalid": 0, "detections": 0, "by_class": {}, "invalid_records": [], "first_prev": None}
+    for offset, line in iter_lines(Path(path), start, end):
+        if not line.strip():
+            continue
+        try:
+            wrapped = parse_line(line)
+            ok = verifier.feed(wrapped)
+        except ValueError:
+            wrapped, ok = {}, False
+        if ok is None:
+            if out["first_prev"] is None:
+                out["first_prev"] = wrapped["batch"].get("prev")
+            continue
+        rec = wrapped.get("record") if isinstance(wrapped.get("record"), dict) else {}
+        out["total"] += 1
+        if not ok:
+            out["invalid"] += 1
+            if len(out["invalid_records"]) < INVALID_KEEP:
+                out["invalid_records"].append({"file": path, "offset": offset, "frame_id": rec.get("frame_id")})
+            continue
+        dets = rec.get("detections") or []
+        out["detections"] += len(dets)
+        for d in dets:
+            cls = str(d.get("class_id", "unknown")) if isinstance(d, dict) else "unknown"
+            out["by_class"][cls] = out["by_class"].get(cls, 0) + 1
+        if isinstance(rec.get("latency_ms"), (int, float)):
+            sketch.add(float(rec["latency_ms"]))
+    out["chain_breaks"] = verifier.chain_breaks
+    out["last_root"] = verifier.last_root
+    out["latency"] = sketch.to_dict()
+    return out
+
+
+def verify_and_aggregate(
+    logs: List[Path],
+    vk: VerifyKey,
+    workers: Optional[int] = None,
+    chunk_mb: float = 64.0,
+    progress: bool = False,
+) -> Dict[str, Any]:
+    """Verify every record across ``workers`` processes, chunking large files.
+
+    Bad signatures are counted and listed (first ``INVALID_KEEP``) rather than
+    aborting the run.
+    """
+    pk = bytes(vk)
+    tasks = []
     for log in logs:
-        for line in log.read_text().splitlines():
-            wrapped = json.loads(line)
-            data = json.dumps(wrapped["record"], sort_keys=True).encode()
-            sig = bytes.fromhex(wrapped["sig"])
-            vk.verify(data, sig)
-            total += 1
-            detections += len(wrapped["record"].get("detections", []))
-            if "latency_ms" in wrapped["record"]:
-                latencies.append(wrapped["record"]["latency_ms"])
-    p95 = 0
-    if latencies:
-        latencies.sort()
-        idx = int(0.95 * (len(latencies) - 1))
-        p95 = latencies[idx]
-    return {"total": total, "detections": detections, "latency_p95_ms": p95}
+        for start, end in plan_chunks(log, max(1, int(chunk_mb * 1024 * 1024))):
+            tasks.append((str(log), start, end, pk))
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    done_bytes = 0
+    done_records = 0
+
+    def _collect(part: Dict[str, Any]) -> None:
+        nonlocal done_bytes, done_records
+        results.append(part)
+        done_bytes += part["bytes"]
+        done_records += part["total"]
+        if progress:
+            el = max(time.perf_counter() - t0, 1e-9)
+            print(f"[exporter] {len(results)}/{len(tasks)} chunks, {done_records} records, {done_records / el:.0f} rec/s, {done_bytes / el / 1e6:.1f} MB/s", file=sys.stderr, flush=True)
+
+    if workers <= 1 or len(tasks) <= 1:
+        for t in tasks:
+            _collect(_verify_chunk(t))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            for part in pool.map(_verify_chunk, tasks):
+                _collect(part)
+
+    sketch = LatencySketch()
+    summary: Dict[str, Any] = {"total": 0, "invalid": 0, "detections": 0, "detections_by_class": {}, "invalid_records": [], "chain_breaks": 0}
+    results.sort(key=lambda r: (r["path"], r["start"]))
+    last_root: Dict[str, Optional[str]] = {}
+    for r in results:
+        for k in ("total", "invalid", "detections", "chain_breaks"):
+            summary[k] += r[k]
+        for cls, n in r["by_class"].items():
+            summary["detections_by_class"][cls] = summary["detections_by_class"].get(cls, 0) + n
+        room = INVALID_KEEP - len(summary["invalid_records"])
+        summary["invalid_records"].extend(r["invalid_records"][:max(0, room)])
+        sketch.merge(LatencySketch.from_dict(r["latency"]))
+        # batch chains continue across chunks and segments within a day; a new
+        # chain (ZERO_ROOT) may only start at the beginning of a segment
+        day = str(Path(r["path"]).parent)
+        prev_root = last_root.get(day)
+        if prev_root is not None and r["first_prev"] is not None and r["first_prev"] != prev_root:
+            if not (r["first_prev"] == ZERO_ROOT and r["start"] == 0):
+                summary["chain_breaks"] += 1
+        if r["last_root"] is not None:
+            last_root[day] = r["last_root"]
+    elapsed = time.perf_counter() - t0
+    summary["detections_by_class"] = dict(sorted(summary["detections_by_class"].items()))
+    summary["latency_p50_ms"], summary["latency_p95_ms"], summary["latency_p99_ms"] = sketch.quantiles((0.50, 0.95, 0.99))
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["records_per_s"] = round(summary["total"] / elapsed, 1) if elapsed > 0 else 0.0
+    return summary
 
 
 def main():
@@ -58,6 +154,10 @@ def main():
     ap.add_argument("--out", dest="out", required=True)
     ap.add_argument("--format", dest="fmt", choices=["md", "pdf"], default="md")
     ap.add_argument("--base", dest="base", default="/app/data/governance")
+    ap.add_argument("--workers", type=int, default=None, help="verification processes (default: CPU count)")
+    ap.add_argument("--chunk-mb", type=float, default=64.0, help="split log files into chunks of about this size")
+    ap.add_argument("--fail-on-invalid", action="store_true", help="exit 1 if any record fails verification or the batch chain is broken")
+    ap.add_argument("--quiet", action="store_true", help="no progress output")
     args = ap.parse_args()
 
     start = datetime.strptime(args.date_from, "%Y-%m-%d").date()
@@ -67,7 +167,7 @@ def main():
     if not logs:
         raise SystemExit("no logs in range")
     vk = load_verify_key(base / "keys")
-    summary = verify_and_aggregate(logs, vk)
+    summary = verify_and_aggregate(logs, vk, workers=args.workers, chunk_mb=args.chunk_mb, progress=not args.quiet)
 
     env = Environment(loader=FileSystemLoader(str(Path(__file__).parent / "templates")))
     tmpl = env.get_template("report.md.j2")
@@ -79,6 +179,12 @@ def main():
             subprocess.check_call(["pandoc", str(out_path), "-o", str(out_path.with_suffix(".pdf"))])
         except Exception as e:
             raise SystemExit(f"pandoc conversion failed: {e}")
+    if summary["invalid"]:
+        print(f"[exporter] {summary['invalid']} records failed verification", file=sys.stderr, flush=True)
+    if summary["chain_breaks"]:
+        print(f"[exporter] {summary['chain_breaks']} batch chain breaks", file=sys.stderr, flush=True)
+    if args.fail_on_invalid and (summary["invalid"] or summary["chain_breaks"]):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
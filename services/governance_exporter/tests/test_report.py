@@ -27,3 +27,68 @@ def test_verify_and_aggregate(tmp_path: Path):
     assert summary["total"] == 1 and summary["detections"] == 1
 
 
+
+
+def test_parallel_chunks_collect_invalid_records(tmp_path: Path):
+    from services.results_adapter.governance import GovernanceLogger, GroupCommitWriter
+
+    gov = GovernanceLogger(base_dir=tmp_path)
+    w = GroupCommitWriter(gov, batch_max=16, flush_ms=10_000, batch_sign=True)
+    for i in range(100):
+        w.submit({"frame_id": str(i), "detections": [{"class_id": 1, "score": 0.9}], "latency_ms": float(i)})
+    w.flush()
+    for i in range(20):
+        gov.append_signed({"frame_id": f"s{i}", "detections": []})
+    log = gov._log_path(datetime.utcnow())
+    # corrupt one batch-signed and one self-signed record
+    lines = log.read_text().splitlines()
+    for idx in (5, len(lines) - 1):
+        d = json.loads(lines[idx])
+        d["record"]["frame_id"] = "tampered"
+        lines[idx] = json.dumps(d)
+    log.write_text("\n".join(lines) + "\n")
+
+    serial = verify_and_aggregate([log], gov.verify_key, workers=1)
+    parallel = verify_and_aggregate([log], gov.verify_key, workers=2, chunk_mb=0.002)
+    for s in (serial, parallel):
+        assert s["total"] == 120 and s["invalid"] == 2 and s["chain_breaks"] == 0
+        assert {r["frame_id"] for r in s["invalid_records"]} == {"tampered"}
+    assert parallel["detections"] == serial["detections"] == 99
+    assert parallel["latency_p95_ms"] == serial["latency_p95_ms"]
+
+
+def test_deleted_batch_is_reported_and_fails_the_export(tmp_path: Path, monkeypatch, capsys):
+    import sys
+    from services.governance_exporter import generate_report
+    from services.results_adapter.governance import GovernanceLogger, GroupCommitWriter
+
+    gov = GovernanceLogger(base_dir=tmp_path)
+    w = GroupCommitWriter(gov, batch_max=4, flush_ms=10_000, batch_sign=True)
+    for i in range(12):
+        w.submit({"frame_id": str(i), "detections": []})
+        if i % 4 == 3:
+            w.flush()
+    w.stop()
+    log = gov._log_path(datetime.utcnow())
+    # drop the middle batch: its header and all of its records
+    lines = log.read_text().splitlines()
+    headers = [i for i, l in enumerate(lines) if l.startswith('{"batch"')]
+    assert len(headers) == 3
+    log.write_text("\n".join(lines[:headers[1]] + lines[headers[2]:]) + "\n")
+
+    summary = verify_and_aggregate([log], gov.verify_key, workers=1)
+    assert summary["total"] == 8 and summary["invalid"] == 0 and summary["chain_breaks"] == 1
+
+    day = datetime.utcnow().strftime("%Y-%m-%d")
+    out = tmp_path / "report.md"
+    argv = ["generate_report", "--from", day, "--to", day, "--out", str(out), "--base", str(tmp_path), "--workers", "1", "--quiet"]
+    monkeypatch.setattr(sys, "argv", argv)
+    generate_report.main()  # reported, but no --fail-on-invalid
+    assert "Batch chain breaks: 1" in out.read_text()
+    monkeypatch.setattr(sys, "argv", argv + ["--fail-on-invalid"])
+    try:
+        generate_report.main()
+    except SystemExit as e:
+        assert e.code == 1
+    else:
+        raise AssertionError("--fail-on-invalid passed a broken chain")
@@ -1,22 +1,24 @@
 import os
 import io
 import time
-from typing import Dict, Any, List
+from pathlib import Path
+from typing import Dict, Any, List, Optional
 
 import numpy as np
-from fastapi import FastAPI, File, UploadFile, Form, Body
+from fastapi import FastAPI, File, UploadFile, Form, Body, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 import uvicorn
 from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 from infer import InferenceEngine
+from registry import ModelRegistry
+from gate import CascadeGate, GateSet, OnnxScorer, ReferenceScorer, load_scorer
+from common.stream import serve as serve_stream
+from common.profiler import install_profiler
+from common.tracing import Tracing, frame_span, keep
 
 
 app = FastAPI(title="EdgeSight QA - Inference")
@@ -29,17 +31,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# OpenTelemetry minimal bootstrap
+otel_spans = Counter("otel_spans_total", "Finished spans by sampling outcome (sampled, kept, dropped, queue_full)", ["decision"])
+otel_export_spans = Counter("otel_export_spans_total", "Spans sent to the OTLP exporter", ["result"])
+otel_export_ms = Histogram("otel_export_ms", "OTLP span export batch latency (ms)", buckets=(1,5,10,25,50,100,250,500,1000,5000))
+otel_export_queue = Gauge("otel_export_queue_depth", "Spans waiting in the batch span processor for export")
+
+
+def _on_otel_export(n: int, ok: bool, ms: float) -> None:
+    otel_export_spans.labels("ok" if ok else "failed").inc(n)
+    otel_export_ms.observe(ms)
+
+
+# OpenTelemetry bootstrap: parent-based ratio sampling, keeping defect/error/slow traces (common/tracing.py)
+tracing = Tracing(on_span=lambda decision, n: otel_spans.labels(decision).inc(n), on_export=_on_otel_export)
+otel_export_queue.set_function(tracing.queue_depth)
+
+
 def _init_tracing():
-    import os
     if os.getenv("OTEL_ENABLED", "1").lower() in ("1", "true", "yes"):
-        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://otel-collector:4317")
-        insecure = os.getenv("OTEL_EXPORTER_OTLP_INSECURE", "1").lower() in ("1", "true", "yes")
-        resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "inference")})
-        provider = TracerProvider(resource=resource)
-        exporter = OTLPSpanExporter(endpoint=endpoint, insecure=insecure)
-        provider.add_span_processor(BatchSpanProcessor(exporter))
-        trace.set_tracer_provider(provider)
+        tracing.install(os.getenv("OTEL_SERVICE_NAME", "inference"))
         FastAPIInstrumentor().instrument_app(app)
 
 _init_tracing()
@@ -47,12 +57,90 @@ _init_tracing()
 infer_ms = Histogram("model_infer_ms", "Model inference time (ms)", buckets=(1,5,10,20,50,100,200,500))
 num_detections = Histogram("n_detections", "Number of detections per frame", buckets=(0,1,2,3,5,10))
 gpu_in_use = Gauge("gpu_in_use", "1 if GPU EP active, else 0")
+model_loads = Counter("model_loads_total", "Model sessions loaded by the registry", ["model"])
+model_evictions = Counter("model_evictions_total", "Model sessions evicted by the registry", ["model"])
+model_resident_mb = Gauge("model_resident_mb", "Approx resident memory per loaded model (MB)", ["model"])
+gate_frames = Counter("gate_frames_total", "Frames scored by the cascade gate", ["decision", "gate"])
+gate_score_ms = Histogram("gate_score_ms", "Cascade gate scoring time (ms)", buckets=(0.1,0.5,1,2,5,10,20,50))
+gate_pass_rate = Gauge("gate_pass_rate", "Fraction of frames forwarded to the full detector", ["gate"])
+gate_audits = Counter("gate_audits_total", "Gated-out frames re-checked by the full detector")
+gate_audit_misses = Counter("gate_audit_misses_total", "Audited gated-out frames where the detector found something")
+stream_connections = Gauge("infer_stream_connections", "Open /infer/stream connections")
+stream_frames = Counter("infer_stream_frames_total", "Frames received over /infer/stream")
+model_cold_load_ms = Histogram("model_cold_load_ms", "Cold model load latency (ms)", buckets=(10,50,100,250,500,1000,2500,5000))
 
 engine = InferenceEngine(os.getenv("MODEL_PATH", "/app/assets/yolov8n.onnx"))
 gpu_in_use.set(1 if engine.gpu_in_use else 0)
 _ready = engine.ready
 
 
+def _on_model_load(key: str, ms: float, size_mb: float) -> None:
+    model_loads.labels(key).inc()
+    model_cold_load_ms.observe(ms)
+    model_resident_mb.labels(key).set(size_mb)
+
+
+def _on_model_evict(key: str) -> None:
+    model_evictions.labels(key).inc()
+    model_resident_mb.labels(key).set(0)
+
+
+# Optional multi-model registry: {"models": {"line-1/cam-A": "/app/assets/a.onnx", ...}, "memory_budget_mb": 2048}
+registry: Optional[ModelRegistry] = None
+_registry_path = Path(os.getenv("MODEL_REGISTRY_PATH", "/app/assets/models.json"))
+if _registry_path.exists():
+    try:
+        _budget = os.getenv("MODEL_MEMORY_BUDGET_MB")
+        registry = ModelRegistry.from_file(
+            _registry_path,
+            InferenceEngine,
+            budget_mb=float(_budget) if _budget else None,
+            on_load=_on_model_load,
+            on_evict=_on_model_evict,
+        )
+    except Exception as e:
+        print(f"[inference] failed to load model registry {_registry_path}: {e}", flush=True)
+        registry = None
+
+
+def _build_gate(path: str, threshold: Optional[float] = None, mode: Optional[str] = None) -> CascadeGate:
+    z_pixel = float(os.getenv("GATE_Z_PIXEL", "3.0"))
+    if mode == "reference":
+        scorer = ReferenceScorer.from_npz(path, z_pixel=z_pixel)
+    elif mode == "onnx":
+        scorer = OnnxScorer(path)
+    else:
+        scorer = load_scorer(path, z_pixel=z_pixel)
+    return CascadeGate(
+        scorer,
+        threshold=threshold if threshold is not None else float(os.getenv("GATE_THRESHOLD", "0.01")),
+        audit_every=int(os.getenv("GATE_AUDIT_EVERY", "100")),
+    )
+
+
+# Optional first stage: GATE_MODE=reference (npz with mean/std) or onnx (small classifier)
+gate: Optional[CascadeGate] = None
+_gate_mode = os.getenv("GATE_MODE", "off").lower()
+if _gate_mode in ("reference", "onnx"):
+    try:
+        _gate_path = os.getenv("GATE_PATH", "/app/assets/gate_ref.npz" if _gate_mode == "reference" else "/app/assets/gate.onnx")
+        gate = _build_gate(_gate_path, mode=_gate_mode)
+    except Exception as e:
+        print(f"[inference] cascade gate disabled: {e}", flush=True)
+        gate = None
+
+# GATE_* above is the default model's gate; registry keys bring their own ("gate" in the entry) or skip gating
+gates = GateSet(_build_gate, default=gate)
+
+
+def _engine_for(model_key: Optional[str]) -> InferenceEngine:
+    if registry is not None and model_key:
+        eng = registry.get(model_key)
+        if eng is not None:
+            return eng
+    return engine
+
+
 @app.get("/healthz")
 def healthz():
     return {"status": "ok", "model_loaded": engine.ready}
@@ -64,18 +152,24 @@ def readyz():
     return ({"status": "ready"} if ok else Response(status_code=503))
 
 
+# /debug/profile and the event_loop_lag_ms histogram (common/profiler.py)
+install_profiler(app)
+
+
 @app.get("/metrics")
 def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.post("/infer")
-def infer(frame_id: str = Form(...), ts_monotonic_ns: int = Form(...), tensor: UploadFile = File(...), shape: UploadFile = File(...), dtype: UploadFile = File(...)) -> Dict[str, Any]:
+def infer(frame_id: str = Form(...), ts_monotonic_ns: int = Form(...), tensor: UploadFile = File(...), shape: UploadFile = File(...), dtype: UploadFile = File(...), model_key: Optional[str] = Form(None)) -> Dict[str, Any]:
     # Attach span attributes for correlation
     try:
         span = trace.get_current_span()
         span.set_attribute("frame_id", frame_id)
         span.set_attribute("ts_monotonic_ns", int(ts_monotonic_ns))
+        if model_key:
+            span.set_attribute("model_key", model_key)
     except Exception:
         pass
     tensor_bytes = tensor.file.read()
@@ -85,12 +179,71 @@ def infer(frame_id: str = Form(...), ts_monotonic_ns: int = Form(...), tensor: U
     shape_list = [int(x.strip()) for x in clean.split(',') if x.strip()]
     dtype_str = dtype.file.read().decode().strip()
     arr = np.frombuffer(tensor_bytes, dtype=np.dtype(dtype_str)).reshape(shape_list)
+    out = _infer_array(frame_id, ts_monotonic_ns, arr, model_key)
+    if out["detections"]:
+        keep("defect")
+    return out
+
+
+def _gate_for(model_key: Optional[str]) -> tuple[Optional[CascadeGate], str]:
+    gate_key = gate_path = gate_threshold = None
+    if registry is not None and model_key:
+        gate_key, gate_path, gate_threshold = registry.gate_for(model_key)
+    return gates.for_key(gate_key, gate_path, gate_threshold), gate_key or "default"
+
+
+def _infer_array(frame_id: str, ts_monotonic_ns: int, arr: np.ndarray, model_key: Optional[str] = None) -> Dict[str, Any]:
+    eng = _engine_for(model_key)
+    frame_gate, gate_label = _gate_for(model_key)
     t0 = time.perf_counter()
-    detections = engine.run(arr)
+    audit = False
+    if frame_gate is not None:
+        forward, gate_score, audit = frame_gate.check(arr)
+        t_gate = time.perf_counter()
+        gate_score_ms.observe((t_gate - t0) * 1000.0)
+        gate_frames.labels("pass" if forward else "skip", gate_label).inc()
+        gate_pass_rate.labels(gate_label).set(frame_gate.pass_rate())
+        if not forward and not audit:
+            num_detections.observe(0)
+            out = {"frame_id": frame_id, "ts_monotonic_ns": ts_monotonic_ns, "detections": [], "gated": True, "gate_score": gate_score}
+            if model_key:
+                out["model_key"] = model_key
+            return out
+        t0 = t_gate
+    detections = eng.run(arr)
     t1 = time.perf_counter()
     infer_ms.observe((t1 - t0) * 1000.0)
     num_detections.observe(len(detections))
-    return {"frame_id": frame_id, "ts_monotonic_ns": ts_monotonic_ns, "detections": detections}
+    if audit:
+        frame_gate.record_audit(frame_id, gate_score, detections)
+        gate_audits.inc()
+        if detections:
+            gate_audit_misses.inc()
+    out = {"frame_id": frame_id, "ts_monotonic_ns": ts_monotonic_ns, "detections": detections}
+    if model_key:
+        out["model_key"] = model_key
+    return out
+
+
+def _infer_stream_frame(header: Dict[str, Any], payload: bytes) -> Dict[str, Any]:
+    with frame_span("infer.frame", header) as span:
+        if header.get("model_key"):
+            span.set_attribute("model_key", header["model_key"])
+        arr = np.frombuffer(payload, dtype=np.dtype(header.get("dtype", "float32"))).reshape(header["shape"])
+        out = _infer_array(str(header["frame_id"]), int(header.get("ts_monotonic_ns", 0)), arr, header.get("model_key"))
+        if out["detections"]:
+            keep("defect")
+        return out
+
+
+@app.websocket("/infer/stream")
+async def infer_stream(websocket: WebSocket):
+    # same work as /infer, many frames in flight on one connection (see common/stream.py)
+    stream_connections.inc()
+    try:
+        await serve_stream(websocket, _infer_stream_frame, credits=int(os.getenv("STREAM_CREDITS", "4")), on_request=stream_frames.inc)
+    finally:
+        stream_connections.dec()
 
 
 @app.patch("/config")
@@ -98,12 +251,22 @@ def patch_config(cfg: Dict[str, Any] = Body(...)):
     threshold = cfg.get("conf_threshold")
     offline_force = cfg.get("offline_force") or cfg.get("demo_force")
     updated = {}
+    engines = [engine] + (registry.engines() if registry is not None else [])
     if threshold is not None:
-        engine.set_threshold(float(threshold))
+        for eng in engines:
+            eng.set_threshold(float(threshold))
         updated["conf_threshold"] = engine.conf_threshold
+    if cfg.get("gate_threshold") is not None:
+        # the default model's gate, or one registry key's with "gate_key"
+        target = gates.gates().get(cfg["gate_key"]) if cfg.get("gate_key") else gate
+        if target is not None:
+            target.threshold = float(cfg["gate_threshold"])
+            updated["gate_threshold"] = target.threshold
     if offline_force is not None:
-        engine.set_offline_force(bool(offline_force))
+        for eng in engines:
+            eng.set_offline_force(bool(offline_force))
         updated["offline_force"] = engine.offline_force
+    updated.update(tracing.settings.update(cfg))
     return {"updated": updated}
 
 
@@ -120,6 +283,9 @@ def get_config():
         "gpu_in_use": bool(engine.gpu_in_use),
         "providers": providers,
         "ready": bool(engine.ready),
+        "gate": gate.stats() if gate is not None else None,
+        "model_gates": {k: g.stats() for k, g in gates.gates().items()},
+        **tracing.settings.to_dict(),
     }
 
 
@@ -128,6 +294,21 @@ def status():
     return get_config()
 
 
+@app.get("/gate")
+def gate_status():
+    model_gates = {k: {**g.stats(), "audit_samples": g.audits()} for k, g in gates.gates().items()}
+    if gate is None:
+        return {"enabled": bool(model_gates), "models": model_gates}
+    return {"enabled": True, **gate.stats(), "audit_samples": gate.audits(), "models": model_gates}
+
+
+@app.get("/models")
+def models():
+    if registry is None:
+        return {"registry": False, "default": engine.model_path}
+    return {"registry": True, "default": engine.model_path, **registry.stats()}
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "9003")))
 
@@ -0,0 +1,226 @@
+"""Inference benchmark with regression baselines.
+
+Sweeps batch size, intra-op threads, execution provider and input resolution
+through ``InferenceEngine``'s ONNX Runtime session, using synthetic tensors or
+recorded ``.npy`` tensors. Run from the repo root:
+
+    python -m services.inference.bench --model assets/yolov8n.onnx \
+        --batch 1,4 --threads 1,4 --resolutions 640x360 --out bench.json
+    python -m services.inference.bench --model assets/yolov8n.onnx \
+        --baseline ops/bench/inference-baseline.json --max-regression 10
+
+Each configuration runs in a fresh process so peak RSS is per configuration.
+Exits non-zero when any configuration regresses past ``--max-regression``.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from infer import InferenceEngine
+except ImportError:  # running from the repo root
+    from services.inference.infer import InferenceEngine
+
+
+def summarize_latencies(timings_ms: List[float], frames: int, elapsed_s: float) -> Dict[str, float]:
+    arr = np.asarray(timings_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99]) if arr.size else (0.0, 0.0, 0.0)
+    return {
+        "latency_p50_ms": float(p50),
+        "latency_p95_ms": float(p95),
+        "latency_p99_ms": float(p99),
+        "latency_mean_ms": float(arr.mean()) if arr.size else 0.0,
+        "throughput_fps": frames / elapsed_s if elapsed_s > 0 else 0.0,
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_recorded(input_dir: Path, limit: int = 64) -> List[np.ndarray]:
+    tensors = [np.load(p).astype(np.float32) for p in sorted(input_dir.glob("*.npy"))[:limit]]
+    if not tensors:
+        raise SystemExit(f"no .npy tensors in {input_dir}")
+    return [t[0] if t.ndim == 4 else t for t in tensors]
+
+
+def _input_hw(engine: InferenceEngine, requested: Tuple[int, int]) -> Tuple[int, int]:
+    shape = engine.session.get_inputs()[0].shape
+    if len(shape) == 4 and isinstance(shape[2], int) and isinstance(shape[3], int):
+        return shape[2], shape[3]
+    return requested
+
+
+def run_config(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    engine = InferenceEngine(cfg["model"], providers=[cfg["provider"]], intra_op_threads=cfg["threads"])
+    if engine.session is None:
+        return {"config": cfg, "error": "model failed to load"}
+    active = engine.session.get_providers()
+    if cfg["provider"] not in active:
+        return {"config": cfg, "error": f"provider unavailable (active: {active})"}
+    h, w = _input_hw(engine, (cfg["height"], cfg["width"]))
+    if cfg.get("input_dir"):
+        pool = load_recorded(Path(cfg["input_dir"]))
+    else:
+        rng = np.random.default_rng(0)
+        pool = [rng.standard_normal((3, h, w), dtype=np.float32) for _ in range(4)]
+    batch = int(cfg["batch"])
+    batches = [np.stack([pool[(i * batch + j) % len(pool)] for j in range(batch)]) for i in range(max(1, len(pool)))]
+    name = engine.session.get_inputs()[0].name
+    try:
+        for i in range(cfg["warmup"]):
+            engine.session.run(None, {name: batches[i % len(batches)]})
+        timings = []
+        t_start = time.perf_counter()
+        for i in range(cfg["runs"]):
+            t0 = time.perf_counter()
+            engine.session.run(None, {name: batches[i % len(batches)]})
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        elapsed = time.perf_counter() - t_start
+    except Exception as e:
+        return {"config": cfg, "error": f"run failed: {e}"}
+    out = {"config": {**cfg, "height": h, "width": w}, "providers": active}
+    out.update(summarize_latencies(timings, frames=batch * cfg["runs"], elapsed_s=elapsed))
+    out["peak_rss_mb"] = _peak_rss_mb()
+    return out
+
+
+def config_key(cfg: Dict[str, Any]) -> str:
+    return f"b{cfg['batch']}-t{cfg['threads']}-{cfg['provider']}-{cfg['width']}x{cfg['height']}"
+
+
+def sweep(configs: List[Dict[str, Any]], isolate: bool = True) -> List[Dict[str, Any]]:
+    results = []
+    ctx = mp.get_context("spawn")
+    for cfg in configs:
+        if isolate:
+            with ctx.Pool(1) as pool:
+                res = pool.apply(run_config, (cfg,))
+        else:
+            res = run_config(cfg)
+        res["key"] = config_key(res["config"])
+        results.append(res)
+        print(json.dumps({k: res.get(k) for k in ("key", "latency_p50_ms", "latency_p95_ms", "throughput_fps", "error")}), file=sys.stderr, flush=True)
+    return results
+
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], max_regression_pct: float) -> List[str]:
+    """Regressions against the baseline's working configs; one that now errors or was not run counts too."""
+    base = {r["key"]: r for r in baseline.get("results", []) if "error" not in r}
+    current = {r["key"]: r for r in results}
+    regressions = []
+    limit = max_regression_pct / 100.0
+    for key, b in base.items():
+        r = current.get(key)
+        if r is None:
+            regressions.append(f"{key} missing from results")
+            continue
+        if "error" in r:
+            regressions.append(f"{key} error: {r['error']}")
+            continue
+        for metric in ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms"):
+            if not b.get(metric):
+                continue
+            if r.get(metric) is None:
+                regressions.append(f"{key} {metric} missing")
+            elif r[metric] > b[metric] * (1.0 + limit):
+                regressions.append(f"{key} {metric} {b[metric]:.2f} -> {r[metric]:.2f}")
+        if b.get("throughput_fps"):
+            if r.get("throughput_fps") is None:
+                regressions.append(f"{key} throughput_fps missing")
+            elif r["throughput_fps"] < b["throughput_fps"] * (1.0 - limit):
+                regressions.append(f"{key} throughput_fps {b['throughput_fps']:.1f} -> {r['throughput_fps']:.1f}")
+    return regressions
+
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def _resolutions(text: str) -> List[Tuple[int, int]]:
+    out = []
+    for item in text.split(","):
+        w, h = item.lower().split("x")
+        out.append((int(w), int(h)))
+    return out
+
+
+def build_configs(args) -> List[Dict[str, Any]]:
+    configs = []
+    for provider in [p for p in args.providers.split(",") if p]:
+        for threads in _ints(args.threads):
+            for batch in _ints(args.batch):
+                for w, h in _resolutions(args.resolutions):
+                    configs.append({
+                        "model": args.model,
+                        "provider": provider,
+                        "threads": threads,
+                        "batch": batch,
+                        "width": w,
+                        "height": h,
+                        "runs": args.runs,
+                        "warmup": args.warmup,
+                        "input_dir": args.input_dir or None,
+                    })
+    return configs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark InferenceEngine across batch/threads/provider/resolution")
+    ap.add_argument("--model", required=True)
+    ap.add_argument("--batch", default="1")
+    ap.add_argument("--threads", default=str(os.cpu_count() or 1))
+    ap.add_argument("--providers", default="CPUExecutionProvider")
+    ap.add_argument("--resolutions", default="640x360", help="WxH list; ignored for models with static input dims")
+    ap.add_argument("--input-dir", default="", help="recorded .npy CHW tensors instead of synthetic input")
+    ap.add_argument("--runs", type=int, default=100)
+    ap.add_argument("--warmup", type=int, default=10)
+    ap.add_argument("--no-isolate", action="store_true", help="run all configs in this process")
+    ap.add_argument("--out", default="", help="write results JSON here")
+    ap.add_argument("--baseline", default="", help="baseline JSON from a previous --out")
+    ap.add_argument("--max-regression", type=float, default=10.0, help="allowed regression in percent")
+    args = ap.parse_args(argv)
+
+    report = {
+        "meta": {
+            "model": args.model,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": sweep(build_configs(args), isolate=not args.no_isolate),
+    }
+    try:
+        import onnxruntime as ort  # type: ignore
+        report["meta"]["onnxruntime"] = ort.__version__
+    except Exception:
+        pass
+    rc = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_to_baseline(report["results"], baseline, args.max_regression)
+        report["regressions"] = regressions
+        if regressions:
+            rc = 1
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Cheap first-stage anomaly gate run before the full detector.
+
+Build a reference from known-good frames (run from the repo root):
+
+    python -m services.inference.gate --frames-dir data/frames/good --out assets/gate_ref.npz
+"""
+import argparse
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class ReferenceScorer:
+    """Fraction of pixels deviating more than ``z_pixel`` sigmas from a good-part reference."""
+
+    def __init__(self, mean: np.ndarray, std: np.ndarray, z_pixel: float = 3.0, eps: float = 1e-3):
+        self.mean = mean.astype(np.float32)
+        self.inv_std = (1.0 / (std.astype(np.float32) + eps)).astype(np.float32)
+        self.z_pixel = float(z_pixel)
+
+    @classmethod
+    def from_npz(cls, path: str, z_pixel: float = 3.0) -> "ReferenceScorer":
+        data = np.load(path)
+        return cls(data["mean"], data["std"], z_pixel=z_pixel)
+
+    def score(self, tensor_chw: np.ndarray) -> float:
+        if tensor_chw.shape != self.mean.shape:
+            # Resolution changed under us; let everything through rather than guess
+            return 1.0
+        z = np.abs(tensor_chw - self.mean)
+        z *= self.inv_std
+        return float(np.count_nonzero(z.max(axis=0) > self.z_pixel)) / float(z.shape[1] * z.shape[2])
+
+
+class OnnxScorer:
+    """Small classifier; the last element of the first output is the anomaly probability."""
+
+    def __init__(self, model_path: str):
+        import onnxruntime as ort  # type: ignore
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        shape = inp.shape
+        self.input_hw: Optional[Tuple[int, int]] = None
+        if len(shape) == 4 and isinstance(shape[2], int) and isinstance(shape[3], int):
+            self.input_hw = (shape[2], shape[3])
+
+    def score(self, tensor_chw: np.ndarray) -> float:
+        x = tensor_chw
+        if self.input_hw is not None and x.shape[1:] != self.input_hw:
+            # Nearest-neighbour decimation; cheap and good enough for a gate
+            ys = np.linspace(0, x.shape[1] - 1, self.input_hw[0]).astype(np.intp)
+            xs = np.linspace(0, x.shape[2] - 1, self.input_hw[1]).astype(np.intp)
+            x = x[:, ys][:, :, xs]
+        out = self.session.run(None, {self.input_name: x[None, ...].astype(np.float32)})[0]
+        return float(np.asarray(out).ravel()[-1])
+
+
+class CascadeGate:
+    """Forwards frames scoring at or above ``threshold``; audits every Nth gated-out frame."""
+
+    def __init__(self, scorer, threshold: float, audit_every: int = 100, audit_keep: int = 50):
+        self.scorer = scorer
+        self.threshold = float(threshold)
+        self.audit_every = max(0, int(audit_every))
+        self.seen = 0
+        self.passed = 0
+        self.audited = 0
+        self.audit_misses = 0
+        self._gated_out = 0
+        self._audits: Deque[Dict[str, Any]] = deque(maxlen=audit_keep)
+        self._lock = threading.Lock()
+
+    def check(self, tensor_chw: np.ndarray) -> Tuple[bool, float, bool]:
+        """Returns (forward, score, audit). ``audit`` frames should still run the detector."""
+        score = self.scorer.score(tensor_chw)
+        with self._lock:
+            self.seen += 1
+            if score >= self.threshold:
+                self.passed += 1
+                return True, score, False
+            self._gated_out += 1
+            audit = self.audit_every > 0 and self._gated_out % self.audit_every == 0
+            return False, score, audit
+
+    def record_audit(self, frame_id: str, score: float, detections: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.audited += 1
+            if detections:
+                self.audit_misses += 1
+            self._audits.append({
+                "frame_id": frame_id,
+                "ts": time.time(),
+                "gate_score": score,
+                "threshold": self.threshold,
+                "num_detections": len(detections),
+                "missed": bool(detections),
+            })
+
+    def pass_rate(self) -> float:
+        return self.passed / self.seen if self.seen else 0.0
+
+    def audits(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._audits)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold": self.threshold,
+            "seen": self.seen,
+            "passed": self.passed,
+            "pass_rate": self.pass_rate(),
+            "audit_every": self.audit_every,
+            "audited": self.audited,
+            "audit_misses": self.audit_misses,
+        }
+
+
+class GateSet:
+    """The default gate plus one gate per registry model key, built on first use.
+
+    A reference built for one camera's view says nothing about another's, so a
+    model key whose registry entry names no gate bypasses gating entirely.
+    """
+
+    def __init__(self, build: Callable[[str, Optional[float]], CascadeGate], default: Optional[CascadeGate] = None):
+        self.build = build
+        self.default = default
+        self._gates: Dict[str, Optional[CascadeGate]] = {}
+        self._lock = threading.Lock()
+
+    def for_key(self, key: Optional[str], path: Optional[str] = None, threshold: Optional[float] = None) -> Optional[CascadeGate]:
+        """``key`` is the resolved registry key (None for the default model)."""
+        if key is None:
+            return self.default
+        if not path:
+            return None
+        with self._lock:
+            if key in self._gates:
+                return self._gates[key]
+        try:
+            gate = self.build(path, threshold)
+        except Exception as e:
+            print(f"[inference] gate for {key} disabled: {e}", flush=True)
+            gate = None
+        with self._lock:
+            return self._gates.setdefault(key, gate)
+
+    def gates(self) -> Dict[str, CascadeGate]:
+        with self._lock:
+            return {k: g for k, g in self._gates.items() if g is not None}
+
+
+def load_scorer(path: str, z_pixel: float = 3.0):
+    """``.npz`` mean/std reference, anything else a small ONNX classifier."""
+    return ReferenceScorer.from_npz(path, z_pixel=z_pixel) if path.endswith(".npz") else OnnxScorer(path)
+
+
+def build_reference(tensors: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    stack = np.stack(tensors).astype(np.float32)
+    return stack.mean(axis=0), stack.std(axis=0)
+
+
+def main():
+    from services.inference.quantize import load_calibration_tensors
+
+    ap = argparse.ArgumentParser(description="Build a gate reference (mean/std) from known-good frames")
+    ap.add_argument("--frames-dir", required=True)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--limit", type=int, default=500)
+    args = ap.parse_args()
+    mean, std = build_reference(load_calibration_tensors(Path(args.frames_dir), limit=args.limit))
+    np.savez_compressed(args.out, mean=mean, std=std)
+    print(f"wrote reference {mean.shape} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ import numpy as np
 
 
 class InferenceEngine:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, providers: Optional[List[str]] = None, intra_op_threads: Optional[int] = None):
         self.model_path = model_path
         # ONNX Runtime session with EP selection (best-effort)
         self.session = None
@@ -15,14 +15,19 @@ class InferenceEngine:
         self.gpu_in_use = False
         try:
             import onnxruntime as ort  # type: ignore
-            prov = []
-            if 'TensorrtExecutionProvider' in ort.get_available_providers():
-                prov.append('TensorrtExecutionProvider')
-            if 'CUDAExecutionProvider' in ort.get_available_providers():
-                prov.append('CUDAExecutionProvider')
-            prov.append('CPUExecutionProvider')
+            prov = list(providers or [])
+            if not prov:
+                if 'TensorrtExecutionProvider' in ort.get_available_providers():
+                    prov.append('TensorrtExecutionProvider')
+                if 'CUDAExecutionProvider' in ort.get_available_providers():
+                    prov.append('CUDAExecutionProvider')
+                prov.append('CPUExecutionProvider')
+            opts = ort.SessionOptions()
+            threads = intra_op_threads if intra_op_threads is not None else int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+            if threads > 0:
+                opts.intra_op_num_threads = threads
             if Path(self.model_path).exists():
-                self.session = ort.InferenceSession(self.model_path, providers=prov)
+                self.session = ort.InferenceSession(self.model_path, sess_options=opts, providers=prov)
                 self.providers = self.session.get_providers()
                 self.gpu_in_use = any(p.startswith(('Tensorrt', 'CUDA')) for p in self.providers)
         except Exception:
@@ -0,0 +1,158 @@
+"""Static INT8 quantization with calibration from recorded frames.
+
+Calibration frames go through the same ``run_pipeline`` preprocessing the live
+service uses, so activation ranges match production inputs. Run from the repo
+root:
+
+    python -m services.inference.quantize --model assets/yolov8n.onnx \
+        --calib-dir data/frames/2025-09-06 --out assets/yolov8n.int8.onnx
+
+The output is a regular ONNX model (QDQ format); point ``MODEL_PATH`` at it.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import cv2
+import numpy as np
+
+from services.preprocess.ops import run_pipeline
+from services.inference.bench import summarize_latencies
+
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_calibration_tensors(calib_dir: Path, limit: int = 200) -> List[np.ndarray]:
+    paths = sorted(p for p in calib_dir.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    tensors = []
+    for p in paths[:limit]:
+        bgr = cv2.imread(str(p), cv2.IMREAD_COLOR)
+        if bgr is None:
+            continue
+        tensors.append(run_pipeline(bgr))
+    if not tensors:
+        raise SystemExit(f"no calibration frames found in {calib_dir}")
+    return tensors
+
+
+def _make_reader(input_name: str, tensors: List[np.ndarray]):
+    from onnxruntime.quantization import CalibrationDataReader  # type: ignore
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(tensors)
+
+        def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+            chw = next(self._it, None)
+            if chw is None:
+                return None
+            return {input_name: chw[None, ...].astype(np.float32)}
+
+        def rewind(self):
+            self._it = iter(tensors)
+
+    return FrameCalibrationReader()
+
+
+def quantize_model(model_path: Path, out_path: Path, tensors: List[np.ndarray], per_channel: bool = False) -> Path:
+    import onnxruntime as ort  # type: ignore
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType, CalibrationMethod  # type: ignore
+
+    sess = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+    input_name = sess.get_inputs()[0].name
+    quantize_static(
+        str(model_path),
+        str(out_path),
+        _make_reader(input_name, tensors),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    return out_path
+
+
+def benchmark_model(model_path: Path, tensors: List[np.ndarray], runs: int = 50, warmup: int = 5) -> Dict[str, Any]:
+    import onnxruntime as ort  # type: ignore
+
+    sess = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+    input_name = sess.get_inputs()[0].name
+    batches = [t[None, ...].astype(np.float32) for t in tensors]
+    for i in range(warmup):
+        sess.run(None, {input_name: batches[i % len(batches)]})
+    timings = []
+    outputs = []
+    t_start = time.perf_counter()
+    for i in range(runs):
+        t0 = time.perf_counter()
+        out = sess.run(None, {input_name: batches[i % len(batches)]})
+        timings.append((time.perf_counter() - t0) * 1000.0)
+        if i < len(batches):
+            outputs.append(out[0])
+    elapsed = time.perf_counter() - t_start
+    return {**summarize_latencies(timings, frames=runs, elapsed_s=elapsed), "outputs": outputs}
+
+
+def detection_agreement(ref: List[np.ndarray], cand: List[np.ndarray]) -> Dict[str, float]:
+    # Identical argmax on the first output means the same top detection/class wins.
+    n = min(len(ref), len(cand))
+    if n == 0:
+        return {"frames": 0, "top1_agreement": 0.0, "mean_cosine": 0.0, "max_abs_err": 0.0}
+    agree = 0
+    cosines = []
+    max_err = 0.0
+    for a, b in zip(ref[:n], cand[:n]):
+        fa = a.astype(np.float32).ravel()
+        fb = b.astype(np.float32).ravel()
+        if int(fa.argmax()) == int(fb.argmax()):
+            agree += 1
+        denom = float(np.linalg.norm(fa) * np.linalg.norm(fb))
+        cosines.append(float(fa @ fb) / denom if denom > 0 else 1.0)
+        max_err = max(max_err, float(np.abs(fa - fb).max()))
+    return {
+        "frames": n,
+        "top1_agreement": agree / n,
+        "mean_cosine": sum(cosines) / n,
+        "max_abs_err": max_err,
+    }
+
+
+def compare(fp32_path: Path, int8_path: Path, tensors: List[np.ndarray], runs: int = 50) -> Dict[str, Any]:
+    fp32 = benchmark_model(fp32_path, tensors, runs=runs)
+    int8 = benchmark_model(int8_path, tensors, runs=runs)
+    agreement = detection_agreement(fp32.pop("outputs"), int8.pop("outputs"))
+    speedup = fp32["latency_p50_ms"] / int8["latency_p50_ms"] if int8["latency_p50_ms"] > 0 else 0.0
+    return {
+        "fp32": {"path": str(fp32_path), "size_bytes": fp32_path.stat().st_size, **fp32},
+        "int8": {"path": str(int8_path), "size_bytes": int8_path.stat().st_size, **int8},
+        "speedup_p50": speedup,
+        "agreement": agreement,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Quantize an ONNX model to INT8 using recorded frames for calibration")
+    ap.add_argument("--model", required=True)
+    ap.add_argument("--calib-dir", required=True)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--limit", type=int, default=200, help="max calibration frames")
+    ap.add_argument("--per-channel", action="store_true")
+    ap.add_argument("--runs", type=int, default=100, help="benchmark iterations per model")
+    ap.add_argument("--report", default="", help="write the comparison JSON here as well as stdout")
+    args = ap.parse_args()
+
+    tensors = load_calibration_tensors(Path(args.calib_dir), limit=args.limit)
+    out_path = quantize_model(Path(args.model), Path(args.out), tensors, per_channel=args.per_channel)
+    report = compare(Path(args.model), out_path, tensors, runs=args.runs)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report:
+        Path(args.report).write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def _rss_bytes() -> int:
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    """Models keyed by ``line/camera/product``, loaded lazily and evicted LRU.
+
+    Keys are matched most-specific first: ``line-1/cam-A/bracket`` falls back to
+    ``line-1/cam-A``, then ``line-1``. Resident size is the RSS growth seen while
+    loading, floored at the model file size; when another cold load overlaps,
+    the RSS growth is shared, so only the file size is used. An entry is a model path, or
+    ``{"path": ..., "gate": ..., "gate_threshold": ...}`` to give that key its own
+    cascade gate. A cold load holds only that key's
+    load lock, so requests for models already resident never wait behind it.
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, str],
+        loader: Callable[[str], Any],
+        budget_mb: float = 2048.0,
+        on_load: Optional[Callable[[str, float, float], None]] = None,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.models: Dict[str, str] = {}
+        self.gate_paths: Dict[str, str] = {}
+        self.gate_thresholds: Dict[str, float] = {}
+        for k, v in models.items():
+            k = k.strip("/")
+            if isinstance(v, dict):
+                self.models[k] = v["path"]
+                if v.get("gate"):
+                    self.gate_paths[k] = v["gate"]
+                if v.get("gate_threshold") is not None:
+                    self.gate_thresholds[k] = float(v["gate_threshold"])
+            else:
+                self.models[k] = v
+        self.loader = loader
+        self.budget_mb = float(budget_mb)
+        self.on_load = on_load
+        self.on_evict = on_evict
+        self.loads = 0
+        self.evictions = 0
+        self._resident: "OrderedDict[str, Any]" = OrderedDict()
+        self._size_mb: Dict[str, float] = {}
+        self._cold_load_ms: Dict[str, float] = {}
+        self._lock = threading.RLock()  # guards the dicts and LRU order only, never held across a load
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loading: Dict[str, bool] = {}  # keys loading now -> another load overlapped it
+
+    @classmethod
+    def from_file(cls, path: Path, loader: Callable[[str], Any], **kwargs) -> "ModelRegistry":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        budget = kwargs.pop("budget_mb", None)
+        if budget is None:
+            budget = data.get("memory_budget_mb", 2048.0)
+        return cls(data.get("models", {}), loader, budget_mb=budget, **kwargs)
+
+    def resolve(self, key: str) -> Optional[str]:
+        parts = [p for p in key.strip("/").split("/") if p]
+        while parts:
+            candidate = "/".join(parts)
+            if candidate in self.models:
+                return candidate
+            parts.pop()
+        return None
+
+    def gate_for(self, key: str) -> Tuple[Optional[str], Optional[str], Optional[float]]:
+        """(resolved key, gate path, gate threshold); all None if ``key`` is not in the registry."""
+        resolved = self.resolve(key)
+        if resolved is None:
+            return None, None, None
+        return resolved, self.gate_paths.get(resolved), self.gate_thresholds.get(resolved)
+
+    def get(self, key: str) -> Optional[Any]:
+        resolved = self.resolve(key)
+        if resolved is None:
+            return None
+        with self._lock:
+            engine = self._resident.get(resolved)
+            if engine is not None:
+                self._resident.move_to_end(resolved)
+                return engine
+            load_lock = self._load_locks.setdefault(resolved, threading.Lock())
+        with load_lock:
+            # a concurrent caller may have loaded it while we waited
+            with self._lock:
+                engine = self._resident.get(resolved)
+                if engine is not None:
+                    self._resident.move_to_end(resolved)
+                    return engine
+            return self._load(resolved)
+
+    def _load(self, key: str) -> Any:
+        path = self.models[key]
+        with self._lock:
+            overlapped = bool(self._loading)
+            for k in self._loading:
+                self._loading[k] = True
+            self._loading[key] = overlapped
+        try:
+            rss0 = _rss_bytes()
+            t0 = time.perf_counter()
+            engine = self.loader(path)
+            ms = (time.perf_counter() - t0) * 1000.0
+            grown = max(0, _rss_bytes() - rss0)
+        finally:
+            with self._lock:
+                if self._loading.pop(key, False):
+                    grown = 0  # RSS also grew for the other load(s); fall back to the file size
+        try:
+            file_size = Path(path).stat().st_size
+        except OSError:
+            file_size = 0
+        size_mb = max(grown, file_size) / (1024 * 1024)
+        with self._lock:
+            self._resident[key] = engine
+            self._size_mb[key] = size_mb
+            self._cold_load_ms[key] = ms
+            self.loads += 1
+            self._evict_over_budget(keep=key)
+        if self.on_load:
+            self.on_load(key, ms, size_mb)
+        return engine
+
+    def _evict_over_budget(self, keep: str) -> None:
+        while self.resident_mb() > self.budget_mb and len(self._resident) > 1:
+            victim = next(iter(self._resident))
+            if victim == keep:
+                break
+            self._resident.pop(victim)
+            self._size_mb.pop(victim, None)
+            self.evictions += 1
+            if self.on_evict:
+                self.on_evict(victim)
+
+    def resident_mb(self) -> float:
+        return sum(self._size_mb.get(k, 0.0) for k in self._resident)
+
+    def engines(self):
+        with self._lock:
+            return list(self._resident.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget_mb": self.budget_mb,
+                "resident_mb": self.resident_mb(),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "models": {
+                    k: {
+                        "path": p,
+                        "gate": self.gate_paths.get(k),
+                        "loaded": k in self._resident,
+                        "resident_mb": self._size_mb.get(k, 0.0),
+                        "cold_load_ms": self._cold_load_ms.get(k),
+                    }
+                    for k, p in self.models.items()
+                },
+            }
@@ -0,0 +1,19 @@
+from services.inference.bench import summarize_latencies, compare_to_baseline
+
+
+def test_summary_and_baseline_regression():
+    summary = summarize_latencies([float(i) for i in range(1, 101)], frames=100, elapsed_s=2.0)
+    assert summary["latency_p50_ms"] == 50.5
+    assert 95.0 <= summary["latency_p95_ms"] <= 96.0
+    assert summary["throughput_fps"] == 50.0
+
+    base = {"results": [{"key": "b1-t1-CPUExecutionProvider-64x64", "latency_p50_ms": 10.0, "latency_p95_ms": 12.0, "latency_p99_ms": 15.0, "throughput_fps": 100.0}]}
+    same = [{"key": "b1-t1-CPUExecutionProvider-64x64", "latency_p50_ms": 10.5, "latency_p95_ms": 12.5, "latency_p99_ms": 15.0, "throughput_fps": 96.0}]
+    assert compare_to_baseline(same, base, max_regression_pct=10) == []
+    slow = [{"key": "b1-t1-CPUExecutionProvider-64x64", "latency_p50_ms": 13.0, "latency_p95_ms": 12.0, "latency_p99_ms": 15.0, "throughput_fps": 80.0}]
+    regs = compare_to_baseline(slow, base, max_regression_pct=10)
+    assert len(regs) == 2 and regs[0].startswith("b1-t1-CPUExecutionProvider-64x64 latency_p50_ms")
+
+    key = "b1-t1-CPUExecutionProvider-64x64"
+    assert compare_to_baseline([{"key": key, "error": "provider unavailable"}], base, max_regression_pct=10) == [f"{key} error: provider unavailable"]
+    assert compare_to_baseline([], base, max_regression_pct=10) == [f"{key} missing from results"]
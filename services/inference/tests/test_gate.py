@@ -0,0 +1,42 @@
+import numpy as np
+
+from services.inference.gate import CascadeGate, GateSet, ReferenceScorer, build_reference
+
+
+def test_reference_gate_passes_anomalies_and_audits():
+    rng = np.random.RandomState(0)
+    good = [rng.normal(0.0, 0.1, (3, 16, 16)).astype(np.float32) for _ in range(20)]
+    mean, std = build_reference(good)
+    gate = CascadeGate(ReferenceScorer(mean, std), threshold=0.05, audit_every=2)
+
+    ok_frame = good[0]
+    forward, score, audit = gate.check(ok_frame)
+    assert not forward and not audit and score < 0.05
+    forward, _, audit = gate.check(ok_frame)
+    assert not forward and audit
+    gate.record_audit("f2", score, [])
+
+    bad = ok_frame.copy()
+    bad[:, 4:10, 4:10] += 5.0
+    forward, score, _ = gate.check(bad)
+    assert forward and score >= 0.05
+
+    stats = gate.stats()
+    assert stats["seen"] == 3 and stats["passed"] == 1 and stats["audited"] == 1
+    assert gate.audits()[0]["frame_id"] == "f2" and not gate.audits()[0]["missed"]
+
+
+def test_gate_set_only_gates_keys_with_their_own_gate():
+    built = []
+
+    def build(path, threshold):
+        built.append((path, threshold))
+        return CascadeGate(ReferenceScorer(np.zeros((1, 2, 2)), np.ones((1, 2, 2))), threshold=threshold or 0.01)
+
+    default = CascadeGate(ReferenceScorer(np.zeros((1, 2, 2)), np.ones((1, 2, 2))), threshold=0.01)
+    gates = GateSet(build, default=default)
+    assert gates.for_key(None) is default
+    assert gates.for_key("line-2") is None
+    g = gates.for_key("line-1/cam-A", "/gates/a.npz", 0.2)
+    assert g is gates.for_key("line-1/cam-A", "/gates/a.npz", 0.2) and g.threshold == 0.2
+    assert built == [("/gates/a.npz", 0.2)] and list(gates.gates()) == ["line-1/cam-A"]
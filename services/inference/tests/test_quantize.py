@@ -0,0 +1,53 @@
+import numpy as np
+import cv2
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from onnx import helper, TensorProto, numpy_helper
+
+from services.inference.infer import InferenceEngine
+from services.inference.quantize import load_calibration_tensors, quantize_model, compare
+
+
+def _tiny_model(path):
+    w = numpy_helper.from_array(np.random.RandomState(0).randn(4, 3, 3, 3).astype(np.float32), "w")
+    graph = helper.make_graph(
+        [
+            helper.make_node("Conv", ["x", "w"], ["c"], pads=[1, 1, 1, 1]),
+            helper.make_node("Relu", ["c"], ["r"]),
+            helper.make_node("GlobalAveragePool", ["r"], ["p"]),
+            helper.make_node("Flatten", ["p"], ["y"]),
+        ],
+        "tiny",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 3, 16, 32])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 4])],
+        initializer=[w],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+
+
+def test_quantize_and_compare(tmp_path, monkeypatch):
+    monkeypatch.setenv("FRAME_WIDTH", "32")
+    monkeypatch.setenv("FRAME_HEIGHT", "16")
+    calib = tmp_path / "frames"
+    calib.mkdir()
+    rng = np.random.RandomState(1)
+    for i in range(6):
+        cv2.imwrite(str(calib / f"{i}.jpg"), rng.randint(0, 255, (40, 60, 3), dtype=np.uint8))
+    fp32 = tmp_path / "m.onnx"
+    _tiny_model(fp32)
+
+    tensors = load_calibration_tensors(calib)
+    assert len(tensors) == 6 and tensors[0].shape == (3, 16, 32)
+    int8 = quantize_model(fp32, tmp_path / "m.int8.onnx", tensors)
+    report = compare(fp32, int8, tensors, runs=10)
+    assert report["agreement"]["frames"] == 6
+    assert report["agreement"]["mean_cosine"] > 0.9
+    assert report["int8"]["latency_p50_ms"] > 0
+
+    eng = InferenceEngine(model_path=str(int8))
+    assert eng.session is not None
@@ -0,0 +1,113 @@
+from services.inference.registry import ModelRegistry
+
+
+class _FakeEngine:
+    def __init__(self, path):
+        self.model_path = path
+
+
+def test_lazy_load_resolve_and_lru_eviction(tmp_path):
+    paths = {}
+    for name in ("a", "b", "c"):
+        p = tmp_path / f"{name}.onnx"
+        p.write_bytes(b"x" * (1024 * 1024))
+        paths[name] = str(p)
+    loaded, evicted = [], []
+    reg = ModelRegistry(
+        {"line-1/cam-A": paths["a"], "line-1": paths["b"], "line-2/cam-B/cap": paths["c"]},
+        _FakeEngine,
+        budget_mb=2.5,
+        on_load=lambda k, ms, mb: loaded.append(k),
+        on_evict=evicted.append,
+    )
+    assert reg.stats()["loads"] == 0
+    assert reg.get("line-1/cam-A/bracket").model_path == paths["a"]
+    assert reg.get("line-1/cam-Z").model_path == paths["b"]
+    assert reg.get("line-3") is None
+    # touch a so that b becomes least recently used
+    reg.get("line-1/cam-A")
+    assert reg.get("line-2/cam-B/cap").model_path == paths["c"]
+    assert loaded == ["line-1/cam-A", "line-1", "line-2/cam-B/cap"]
+    assert evicted == ["line-1"]
+    stats = reg.stats()
+    assert stats["evictions"] == 1 and stats["resident_mb"] <= 2.5
+    assert stats["models"]["line-1"]["loaded"] is False
+
+
+def test_cold_load_does_not_block_resident_models(tmp_path):
+    import threading
+
+    release = threading.Event()
+    calls = []
+
+    def loader(path):
+        calls.append(path)
+        if path.endswith("slow.onnx"):
+            assert release.wait(5)
+        return _FakeEngine(path)
+
+    reg = ModelRegistry({"line-1": str(tmp_path / "fast.onnx"), "line-2": str(tmp_path / "slow.onnx")}, loader)
+    reg.get("line-1")
+    slow = [threading.Thread(target=reg.get, args=("line-2",)) for _ in range(3)]
+    for t in slow:
+        t.start()
+    # the resident model is served while line-2 is still loading
+    got = []
+    t = threading.Thread(target=lambda: got.append(reg.get("line-1")))
+    t.start()
+    t.join(timeout=2)
+    assert got and got[0].model_path.endswith("fast.onnx")
+    release.set()
+    for t in slow:
+        t.join(timeout=5)
+    # concurrent callers for the same key share one load
+    assert calls.count(str(tmp_path / "slow.onnx")) == 1
+
+
+def test_entries_can_name_their_own_gate(tmp_path):
+    reg = ModelRegistry({"line-1": {"path": "a.onnx", "gate": "a_gate.npz", "gate_threshold": 0.2}, "line-2": "b.onnx"}, _FakeEngine)
+    assert reg.gate_for("line-1/cam-A") == ("line-1", "a_gate.npz", 0.2)
+    assert reg.gate_for("line-2") == ("line-2", None, None)
+    assert reg.gate_for("line-3") == (None, None, None)
+    assert reg.get("line-1").model_path == "a.onnx"
+
+
+def test_overlapping_loads_are_sized_by_file(tmp_path, monkeypatch):
+    import threading
+    from services.inference import registry
+
+    rss = [0]
+    monkeypatch.setattr(registry, "_rss_bytes", lambda: rss[0])
+    big, small = tmp_path / "big.onnx", tmp_path / "small.onnx"
+    big.write_bytes(b"x" * (1024 * 1024))
+    small.write_bytes(b"x" * 1024)
+    small_started = threading.Event()
+    big_done = threading.Event()
+
+    def loader(path):
+        if path == str(small):
+            small_started.set()
+            assert big_done.wait(5)  # still loading while the big model grows RSS
+        else:
+            assert small_started.wait(5)
+            rss[0] += 300 * 1024 * 1024
+            big_done.set()
+        return _FakeEngine(path)
+
+    reg = ModelRegistry({"line-1": str(big), "line-2": str(small)}, loader)
+    threads = [threading.Thread(target=reg.get, args=(k,)) for k in ("line-2", "line-1")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    models = reg.stats()["models"]
+    # neither load can tell whose growth it saw, so neither is charged with it
+    assert models["line-1"]["resident_mb"] == 1.0
+    assert models["line-2"]["resident_mb"] == 1024 / (1024 * 1024)
+
+    # a load on its own is still sized by RSS growth
+    alone = tmp_path / "alone.onnx"
+    alone.write_bytes(b"x")
+    reg2 = ModelRegistry({"line-3": str(alone)}, lambda p: rss.__setitem__(0, rss[0] + 5 * 1024 * 1024) or _FakeEngine(p))
+    reg2.get("line-3")
+    assert reg2.stats()["models"]["line-3"]["resident_mb"] == 5.0
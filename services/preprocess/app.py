@@ -1,25 +1,26 @@
+import asyncio
 import io
 import os
+from urllib.parse import urlsplit, urlunsplit
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 import uvicorn
 import numpy as np
 import cv2
 import httpx
-from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi import FastAPI, UploadFile, File, Form, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
-from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 
 from ops import run_pipeline
+from router import InferenceRouter
+from common.stream import StreamClient, serve as serve_stream
+from common.profiler import install_profiler
+from common.tracing import Tracing, frame_span, inject, keep
 
 
 app = FastAPI(title="EdgeSight QA - Preprocess")
@@ -31,16 +32,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# OpenTelemetry minimal bootstrap
+otel_spans = Counter("otel_spans_total", "Finished spans by sampling outcome (sampled, kept, dropped, queue_full)", ["decision"])
+otel_export_spans = Counter("otel_export_spans_total", "Spans sent to the OTLP exporter", ["result"])
+otel_export_ms = Histogram("otel_export_ms", "OTLP span export batch latency (ms)", buckets=(1,5,10,25,50,100,250,500,1000,5000))
+otel_export_queue = Gauge("otel_export_queue_depth", "Spans waiting in the batch span processor for export")
+
+
+def _on_otel_export(n: int, ok: bool, ms: float) -> None:
+    otel_export_spans.labels("ok" if ok else "failed").inc(n)
+    otel_export_ms.observe(ms)
+
+
+# OpenTelemetry bootstrap: parent-based ratio sampling, keeping defect/error/slow traces (common/tracing.py)
+tracing = Tracing(on_span=lambda decision, n: otel_spans.labels(decision).inc(n), on_export=_on_otel_export)
+otel_export_queue.set_function(tracing.queue_depth)
+
+
 def _init_tracing():
     if os.getenv("OTEL_ENABLED", "1").lower() in ("1", "true", "yes"):
-        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://otel-collector:4317")
-        insecure = os.getenv("OTEL_EXPORTER_OTLP_INSECURE", "1").lower() in ("1", "true", "yes")
-        resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "preprocess")})
-        provider = TracerProvider(resource=resource)
-        exporter = OTLPSpanExporter(endpoint=endpoint, insecure=insecure)
-        provider.add_span_processor(BatchSpanProcessor(exporter))
-        trace.set_tracer_provider(provider)
+        tracing.install(os.getenv("OTEL_SERVICE_NAME", "preprocess"))
         FastAPIInstrumentor().instrument_app(app)
         HTTPXClientInstrumentor().instrument()
 
@@ -49,10 +59,75 @@ _init_tracing()
 preprocess_counter = Counter("preprocess_frames_total", "Frames received for preprocessing")
 preprocess_time_ms = Histogram("preprocess_time_ms", "Preprocess step time (ms)", buckets=(1,5,10,20,50,100,200))
 queue_depth = Gauge("preprocess_queue_depth", "Naive queue depth gauge")
+stream_connections = Gauge("preprocess_stream_connections", "Open /frame/stream connections")
+stream_inflight = Gauge("preprocess_stream_inflight", "Frames awaiting a reply on outgoing streams", ["hop"])
+stream_errors = Counter("preprocess_stream_errors_total", "Failed requests on outgoing streams", ["hop"])
+replica_ms = Histogram("preprocess_infer_replica_ms", "Inference call latency per replica (ms)", ["replica"], buckets=(1,5,10,20,50,100,200,500,1000))
+replica_errors = Counter("preprocess_infer_replica_errors_total", "Failed inference calls per replica", ["replica"])
+replica_healthy = Gauge("preprocess_infer_replica_healthy", "1 if the replica is taking traffic, 0 while ejected", ["replica"])
+infer_failovers = Counter("preprocess_infer_failovers_total", "Inference calls retried on the next replica")
+infer_hedges = Counter("preprocess_infer_hedges_total", "Inference calls also sent to a second replica after ROUTER_HEDGE_MS")
 
 _ready = True
 _last_infer_ms = 0.0
 
+# INFERENCE_URLS="http://inference-0:9003/infer,http://inference-1:9003/infer" shards cameras across
+# replicas (ws://.../infer/stream entries use the long-lived stream); otherwise the single
+# INFERENCE_STREAM_URL or INFERENCE_URL. RESULTS_STREAM_URL (ws://.../result/stream) replaces
+# the per-frame POST to the results adapter.
+_infer_urls = [u.strip() for u in os.getenv("INFERENCE_URLS", "").split(",") if u.strip()] or [
+    os.getenv("INFERENCE_STREAM_URL") or os.getenv("INFERENCE_URL", "http://inference:9003/infer")
+]
+_infer_streams: Dict[str, StreamClient] = {u: StreamClient(u) for u in _infer_urls if u.startswith(("ws://", "wss://"))}
+_results_stream: Optional[StreamClient] = StreamClient(os.environ["RESULTS_STREAM_URL"]) if os.getenv("RESULTS_STREAM_URL") else None
+if _infer_streams:
+    stream_inflight.labels("inference").set_function(lambda: sum(c.inflight for c in _infer_streams.values()))
+if _results_stream is not None:
+    stream_inflight.labels("results").set_function(lambda: _results_stream.inflight)
+
+
+def _on_replica_call(url: str, ms: float, ok: bool) -> None:
+    replica_ms.labels(url).observe(ms)
+    if not ok:
+        replica_errors.labels(url).inc()
+
+
+router = InferenceRouter.from_env(
+    os.environ,
+    _infer_urls,
+    on_call=_on_replica_call,
+    on_health=lambda url, ok: replica_healthy.labels(url).set(1 if ok else 0),
+    on_failover=infer_failovers.inc,
+    on_hedge=infer_hedges.inc,
+)
+for _u in _infer_urls:
+    replica_healthy.labels(_u).set(1)
+
+
+def _readyz_url(url: str) -> str:
+    parts = urlsplit(url)
+    scheme = {"ws": "http", "wss": "https"}.get(parts.scheme, parts.scheme)
+    return urlunsplit((scheme, parts.netloc, "/readyz", "", ""))
+
+
+async def _probe_replica(url: str) -> bool:
+    async with httpx.AsyncClient() as client:
+        return (await client.get(_readyz_url(url), timeout=1.0)).status_code == 200
+
+
+@app.on_event("startup")
+async def _start_probes():
+    interval = float(os.getenv("ROUTER_PROBE_S", "5"))
+    if len(_infer_urls) < 2 or interval <= 0:
+        return
+
+    async def _loop():
+        while True:
+            await router.probe(_probe_replica)
+            await asyncio.sleep(interval)
+
+    asyncio.create_task(_loop())
+
 
 @app.get("/healthz")
 def healthz():
@@ -64,28 +139,106 @@ def readyz():
     return ({"status": "ready"} if _ready else Response(status_code=503))
 
 
+# /debug/profile and the event_loop_lag_ms histogram (common/profiler.py)
+install_profiler(app)
+
+
 @app.get("/metrics")
 def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.post("/frame")
-async def frame(request: Request, frame_id: str = Form(...), ts_monotonic_ns: int = Form(...), image: UploadFile = File(...), corr_id: str | None = Form(None)) -> Dict[str, Any]:
+async def frame(request: Request, frame_id: str = Form(...), ts_monotonic_ns: int = Form(...), image: UploadFile = File(...), corr_id: str | None = Form(None), model_key: str | None = Form(None), camera_id: str | None = Form(None), session: str | None = Form(None)) -> Dict[str, Any]:
     # Span attributes for correlation
+    cid = corr_id or request.headers.get("X-Correlation-ID")
     try:
         from opentelemetry import trace as _trace
         span = _trace.get_current_span()
         span.set_attribute("frame_id", frame_id)
         span.set_attribute("ts_monotonic_ns", int(ts_monotonic_ns))
-        cid_hdr = corr_id or request.headers.get("X-Correlation-ID")
-        if cid_hdr:
-            span.set_attribute("corr_id", cid_hdr)
+        if cid:
+            span.set_attribute("corr_id", cid)
     except Exception:
         pass
+    return await _process(frame_id, ts_monotonic_ns, await image.read(), cid, model_key, camera_id, session)
+
+
+@app.websocket("/frame/stream")
+async def frame_stream(websocket: WebSocket):
+    # /frame over one long-lived connection: header {frame_id, ts_monotonic_ns, corr_id?, model_key?, camera_id?, session?}, payload = JPEG
+    async def _handle(header: Dict[str, Any], payload: bytes) -> Dict[str, Any]:
+        with frame_span("preprocess.frame", header):
+            return await _process(str(header["frame_id"]), int(header.get("ts_monotonic_ns", 0)), payload, header.get("corr_id"), header.get("model_key"), header.get("camera_id"), header.get("session"))
+
+    stream_connections.inc()
+    try:
+        await serve_stream(websocket, _handle, credits=int(os.getenv("STREAM_CREDITS", "4")))
+    finally:
+        stream_connections.dec()
+
+
+async def _infer_at(url: str, frame_id: str, ts_monotonic_ns: int, tensor: np.ndarray, cid: Optional[str], mkey: Optional[str]) -> Dict[str, Any]:
+    client = _infer_streams.get(url)
+    if client is not None:
+        header = {"frame_id": frame_id, "ts_monotonic_ns": ts_monotonic_ns, "shape": list(tensor.shape), "dtype": str(tensor.dtype)}
+        if mkey:
+            header["model_key"] = mkey
+        try:
+            result, _ = await client.request(inject(header), tensor.tobytes(), timeout=5)
+        except Exception:
+            stream_errors.labels("inference").inc()
+            raise
+        return result
+    payload = {
+        "frame_id": frame_id,
+        "ts_monotonic_ns": ts_monotonic_ns,
+    }
+    # Route to a line/camera/product model when the inference registry is in use
+    if mkey:
+        payload["model_key"] = mkey
+    files = {
+        "tensor": (f"{frame_id}.npy", io.BytesIO(tensor.tobytes()), "application/octet-stream"),
+        "shape": ("shape.txt", str(list(tensor.shape)).encode(), "text/plain"),
+        "dtype": ("dtype.txt", str(tensor.dtype).encode(), "text/plain"),
+    }
+    async with httpx.AsyncClient() as client:
+        headers = {}
+        if cid:
+            headers["X-Correlation-ID"] = cid
+        resp = await client.post(url, data=payload, files=files, headers=headers, timeout=5)
+        resp.raise_for_status()
+        return resp.json()
+
+
+async def _infer(frame_id: str, ts_monotonic_ns: int, tensor: np.ndarray, cid: Optional[str], mkey: Optional[str], camera_id: Optional[str] = None) -> Dict[str, Any]:
+    # one camera (else model key, else line) always lands on the same replica while it is healthy
+    key = camera_id or mkey or os.getenv("LINE_ID", "line-1")
+    return await router.call(key, lambda url: _infer_at(url, frame_id, ts_monotonic_ns, tensor, cid, mkey))
+
+
+async def _forward_result(out: Dict[str, Any], cid: Optional[str]) -> None:
+    if _results_stream is not None:
+        try:
+            await _results_stream.request(inject({"frame_id": out["frame_id"], "corr_id": cid, "result": out}), timeout=3)
+        except Exception:
+            stream_errors.labels("results").inc()
+        return
+    results_url = os.getenv("RESULTS_URL", "http://results_adapter:9004/result")
+    try:
+        async with httpx.AsyncClient() as client:
+            headers = {}
+            if cid:
+                headers["X-Correlation-ID"] = cid
+            await client.post(results_url, json=out, headers=headers, timeout=3)
+    except Exception:
+        pass
+
+
+async def _process(frame_id: str, ts_monotonic_ns: int, image_bytes: bytes, cid: Optional[str], model_key: Optional[str], camera_id: Optional[str] = None, session: Optional[str] = None) -> Dict[str, Any]:
     preprocess_counter.inc()
     queue_depth.inc()
     try:
-        image_bytes = await image.read()
         np_arr = np.frombuffer(image_bytes, dtype=np.uint8)
         bgr = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
         if bgr is None:
@@ -94,28 +247,10 @@ async def frame(request: Request, frame_id: str = Form(...), ts_monotonic_ns: in
         tensor = run_pipeline(bgr)
         t1 = time.perf_counter()
         preprocess_time_ms.observe((t1 - t0) * 1000.0)
-
-        infer_url = os.getenv("INFERENCE_URL", "http://inference:9003/infer")
-        payload = {
-            "frame_id": frame_id,
-            "ts_monotonic_ns": ts_monotonic_ns,
-        }
-        files = {
-            "tensor": (f"{frame_id}.npy", io.BytesIO(tensor.tobytes()), "application/octet-stream"),
-            "shape": ("shape.txt", str(list(tensor.shape)).encode(), "text/plain"),
-            "dtype": ("dtype.txt", str(tensor.dtype).encode(), "text/plain"),
-        }
         try:
-            async with httpx.AsyncClient() as client:
-                headers = {}
-                cid = corr_id or request.headers.get("X-Correlation-ID")
-                if cid:
-                    headers["X-Correlation-ID"] = cid
-                resp = await client.post(infer_url, data=payload, files=files, headers=headers, timeout=5)
-                resp.raise_for_status()
-                result = resp.json()
+            camera_id = camera_id or os.getenv("CAMERA_ID") or None
+            result = await _infer(frame_id, ts_monotonic_ns, tensor, cid, model_key or os.getenv("MODEL_KEY"), camera_id)
             # Forward to results adapter
-            results_url = os.getenv("RESULTS_URL", "http://results_adapter:9004/result")
             out = {
                 "frame_id": result.get("frame_id", frame_id),
                 "detections": result.get("detections", []),
@@ -124,14 +259,13 @@ async def frame(request: Request, frame_id: str = Form(...), ts_monotonic_ns: in
                 "config_digest": os.getenv("CONFIG_DIGEST", "demo"),
                 "latency_ms": (time.perf_counter() - t0) * 1000.0,
             }
-            try:
-                async with httpx.AsyncClient() as client:
-                    headers = {}
-                    if cid:
-                        headers["X-Correlation-ID"] = cid
-                    await client.post(results_url, json=out, headers=headers, timeout=3)
-            except Exception:
-                pass
+            if camera_id:
+                out["camera_id"] = camera_id
+            if session:
+                out["session"] = session  # with camera_id, keys the adapter's frame archive
+            if out["detections"]:
+                keep("defect")
+            await _forward_result(out, cid)
             return result
         except Exception:
             return {"frame_id": frame_id, "forwarded": False}
@@ -139,6 +273,21 @@ async def frame(request: Request, frame_id: str = Form(...), ts_monotonic_ns: in
         queue_depth.dec()
 
 
+@app.get("/replicas")
+def replicas():
+    return router.stats()
+
+
+@app.get("/config")
+def get_config():
+    return tracing.settings.to_dict()
+
+
+@app.patch("/config")
+def patch_config(cfg: Dict[str, Any]):
+    return {"updated": tracing.settings.update(cfg)}
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "9002")))
 
@@ -0,0 +1,227 @@
+"""Route frames across inference replicas by camera/line.
+
+Each routing key (camera, else model key, else line) maps to a replica
+through a consistent-hash ring, so a camera's frames keep going to the same
+replica (ordering and any per-camera state stay intact), and adding or
+removing a replica only moves the keys that hashed to it. A replica that
+fails ``fail_threshold`` calls in a row, or fails a health probe, is ejected
+for ``eject_s``. While ejected, its keys fail over to the next replica on the
+ring and return once the ejection expires; a passing probe does not cut an
+ejection short. With ``hedge_ms`` set, a call that has not
+answered by then is also sent to the next replica, and the first success wins.
+"""
+import asyncio
+import bisect
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        self.nodes = list(dict.fromkeys(nodes))
+        self._ring = sorted((_hash(f"{n}#{i}"), n) for n in self.nodes for i in range(vnodes))
+        self._keys = [h for h, _ in self._ring]
+
+    def order(self, key: str) -> List[str]:
+        """Every node, in the order ``key`` prefers them."""
+        if not self._ring:
+            return []
+        out: List[str] = []
+        i = bisect.bisect(self._keys, _hash(key))
+        for j in range(len(self._ring)):
+            node = self._ring[(i + j) % len(self._ring)][1]
+            if node not in out:
+                out.append(node)
+                if len(out) == len(self.nodes):
+                    break
+        return out
+
+
+class Replica:
+    __slots__ = ("url", "fails", "ejected_until", "calls", "errors", "ewma_ms")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.fails = 0
+        self.ejected_until = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.ewma_ms: Optional[float] = None
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class AllReplicasFailed(RuntimeError):
+    pass
+
+
+class InferenceRouter:
+    def __init__(
+        self,
+        urls: List[str],
+        vnodes: int = 64,
+        fail_threshold: int = 3,
+        eject_s: float = 10.0,
+        hedge_ms: float = 0.0,
+        on_call: Optional[Callable[[str, float, bool], None]] = None,
+        on_health: Optional[Callable[[str, bool], None]] = None,
+        on_failover: Optional[Callable[[], None]] = None,
+        on_hedge: Optional[Callable[[], None]] = None,
+    ):
+        self.ring = HashRing(urls, vnodes)
+        self.replicas: Dict[str, Replica] = {u: Replica(u) for u in self.ring.nodes}
+        self.fail_threshold = max(1, fail_threshold)
+        self.eject_s = eject_s
+        self.hedge_ms = hedge_ms
+        self.on_call = on_call
+        self.on_health = on_health
+        self.on_failover = on_failover
+        self.on_hedge = on_hedge
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    @classmethod
+    def from_env(cls, env, urls: List[str], **callbacks) -> "InferenceRouter":
+        return cls(
+            urls,
+            vnodes=int(env.get("ROUTER_VNODES", "64")),
+            fail_threshold=int(env.get("ROUTER_FAIL_THRESHOLD", "3")),
+            eject_s=float(env.get("ROUTER_EJECT_S", "10")),
+            hedge_ms=float(env.get("ROUTER_HEDGE_MS", "0")),
+            **callbacks,
+        )
+
+    def candidates(self, key: str, now: Optional[float] = None) -> List[str]:
+        """Replicas for ``key`` in preference order, healthy ones first."""
+        now = time.monotonic() if now is None else now
+        order = self.ring.order(key)
+        healthy = [u for u in order if self.replicas[u].healthy(now)]
+        # with every replica ejected, still try them rather than fail outright
+        return healthy + [u for u in order if u not in healthy]
+
+    def mark(self, url: str, ok: bool, ms: Optional[float] = None) -> None:
+        r = self.replicas.get(url)
+        if r is None:
+            return
+        was_healthy = r.healthy(time.monotonic())
+        if ms is not None:
+            r.calls += 1
+            r.ewma_ms = ms if r.ewma_ms is None else 0.8 * r.ewma_ms + 0.2 * ms
+        if ok:
+            r.fails = 0
+            r.ejected_until = 0.0
+        else:
+            r.errors += 1
+            r.fails += 1
+            if r.fails >= self.fail_threshold:
+                r.ejected_until = time.monotonic() + self.eject_s
+        if self.on_call and ms is not None:
+            self.on_call(url, ms, ok)
+        now_healthy = r.healthy(time.monotonic())
+        if self.on_health and now_healthy != was_healthy:
+            self.on_health(url, now_healthy)
+
+    async def _timed(self, url: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        t0 = time.perf_counter()
+        try:
+            out = await fn(url)
+        except asyncio.CancelledError:
+            raise  # lost a hedge race; not the replica's fault
+        except Exception:
+            self.mark(url, False, (time.perf_counter() - t0) * 1000.0)
+            raise
+        self.mark(url, True, (time.perf_counter() - t0) * 1000.0)
+        return out
+
+    async def call(self, key: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        """``await fn(url)`` on the replica for ``key``, failing over along the ring."""
+        urls = self.candidates(key)
+        if not urls:
+            raise AllReplicasFailed("no inference replicas configured")
+        last: Optional[BaseException] = None
+        i = 0
+        while i < len(urls):
+            if i > 0:
+                self.failovers += 1
+                if self.on_failover:
+                    self.on_failover()
+            primary = asyncio.ensure_future(self._timed(urls[i], fn))
+            if self.hedge_ms <= 0 or i + 1 >= len(urls):
+                try:
+                    return await primary
+                except Exception as e:
+                    last = e
+                    i += 1
+                    continue
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_ms / 1000.0)
+            if done:
+                try:
+                    return primary.result()
+                except Exception as e:
+                    last = e
+                    i += 1
+                    continue
+            self.hedges += 1
+            if self.on_hedge:
+                self.on_hedge()
+            hedge = asyncio.ensure_future(self._timed(urls[i + 1], fn))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        for p in pending:
+                            p.cancel()
+                        if t is hedge:
+                            self.hedge_wins += 1
+                        return t.result()
+                    last = t.exception()
+            i += 2
+        raise AllReplicasFailed(f"all inference replicas failed: {last}")
+
+    async def probe(self, check: Callable[[str], Awaitable[bool]]) -> None:
+        """Run one health check per replica; failures eject, successes leave ejections to expire."""
+        async def _one(url: str) -> None:
+            try:
+                ok = bool(await check(url))
+            except Exception:
+                ok = False
+            r = self.replicas[url]
+            was_healthy = r.healthy(time.monotonic())
+            if ok:
+                # /readyz can pass while /infer keeps failing; only eject_s ends an ejection
+                if was_healthy:
+                    r.fails = 0
+                return
+            r.fails = max(r.fails, self.fail_threshold)
+            r.ejected_until = time.monotonic() + self.eject_s
+            if self.on_health and was_healthy:
+                self.on_health(url, False)
+
+        await asyncio.gather(*(_one(u) for u in self.replicas))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "replicas": [
+                {
+                    "url": r.url,
+                    "healthy": r.healthy(now),
+                    "calls": r.calls,
+                    "errors": r.errors,
+                    "ewma_ms": round(r.ewma_ms, 2) if r.ewma_ms is not None else None,
+                    "ejected_for_s": round(max(0.0, r.ejected_until - now), 1),
+                }
+                for r in self.replicas.values()
+            ],
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
@@ -0,0 +1,134 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, Form
+from fastapi.responses import Response
+
+from services.preprocess.router import HashRing, InferenceRouter
+
+
+class StandIn:
+    """An in-process inference replica reached over ASGI."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.delay = 0.0
+        self.down = False
+        self.seen = []
+        app = FastAPI()
+
+        @app.post("/infer")
+        async def infer(frame_id: str = Form(...)):
+            if self.down:
+                return Response(status_code=503)
+            await asyncio.sleep(self.delay)
+            self.seen.append(frame_id)
+            return {"frame_id": frame_id, "replica": self.name, "detections": []}
+
+        @app.get("/readyz")
+        def readyz():
+            return Response(status_code=503) if self.down else {"status": "ready"}
+
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=f"http://{name}")
+
+
+def _cluster(n=3, **kw):
+    replicas = {f"http://inf-{i}:9003/infer": StandIn(f"inf-{i}") for i in range(n)}
+
+    async def call(url, frame_id):
+        r = await replicas[url].client.post("/infer", data={"frame_id": frame_id})
+        r.raise_for_status()
+        return r.json()
+
+    async def ready(url):
+        return (await replicas[url].client.get("/readyz")).status_code == 200
+
+    return replicas, InferenceRouter(list(replicas), **kw), call, ready
+
+
+def test_ring_moves_only_keys_of_the_added_node():
+    keys = [f"cam-{i}" for i in range(500)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    moved = [k for k in keys if before.order(k)[0] != after.order(k)[0]]
+    assert moved and all(after.order(k)[0] == "d" for k in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.45
+    assert sorted(before.order("cam-1")) == ["a", "b", "c"]
+
+
+def test_cameras_stick_to_one_replica_and_spread_across_all():
+    replicas, router, call, _ = _cluster()
+
+    async def run():
+        for frame in range(5):
+            for cam in range(12):
+                out = await router.call(f"cam-{cam}", lambda url: call(url, f"cam-{cam}/{frame}"))
+                assert out["frame_id"] == f"cam-{cam}/{frame}"
+
+    asyncio.run(run())
+    owners = {}
+    for r in replicas.values():
+        for fid in r.seen:
+            owners.setdefault(fid.split("/")[0], set()).add(r.name)
+        # frames of each camera arrive in order on its replica
+        for cam in {f.split("/")[0] for f in r.seen}:
+            frames = [int(f.split("/")[1]) for f in r.seen if f.startswith(cam + "/")]
+            assert frames == sorted(frames)
+    assert all(len(v) == 1 for v in owners.values())
+    assert all(r.seen for r in replicas.values())
+
+
+def test_failover_ejects_a_failing_replica_until_eject_s_expires():
+    replicas, router, call, ready = _cluster(fail_threshold=2, eject_s=0.3)
+    primary = router.candidates("cam-7")[0]
+    replicas[primary].down = True
+
+    async def run():
+        outs = [await router.call("cam-7", lambda url: call(url, str(i))) for i in range(4)]
+        assert all(o["replica"] != replicas[primary].name for o in outs)
+        assert router.candidates("cam-7")[-1] == primary  # ejected after two failures
+        # ejected: later calls go straight to the next replica
+        assert router.stats()["failovers"] == 2
+        replicas[primary].down = False
+        # a passing probe does not undo the passive ejection
+        await router.probe(ready)
+        assert router.candidates("cam-7")[-1] == primary
+        await asyncio.sleep(0.35)
+        return await router.call("cam-7", lambda url: call(url, "back"))
+
+    out = asyncio.run(run())
+    assert out["replica"] == replicas[primary].name
+    stats = {r["url"]: r for r in router.stats()["replicas"]}
+    assert stats[primary]["errors"] == 2 and stats[primary]["healthy"]
+
+
+def test_failed_probe_ejects():
+    replicas, router, call, ready = _cluster(eject_s=60)
+    primary = router.candidates("cam-7")[0]
+    replicas[primary].down = True
+
+    async def run():
+        await router.probe(ready)
+        return await router.call("cam-7", lambda url: call(url, "f1"))
+
+    assert asyncio.run(run())["replica"] != replicas[primary].name
+    assert router.candidates("cam-7")[-1] == primary
+
+
+def test_hedge_answers_from_the_second_replica_when_the_first_is_slow():
+    replicas, router, call, _ = _cluster(hedge_ms=20)
+    order = router.candidates("cam-3")
+    replicas[order[0]].delay = 1.0
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        out = await router.call("cam-3", lambda url: call(url, "f1"))
+        return out, loop.time() - t0
+
+    out, elapsed = asyncio.run(run())
+    assert out["replica"] == replicas[order[1]].name
+    assert elapsed < 0.5
+    assert router.hedges == 1 and router.hedge_wins == 1
+    # the cancelled slow call does not count against the primary
+    assert router.replicas[order[0]].errors == 0
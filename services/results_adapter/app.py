@@ -1,26 +1,32 @@
-import json
 import os
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Any
 
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, Response
-from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
 from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
-from sink_mqtt import publish_mqtt
-from sink_opcua import write_defect_tag
-from sink_webhook import send_webhook
-from governance import GovernanceLogger
+from sink_mqtt import MqttPublisher
+from sink_opcua import OpcUaSession
+from sink_webhook import WebhookDispatcher
+from governance import GovernanceLogger, GovernanceMaintenance, GroupCommitWriter
+from dispatch import SinkFanout, SinkPolicy, SinkWorker
+from broadcast import BroadcastHub
+from preview import PreviewHub
+from frame_archive import FrameArchive, frame_key
+from coalesce import DefectCoalescer
+from envelope import ResultEnvelope
+from common.jsonenc import dumps
+from common.sketch import RollingSketch
+from common.stream import serve as serve_stream
+from common.profiler import install_profiler
+from common.tracing import Tracing, frame_span, keep
 
 
 app = FastAPI(title="EdgeSight QA - Results Adapter")
@@ -33,16 +39,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# OpenTelemetry minimal bootstrap
+otel_spans = Counter("otel_spans_total", "Finished spans by sampling outcome (sampled, kept, dropped, queue_full)", ["decision"])
+otel_export_spans = Counter("otel_export_spans_total", "Spans sent to the OTLP exporter", ["result"])
+otel_export_ms = Histogram("otel_export_ms", "OTLP span export batch latency (ms)", buckets=(1,5,10,25,50,100,250,500,1000,5000))
+otel_export_queue = Gauge("otel_export_queue_depth", "Spans waiting in the batch span processor for export")
+
+
+def _on_otel_export(n: int, ok: bool, ms: float) -> None:
+    otel_export_spans.labels("ok" if ok else "failed").inc(n)
+    otel_export_ms.observe(ms)
+
+
+# OpenTelemetry bootstrap: parent-based ratio sampling, keeping defect/error/slow traces (common/tracing.py)
+tracing = Tracing(on_span=lambda decision, n: otel_spans.labels(decision).inc(n), on_export=_on_otel_export)
+otel_export_queue.set_function(tracing.queue_depth)
+
+
 def _init_tracing():
     if os.getenv("OTEL_ENABLED", "1").lower() in ("1", "true", "yes"):
-        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://otel-collector:4317")
-        insecure = os.getenv("OTEL_EXPORTER_OTLP_INSECURE", "1").lower() in ("1", "true", "yes")
-        resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "results-adapter")})
-        provider = TracerProvider(resource=resource)
-        exporter = OTLPSpanExporter(endpoint=endpoint, insecure=insecure)
-        provider.add_span_processor(BatchSpanProcessor(exporter))
-        trace.set_tracer_provider(provider)
+        tracing.install(os.getenv("OTEL_SERVICE_NAME", "results-adapter"))
         FastAPIInstrumentor().instrument_app(app)
 
 _init_tracing()
@@ -50,71 +65,257 @@ _init_tracing()
 results_received = Counter("results_received_total", "Results received from inference")
 mqtt_published = Counter("mqtt_published_total", "MQTT messages published")
 opcua_published = Counter("opcua_published_total", "OPC UA writes attempted")
-webhook_sent = Counter("webhook_sent_total", "Webhook posts sent")
+webhook_sent = Counter("webhook_sent_total", "Events delivered via webhook")
 governance_signed = Counter("governance_signed_total", "Governance records signed")
+mqtt_acked = Counter("mqtt_acked_total", "MQTT publishes acknowledged by the broker")
+mqtt_dropped = Counter("mqtt_dropped_total", "MQTT messages dropped from a full offline queue")
+mqtt_ack_latency_ms = Histogram("mqtt_ack_latency_ms", "MQTT publish-to-ack latency (ms)", buckets=(1,2,5,10,20,50,100,250,500,1000))
+mqtt_queue_depth = Gauge("mqtt_offline_queue_depth", "MQTT messages waiting for connection or in-flight window")
+mqtt_inflight = Gauge("mqtt_inflight", "MQTT publishes awaiting broker ack")
+mqtt_connected = Gauge("mqtt_connected", "1 if the MQTT client is connected, else 0")
+opcua_write_ms = Histogram("opcua_write_ms", "OPC UA batched write latency (ms)", buckets=(1,2,5,10,20,50,100,250,500,1000))
+opcua_write_failures = Counter("opcua_write_failures_total", "OPC UA batched writes that failed")
+opcua_coalesced = Counter("opcua_coalesced_total", "OPC UA defect writes merged into a newer pending write")
+opcua_reconnects = Counter("opcua_reconnects_total", "OPC UA session reconnects")
+opcua_connected = Gauge("opcua_connected", "1 if the OPC UA session is connected, else 0")
+webhook_batches = Counter("webhook_batches_total", "Webhook batch POSTs", ["result"])
+webhook_batch_ms = Histogram("webhook_batch_ms", "Webhook batch POST latency (ms)", buckets=(5,10,20,50,100,250,500,1000,2500,5000))
+webhook_spool_depth = Gauge("webhook_spool_batches", "Failed webhook batches waiting in the retry spool")
+webhook_errors = Counter("webhook_errors_total", "Webhook spool write/replay errors", ["stage"])
+sink_queue_depth = Gauge("sink_queue_depth", "Items waiting in a sink queue", ["sink"])
+sink_lag_ms = Histogram("sink_lag_ms", "Time from result accept to sink delivery (ms)", ["sink"], buckets=(1,5,10,20,50,100,250,500,1000,2500,5000))
+sink_failures = Counter("sink_failures_total", "Sink deliveries that failed after retries", ["sink"])
+sink_dropped = Counter("sink_dropped_total", "Sink items dropped because the queue was full", ["sink"])
+sink_circuit_open = Gauge("sink_circuit_open", "1 if the sink circuit breaker is open, else 0", ["sink"])
+governance_flush_ms = Histogram("governance_flush_ms", "Governance group-commit flush latency (ms)", buckets=(0.5,1,2,5,10,20,50,100,250,500))
+governance_batch_size = Histogram("governance_batch_size", "Records written per governance flush", buckets=(1,2,4,8,16,32,64,128,256,512))
+governance_segment_bytes = Counter("governance_segment_bytes_total", "Closed governance segment bytes before and after compression", ["kind"])
+governance_compress_ms = Histogram("governance_compress_ms", "Governance segment compression time (ms)", buckets=(10,50,100,250,500,1000,2500,5000,10000,30000))
+governance_retention_removed = Counter("governance_retention_removed_total", "Governance days or segments removed by retention")
+governance_pending = Gauge("governance_pending", "Governance records buffered for the next flush")
+sse_subscribers = Gauge("sse_subscribers", "Connected /events subscribers")
+sse_published = Counter("sse_events_published_total", "Events published to /events subscribers")
+sse_dropped = Counter("sse_events_dropped_total", "Events dropped from full subscriber buffers")
+preview_clients = Gauge("preview_clients", "Connected live preview clients")
+preview_sent = Counter("preview_frames_sent_total", "Preview frames delivered to clients")
+preview_skipped = Counter("preview_frames_skipped_total", "Preview frames skipped for clients slower than the camera")
+frames_archived = Counter("frames_archived_total", "Frames written to the defect-frame archive")
+frames_archived_bytes = Counter("frames_archived_bytes_total", "JPEG bytes written to the defect-frame archive")
+frames_evicted = Counter("frames_evicted_total", "Archived frames evicted to stay within the disk budget")
+frames_archive_dropped = Counter("frames_archive_dropped_total", "Frames not archived because the write queue was full")
+frames_archive_bytes = Gauge("frames_archive_bytes", "Bytes held in the defect-frame archive")
+defect_frames_raw = Counter("defect_frames_raw_total", "Results with at least one detection above threshold")
+defect_events_emitted = Counter("defect_events_emitted_total", "Coalesced defect events sent to the sinks", ["state"])
+defect_events_suppressed = Counter("defect_events_suppressed_total", "Defect frames not alarmed because of the re-alarm hold-off")
+defect_incidents_active = Gauge("defect_incidents_active", "Defect incidents started and not yet cleared")
 e2e_latency_ms = Histogram("e2e_latency_ms", "Approx end-to-end pipeline latency (ms)", buckets=(1,5,10,20,50,100,200,500,1000))
 
+STATS_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+latency_windows: Dict[str, RollingSketch] = {}
+
+
+def _observe_latency(line_id: str, ms: float) -> None:
+    for key in ("all", line_id):
+        w = latency_windows.get(key)
+        if w is None:
+            w = latency_windows.setdefault(key, RollingSketch(slot_s=10, horizon_s=max(STATS_WINDOWS.values())))
+        w.add(ms)
+
+
 gov = GovernanceLogger(base_dir=Path(os.getenv("GOVERNANCE_DIR", "/app/data/governance")))
 
-subscribers = []
+
+def _on_gov_flush(n: int, ms: float) -> None:
+    governance_signed.inc(n)
+    governance_batch_size.observe(n)
+    governance_flush_ms.observe(ms)
+
+
+def _on_gov_compress(raw: int, comp: int, ms: float) -> None:
+    governance_segment_bytes.labels("raw").inc(raw)
+    governance_segment_bytes.labels("compressed").inc(comp)
+    governance_compress_ms.observe(ms)
+
+
+gov_maintenance = GovernanceMaintenance.from_env(gov, on_compress=_on_gov_compress, on_retention=governance_retention_removed.inc)
+gov_writer = GroupCommitWriter.from_env(gov, on_flush=_on_gov_flush, on_rotate=gov_maintenance.wake)
+governance_pending.set_function(gov_writer.pending)
+
+
+def _on_frame_archived(size: int) -> None:
+    frames_archived.inc()
+    frames_archived_bytes.inc(size)
+
+
+frame_archive = FrameArchive.from_env(on_persist=_on_frame_archived, on_evict=frames_evicted.inc, on_drop=frames_archive_dropped.inc)
+frames_archive_bytes.set_function(lambda: frame_archive.disk_bytes)
+
+hub = BroadcastHub(
+    buffer=int(os.getenv("SSE_BUFFER", "256")),
+    history=int(os.getenv("SSE_HISTORY", "1024")),
+    on_drop=sse_dropped.inc,
+)
+sse_subscribers.set_function(lambda: len(hub.subscribers))
 import asyncio
 # removed unused imports
 
+
+def _on_mqtt_ack(ms: float) -> None:
+    mqtt_acked.inc()
+    mqtt_ack_latency_ms.observe(ms)
+
+
+mqtt_client: MqttPublisher | None = None
+try:
+    mqtt_client = MqttPublisher.from_env(on_send=mqtt_published.inc, on_ack=_on_mqtt_ack, on_drop=mqtt_dropped.inc)
+    mqtt_queue_depth.set_function(mqtt_client.queue_depth)
+    mqtt_inflight.set_function(mqtt_client.inflight)
+    mqtt_connected.set_function(lambda: 1 if mqtt_client.connected else 0)
+except Exception as e:
+    print(f"[results_adapter] MQTT disabled: {e}", flush=True)
+    mqtt_client = None
+
 OPCUA_ENABLED = os.getenv("OPCUA_ENABLED", "false").lower() in ("1", "true", "yes")
 
-# Readiness state, updated by a background checker
-_mqtt_ready: bool = False
-_opcua_ready: bool = False
 
-async def _periodic_readiness_checks() -> None:
-    global _mqtt_ready, _opcua_ready
+def _on_opcua_write(ms: float, ok: bool, n_nodes: int) -> None:
+    opcua_write_ms.observe(ms)
+    if not ok:
+        opcua_write_failures.inc()
+
+
+opcua_session = OpcUaSession.from_env(on_write=_on_opcua_write, on_reconnect=opcua_reconnects.inc, on_coalesce=opcua_coalesced.inc)
+opcua_connected.set_function(lambda: 1 if opcua_session.connected else 0)
+
+
+def _on_webhook_batch(ok: bool, n: int, ms: float) -> None:
+    webhook_batches.labels("ok" if ok else "error").inc()
+    webhook_batch_ms.observe(ms)
+    if ok:
+        webhook_sent.inc(n)
+
+
+webhook = WebhookDispatcher.from_env(on_batch=_on_webhook_batch, on_error=lambda stage: webhook_errors.labels(stage).inc())
+webhook_spool_depth.set_function(webhook.spool_depth)
+WEBHOOK_URL = webhook.url
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+coalescer = DefectCoalescer.from_env(on_suppress=defect_events_suppressed.inc)
+defect_incidents_active.set_function(coalescer.active)
+
+
+def _dispatch_defect(line_id: str, payload: Dict[str, Any]) -> None:
+    # encoded once here; every sink sends these same bytes
+    item = {"line_id": line_id, "topic": f"edgesight/line/{line_id}/defect", "payload": payload, "body": dumps(payload)}
+    targets = ["mqtt"]
+    if OPCUA_ENABLED:
+        targets.append("opcua")
+    if WEBHOOK_URL:
+        targets.append("webhook")
+    sinks.submit(item, targets)
+
+
+def _emit_incidents(events) -> None:
+    for ev in events:
+        last = ev.pop("payload")
+        defect_events_emitted.labels(ev["state"]).inc()
+        if ev["state"] == "cleared":
+            # a clear resets the alarm downstream: no detections, same incident id
+            payload = {"frame_id": last.get("frame_id"), "ts": datetime.utcnow().isoformat() + "Z", "detections": []}
+        else:
+            payload = dict(last)
+        payload["defect"] = ev
+        _dispatch_defect(ev["line_id"], payload)
+        hub.publish(dumps(ev), event="defect")
+        sse_published.inc()
+
+
+async def _coalesce_sweeper() -> None:
     while True:
-        _mqtt_ready = _check_mqtt()
-        _opcua_ready = _check_opcua() if OPCUA_ENABLED else True
-        await asyncio.sleep(5)
+        await asyncio.sleep(max(0.1, coalescer.window_s / 4))
+        try:
+            _emit_incidents(coalescer.sweep())
+        except Exception as e:
+            print(f"[results_adapter] coalesce sweep failed: {e}", flush=True)
 
-def _check_mqtt() -> bool:
-    try:
-        host = os.getenv("MQTT_BROKER", "mosquitto")
-        port = int(os.getenv("MQTT_PORT", "1883"))
-        import socket
-        with socket.create_connection((host, port), timeout=0.7):
-            return True
-    except Exception:
-        return False
 
-def _parse_host_port_from_endpoint(endpoint: str) -> tuple[str, int] | None:
-    try:
-        from urllib.parse import urlparse
-        p = urlparse(endpoint)
-        host = p.hostname
-        port = p.port
-        if host and port:
-            return host, int(port)
-    except Exception:
-        pass
-    return None
 
-def _check_opcua() -> bool:
-    try:
-        endpoint = os.getenv("OPCUA_ENDPOINT", "")
-        hp = _parse_host_port_from_endpoint(endpoint)
-        if not hp:
-            return False
-        host, port = hp
-        import socket
-        with socket.create_connection((host, port), timeout=0.7):
-            return True
-    except Exception:
+async def _sink_mqtt(item: Dict[str, Any]) -> bool:
+    if mqtt_client is None:
         return False
+    # Queued-while-offline still counts as accepted; the client owns redelivery
+    mqtt_client.publish(item["topic"], item["body"])
+    return True
+
+
+async def _sink_opcua(item: Dict[str, Any]) -> bool:
+    ok = await opcua_session.write_defect(item["line_id"], item["payload"], item["body"])
+    if ok:
+        opcua_published.inc()
+    return ok
+
+
+async def _sink_webhook(item: Dict[str, Any]) -> bool:
+    # Batching, retries and the durable spool live in the dispatcher; False only when its buffer is full
+    return webhook.submit(item["body"])
+
+
+def _on_sink_done(name: str, ok: bool, lag_ms: float) -> None:
+    sink_lag_ms.labels(name).observe(lag_ms)
+    if not ok:
+        sink_failures.labels(name).inc()
+
+
+def _on_sink_drop(name: str) -> None:
+    sink_dropped.labels(name).inc()
+
+
+sinks = SinkFanout()
+for _name, _handler, _defaults in (
+    ("mqtt", _sink_mqtt, {"timeout_s": 1.0, "retries": 0}),
+    ("opcua", _sink_opcua, {"timeout_s": 2.0}),
+    ("webhook", _sink_webhook, {"retries": 0}),
+):
+    _w = sinks.add(SinkWorker(_name, _handler, SinkPolicy.from_env(_name, **_defaults), on_done=_on_sink_done, on_drop=_on_sink_drop))
+    sink_queue_depth.labels(_name).set_function(_w.depth)
+    sink_circuit_open.labels(_name).set_function(lambda w=_w: 1 if w.breaker.open else 0)
+
 
 @app.on_event("startup")
 async def _on_startup():
-    # kick off background readiness checks
-    try:
-        asyncio.create_task(_periodic_readiness_checks())
-    except Exception:
-        pass
+    gov_writer.start()
+    gov_maintenance.start()
+    frame_archive.start()
+    sinks.start()
+    if COALESCE_ENABLED:
+        app.state.coalesce_task = asyncio.create_task(_coalesce_sweeper())
+    if WEBHOOK_URL:
+        await webhook.start()
+    if mqtt_client is not None:
+        try:
+            mqtt_client.start()
+        except Exception as e:
+            print(f"[results_adapter] MQTT start failed: {e}", flush=True)
+    if OPCUA_ENABLED:
+        await opcua_session.start()
+
+
+@app.on_event("shutdown")
+async def _on_shutdown():
+    task = getattr(app.state, "coalesce_task", None)
+    if task is not None:
+        task.cancel()
+    await sinks.stop()
+    await webhook.stop()
+    if mqtt_client is not None:
+        try:
+            mqtt_client.stop()
+        except Exception:
+            pass
+    await opcua_session.stop()
+    gov_writer.stop()
+    gov_maintenance.stop()
+    frame_archive.stop()
 
 @app.get("/healthz")
 def healthz():
@@ -123,10 +324,14 @@ def healthz():
 
 @app.get("/readyz")
 def readyz():
-    ok = _mqtt_ready and (_opcua_ready if OPCUA_ENABLED else True)
+    ok = (mqtt_client is not None and mqtt_client.connected) and (opcua_session.connected if OPCUA_ENABLED else True)
     return ({"status": "ready"} if ok else Response(status_code=503))
 
 
+# /debug/profile and the event_loop_lag_ms histogram (common/profiler.py)
+install_profiler(app)
+
+
 @app.get("/metrics")
 def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -135,7 +340,6 @@ def metrics():
 @app.post("/result")
 async def result(request: Request):
     payload = await request.json()
-    results_received.inc()
     try:
         span = trace.get_current_span()
         if "frame_id" in payload:
@@ -145,127 +349,296 @@ async def result(request: Request):
             span.set_attribute("corr_id", cid_hdr)
     except Exception:
         pass
+    await handle_result(payload, request.headers.get("X-Correlation-ID"))
+    return {"status": "ok"}
+
+
+@app.websocket("/result/stream")
+async def result_stream(websocket: WebSocket):
+    # /result over one long-lived connection: header {frame_id, corr_id?, result: {...}}
+    async def _handle(header: Dict[str, Any], payload: bytes) -> Dict[str, Any]:
+        with frame_span("result.frame", header):
+            await handle_result(header.get("result") or {}, header.get("corr_id"))
+        return {"status": "ok"}
+
+    await serve_stream(websocket, _handle, credits=int(os.getenv("STREAM_CREDITS", "16")))
+
+
+async def handle_result(payload: Dict[str, Any], corr_id: str | None = None) -> None:
+    """Govern, coalesce, archive and fan out one inference result (also called in-process by the edge monolith)."""
+    results_received.inc()
     line_id = os.getenv("LINE_ID", "line-1")
     threshold = float(os.getenv("CONF_THRESHOLD", "0.5"))
     detections = payload.get("detections", [])
     ts = payload.get("ts") or datetime.utcnow().isoformat() + "Z"
-    fire = any(d.get("score", 0.0) >= threshold for d in detections)
-
+    above = [d for d in detections if d.get("score", 0.0) >= threshold]
+    fire = bool(above)
     if fire:
-        topic = f"edgesight/line/{line_id}/defect"
-        if publish_mqtt(topic, json.dumps(payload).encode()):
-            mqtt_published.inc()
-        if OPCUA_ENABLED:
-            try:
-                ok = await write_defect_tag(line_id, payload)
-                if ok:
-                    opcua_published.inc()
-            except Exception:
-                pass
-        if send_webhook(os.getenv("WEBHOOK_URL", ""), payload):
-            webhook_sent.inc()
+        defect_frames_raw.inc()
+        keep("defect")
+    frame_id = payload.get("frame_id")
+    incidents = []
+    if COALESCE_ENABLED:
+        incidents = coalescer.observe((line_id, payload.get("camera_id") or ""), above, payload)
+    frame_ref = None
+    frame_sha = None
+    # archive once per alarm rather than once per defective frame
+    archive = fire and (not COALESCE_ENABLED or any(ev["state"] != "cleared" for ev in incidents))
+    if archive and frame_id is not None:
+        camera, session = payload.get("camera_id"), payload.get("session")
+        frame_sha = frame_archive.mark_defect(str(frame_id), line_id, camera, session)
+        if frame_sha:
+            frame_ref = f"frames/{frame_key(frame_id, camera, session)}"
+    trace_id_hex = None
+    try:
+        ctx = trace.get_current_span().get_span_context()
+        if ctx and getattr(ctx, 'trace_id', 0):
+            trace_id_hex = format(ctx.trace_id, '032x')
+    except Exception:
+        trace_id_hex = None
 
     record = {
         "frame_id": payload.get("frame_id"),
+        "corr_id": corr_id,
+        "line_id": line_id,
         "ts": ts,
         "detections": detections,
         "model_hash": payload.get("model_hash", "unknown"),
         "config_digest": payload.get("config_digest", "unknown"),
         "threshold": threshold,
         "latency_ms": payload.get("latency_ms"),
+        "trace_id": trace_id_hex,
     }
+    if frame_sha:
+        # signing the hash ties the decision to the archived pixels
+        record["frame_ref"] = frame_ref
+        record["frame_sha256"] = frame_sha
     try:
         if isinstance(record.get("latency_ms"), (int, float)):
             # Record histogram; OTEL bridge can surface exemplars when integrated with Grafana
             e2e_latency_ms.observe(float(record["latency_ms"]))
+            if record["latency_ms"] > tracing.settings.slow_ms:
+                keep("slow")
+            _observe_latency(line_id, float(record["latency_ms"]))
     except Exception:
         pass
-    gov.append_signed(record)
-    governance_signed.inc()
-
-    corr_id = request.headers.get("X-Correlation-ID")
-    trace_id_hex = None
-    try:
-        span = trace.get_current_span()
-        ctx = span.get_span_context()
-        if ctx and getattr(ctx, 'trace_id', 0):
-            trace_id_hex = format(ctx.trace_id, '032x')
-    except Exception:
-        trace_id_hex = None
-    event = json.dumps({
-        "ts": ts,
-        "frame_id": record["frame_id"],
-        "detections": detections,
-        "latency_ms": record.get("latency_ms"),
-        "corr_id": corr_id,
-        "trace_id": trace_id_hex
-    })
-    # structured log to stdout
+    env = ResultEnvelope(record)
+    # every frame is governed; only incident transitions reach the sinks
+    gov_writer.submit(env.record, env.body)
+
+    if frame_ref:
+        for ev in incidents:
+            if ev["payload"] is payload:
+                ev["payload"] = {**payload, "frame_ref": frame_ref}
+    if COALESCE_ENABLED:
+        _emit_incidents(incidents)
+    elif fire:
+        _dispatch_defect(line_id, {**payload, "frame_ref": frame_ref} if frame_ref else payload)
+
+    # structured log to stdout and the SSE event are the signed record's bytes
     try:
-        print(json.dumps({"event": "result", "frame_id": record["frame_id"], "ts": ts, "num_detections": len(detections), "corr_id": corr_id, "trace_id": trace_id_hex}), flush=True)
+        env.write_log()
     except Exception:
         pass
-    for queue in subscribers:
-        queue.append(event)
-    return {"status": "ok"}
+    hub.publish(env.body)
+    sse_published.inc()
+
+
+@app.get("/sinks")
+def sinks_status():
+    return sinks.stats()
+
+
+@app.get("/defects/stats")
+def defects_stats():
+    return {"enabled": COALESCE_ENABLED, **coalescer.stats()}
 
 
 @app.get("/events")
-async def events():
-    queue = []
-    subscribers.append(queue)
+async def events(request: Request, last_event_id: str | None = None):
+    sub = hub.subscribe(request.headers.get("Last-Event-ID") or last_event_id)
 
     async def event_stream():
         try:
-            last_ping = time.time()
+            yield b"retry: 2000\n\n"
             while True:
-                if queue:
-                    msg = queue.pop(0)
-                    yield f"data: {msg}\n\n"
-                # heartbeat every 10s
-                now = time.time()
-                if now - last_ping > 10:
-                    yield ": keep-alive\n\n"
-                    last_ping = now
-                await asyncio.sleep(0.2)
+                chunks = await sub.next(timeout=10)
+                # heartbeat every 10s when idle
+                yield b"".join(chunks) if chunks else b": keep-alive\n\n"
         except Exception:
             pass
         finally:
-            subscribers.remove(queue)
+            hub.unsubscribe(sub)
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
-_last_frame: bytes = b""
+@app.get("/events/stats")
+def events_stats():
+    return hub.stats()
+
+
+previews = PreviewHub(on_sent=preview_sent.inc, on_skip=preview_skipped.inc)
+preview_clients.set_function(lambda: previews.clients)
+PREVIEW_MAX_FPS = float(os.getenv("PREVIEW_MAX_FPS", "30"))
+
+
+def publish_preview(frame: bytes, camera: str | None = None, frame_id: str | None = None, session: str | None = None) -> None:
+    """Must run on the event loop (preview channels use asyncio events)."""
+    previews.publish(frame, camera)
+    if frame_id and frame:
+        frame_archive.add(frame_id, frame, camera, session)
 
 
 @app.post("/frame_preview")
 async def frame_preview(request: Request):
-    global _last_frame
     # Accept raw JPEG bytes
-    _last_frame = await request.body()
-    return {"status": "stored", "size": len(_last_frame)}
+    frame = await request.body()
+    publish_preview(frame, request.headers.get("X-Camera-ID"), request.headers.get("X-Frame-ID"), request.headers.get("X-Capture-Session"))
+    return {"status": "stored", "size": len(frame)}
 
 
 @app.get("/last_frame")
-def last_frame():
-    if not _last_frame:
+def last_frame(camera: str | None = None):
+    _, frame = previews.latest(camera)
+    if not frame:
         return Response(status_code=404)
-    return Response(content=_last_frame, media_type="image/jpeg")
+    return Response(content=frame, media_type="image/jpeg")
+
+
+@app.get("/preview/stream")
+async def preview_stream(camera: str | None = None, fps: float = 10.0):
+    """multipart/x-mixed-replace MJPEG; usable directly as an <img> src."""
+    fps = min(max(fps, 0.1), PREVIEW_MAX_FPS)
+
+    async def gen():
+        async for frame in previews.frames(camera, fps):
+            if not frame:
+                continue  # keep waiting; MJPEG has no keep-alive frame
+            yield b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(frame)
+            yield frame
+            yield b"\r\n"
+
+    return StreamingResponse(gen(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.websocket("/preview/ws")
+async def preview_ws(ws: WebSocket, camera: str | None = None, fps: float = 10.0):
+    """Binary JPEG messages; send {"fps": n} to change the rate."""
+    await ws.accept()
+    state = {"fps": min(max(fps, 0.1), PREVIEW_MAX_FPS)}
+
+    async def control():
+        while True:
+            msg = await ws.receive_json()
+            if isinstance(msg, dict) and isinstance(msg.get("fps"), (int, float)):
+                state["fps"] = min(max(float(msg["fps"]), 0.1), PREVIEW_MAX_FPS)
+
+    ctl = asyncio.create_task(control())
+    try:
+        async for frame in previews.frames(camera, lambda: state["fps"]):
+            if ctl.done():
+                break
+            if frame:
+                await ws.send_bytes(frame)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        ctl.cancel()
+
+
+@app.get("/preview/stats")
+def preview_stats():
+    return previews.stats()
+
+
+@app.get("/frames/stats")
+def frames_stats():
+    return frame_archive.stats()
+
+
+@app.get("/frames/{camera}/{session}/{frame_id}/context")
+def get_frame_context(camera: str, session: str, frame_id: str):
+    key = frame_key(frame_id, camera, session)
+    return {"frame_id": frame_id, "camera": camera, "session": session, "frames": sorted(frame_archive.context(key), key=lambda e: e.get("ts", 0))}
+
+
+@app.get("/frames/{camera}/{session}/{frame_id}")
+def get_frame(camera: str, session: str, frame_id: str):
+    """Archived (or still in memory) JPEG; frame_ref in events points here ("-" for no camera/session)."""
+    hit = frame_archive.get(frame_key(frame_id, camera, session))
+    if hit is None:
+        return JSONResponse({"error": "frame_not_found"}, status_code=404)
+    jpeg, meta = hit
+    headers = {"X-Camera-ID": meta.get("camera") or "", "X-Frame-Archived": "true" if meta.get("sha256") else "false"}
+    if meta.get("sha256"):
+        headers["X-Frame-SHA256"] = meta["sha256"]
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
+
 
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "9004")))
 
 
+@app.get("/stats")
+def stats():
+    out: Dict[str, Any] = {}
+    for key, w in sorted(latency_windows.items()):
+        out[key] = {}
+        for name, seconds in STATS_WINDOWS.items():
+            sk = w.window(seconds)
+            p50, p95, p99 = sk.quantiles((0.50, 0.95, 0.99))
+            out[key][name] = {
+                "count": sk.count,
+                "rate_per_s": round(sk.count / seconds, 3),
+                "latency_mean_ms": round(sk.mean(), 3),
+                "latency_p50_ms": round(p50, 3),
+                "latency_p95_ms": round(p95, 3),
+                "latency_p99_ms": round(p99, 3),
+            }
+    return {"windows": list(STATS_WINDOWS), "lines": out}
+
+
 @app.get("/governance/summary")
-def governance_summary(date_from: str, date_to: str):
-    return gov.summarize(date_from, date_to)
+def governance_summary(date_from: str, date_to: str, verify: bool = False, by_hour: bool = False):
+    gov_writer.flush()
+    return gov.summarize(date_from, date_to, verify=verify, by_hour=by_hour)
+
+
+def _epoch(ts: str | None) -> float | None:
+    if not ts:
+        return None
+    dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+@app.get("/governance/records")
+def governance_records(
+    frame_id: str | None = None,
+    corr_id: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    line_id: str | None = None,
+    limit: int = 100,
+):
+    if frame_id is None and corr_id is None and start is None:
+        return JSONResponse({"error": "missing_filter"}, status_code=400)
+    try:
+        t0, t1 = _epoch(start), _epoch(end)
+    except ValueError:
+        return JSONResponse({"error": "invalid_time"}, status_code=400)
+    gov_writer.flush()
+    limit = max(1, min(limit, 1000))
+    records = list(gov.find_records(frame_id=frame_id, corr_id=corr_id, start=t0, end=t1, line_id=line_id, limit=limit))
+    return {"records": records, "count": len(records), "truncated": len(records) >= limit}
 
 
 @app.get("/config")
 def get_config():
-    return {"opcua_enabled": OPCUA_ENABLED}
+    return {"opcua_enabled": OPCUA_ENABLED, **tracing.settings.to_dict()}
 
 
 @app.patch("/config")
@@ -275,6 +648,11 @@ async def patch_config(body: Dict[str, Any]):
     if "opcua_enabled" in body:
         OPCUA_ENABLED = bool(body["opcua_enabled"])
         changed["opcua_enabled"] = OPCUA_ENABLED
+        if OPCUA_ENABLED:
+            await opcua_session.start()
+        else:
+            await opcua_session.stop()
+    changed.update(tracing.settings.update(body))
     return {"updated": changed}
 
 
@@ -0,0 +1,87 @@
+"""Per-result serialization cost: encode per consumer vs encode once.
+
+Measures only the JSON work /result does for the governance line, SSE, the
+stdout log and (for --defect-rate of results) the sink payload; signing and
+I/O are the same in both paths and left out.
+
+    python -m services.results_adapter.bench_envelope --results 20000 --detections 5
+"""
+import argparse
+import json
+import time
+
+from services.common.jsonenc import BACKEND, dumps
+from services.common.ledger import signed_line
+from services.results_adapter.envelope import ResultEnvelope
+
+SIG = "ab" * 64
+
+
+def _payload(i: int, n_det: int) -> dict:
+    return {
+        "frame_id": i,
+        "ts": "2025-09-06T12:34:56.789Z",
+        "detections": [{"class_id": k % 4, "score": 0.91 - k / 100, "bbox": [10 + k, 12, 52 + k, 48]} for k in range(n_det)],
+        "model_hash": "sha256:" + "0" * 64,
+        "config_digest": "c" * 16,
+        "latency_ms": 12.3 + i % 7,
+    }
+
+
+def _record(p: dict) -> dict:
+    return {
+        "frame_id": p["frame_id"], "corr_id": f"f{p['frame_id']}", "line_id": "line-1", "ts": p["ts"],
+        "detections": p["detections"], "model_hash": p["model_hash"], "config_digest": p["config_digest"],
+        "threshold": 0.5, "latency_ms": p["latency_ms"], "trace_id": None,
+    }
+
+
+def per_consumer(payloads, defect_every: int) -> float:
+    t0 = time.perf_counter()
+    for i, p in enumerate(payloads):
+        rec = _record(p)
+        json.dumps(rec, sort_keys=True).encode()  # signed bytes
+        json.dumps({"record": rec, "sig": SIG})  # log line
+        json.dumps({k: rec[k] for k in ("ts", "frame_id", "detections", "latency_ms", "corr_id", "trace_id")})  # SSE
+        json.dumps({"event": "result", "frame_id": rec["frame_id"], "ts": rec["ts"], "num_detections": len(rec["detections"]), "corr_id": rec["corr_id"], "trace_id": None})
+        if defect_every and i % defect_every == 0:
+            for _ in range(3):  # MQTT, OPC UA, webhook
+                json.dumps(p)
+    return time.perf_counter() - t0
+
+
+def encode_once(payloads, defect_every: int) -> float:
+    t0 = time.perf_counter()
+    for i, p in enumerate(payloads):
+        env = ResultEnvelope(_record(p))
+        signed_line(env.body, SIG)
+        b"data: " + env.body + b"\n\n"
+        env.log_line()
+        if defect_every and i % defect_every == 0:
+            dumps(p)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--results", type=int, default=20000)
+    ap.add_argument("--detections", type=int, default=5)
+    ap.add_argument("--defect-rate", type=float, default=0.1, help="share of results that reach the sinks")
+    args = ap.parse_args()
+    payloads = [_payload(i, args.detections) for i in range(args.results)]
+    every = int(round(1 / args.defect_rate)) if args.defect_rate > 0 else 0
+    before = per_consumer(payloads, every)
+    after = encode_once(payloads, every)
+    n = args.results
+    print(json.dumps({
+        "backend": BACKEND,
+        "results": n,
+        "per_consumer_us_per_result": round(before / n * 1e6, 2),
+        "encode_once_us_per_result": round(after / n * 1e6, 2),
+        "speedup": round(before / after, 2) if after else None,
+        "cores_saved_at_1k_results_per_s": round((before - after) / n * 1000, 4),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Governance write throughput: per-record append vs group commit.
+
+    python -m services.results_adapter.bench_governance --records 5000
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from services.results_adapter.governance import GovernanceLogger, GroupCommitWriter
+
+
+def _record(i: int) -> dict:
+    return {
+        "frame_id": str(i),
+        "ts": "2024-01-01T00:00:00Z",
+        "detections": [{"class_id": 0, "score": 0.91, "bbox": [10, 10, 40, 40]}],
+        "model_hash": "h",
+        "config_digest": "c",
+        "threshold": 0.5,
+        "latency_ms": 12.3,
+    }
+
+
+def bench_append(n: int) -> float:
+    with tempfile.TemporaryDirectory() as d:
+        gov = GovernanceLogger(base_dir=Path(d))
+        t0 = time.perf_counter()
+        for i in range(n):
+            gov.append_signed(_record(i))
+        return n / (time.perf_counter() - t0)
+
+
+def bench_writer(n: int, batch_sign: bool, fsync: str) -> float:
+    with tempfile.TemporaryDirectory() as d:
+        gov = GovernanceLogger(base_dir=Path(d))
+        w = GroupCommitWriter(gov, fsync=fsync, batch_sign=batch_sign)
+        w.start()
+        t0 = time.perf_counter()
+        for i in range(n):
+            w.submit(_record(i))
+        w.stop()
+        return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=5000)
+    ap.add_argument("--fsync", choices=["batch", "interval", "off"], default="batch")
+    args = ap.parse_args()
+    out = {
+        "append_signed": bench_append(args.records),
+        "group_commit": bench_writer(args.records, False, args.fsync),
+        "group_commit_batch_sign": bench_writer(args.records, True, args.fsync),
+    }
+    print(json.dumps({k: round(v, 1) for k, v in out.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Set, Tuple, Union
+
+
+class Subscriber:
+    def __init__(self, buffer: int):
+        self.buffer: Deque[bytes] = deque(maxlen=max(1, buffer))
+        self.wake = asyncio.Event()
+        self.dropped = 0
+        self._reported = 0
+
+    async def next(self, timeout: float) -> List[bytes]:
+        """Everything buffered, waiting up to ``timeout`` s; [] means send a keep-alive."""
+        if not self.buffer:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.wake.clear()
+        out = list(self.buffer)
+        self.buffer.clear()
+        if self.dropped > self._reported:
+            # tell the client it skipped events, so it can refetch state if it cares
+            out.insert(0, f'event: lag\ndata: {{"dropped": {self.dropped - self._reported}}}\n\n'.encode())
+            self._reported = self.dropped
+        return out
+
+
+class BroadcastHub:
+    """SSE fan-out: each event is encoded once and shared by every subscriber.
+
+    Subscribers hold a bounded buffer that drops the oldest event when full
+    (counted per subscriber) and are woken by an event rather than polling.
+    Event IDs increase across restarts; the last ``history`` events are kept so
+    a reconnect with ``Last-Event-ID`` replays what it missed.
+    """
+
+    def __init__(self, buffer: int = 256, history: int = 1024, on_drop: Optional[Callable[[int], None]] = None):
+        self.buffer = buffer
+        self.history: Deque[Tuple[int, bytes]] = deque(maxlen=max(1, history))
+        self.on_drop = on_drop
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+        # ms since epoch as the first ID keeps IDs monotonic over restarts
+        self._next_id = int(time.time() * 1000)
+
+    def publish(self, data: Union[str, bytes], event: Optional[str] = None) -> int:
+        """``data`` as bytes must be a single line (compact JSON is)."""
+        eid = self._next_id
+        self._next_id += 1
+        head = f"id: {eid}\n" + (f"event: {event}\n" if event else "")
+        if isinstance(data, bytes):
+            frame = head.encode() + b"data: " + data + b"\n\n"
+        else:
+            frame = (head + "".join(f"data: {line}\n" for line in data.split("\n")) + "\n").encode()
+        self.history.append((eid, frame))
+        self.published += 1
+        for sub in self.subscribers:
+            if len(sub.buffer) == sub.buffer.maxlen:
+                sub.dropped += 1
+                self.dropped += 1
+                if self.on_drop:
+                    self.on_drop(1)
+            sub.buffer.append(frame)
+            sub.wake.set()
+        return eid
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        sub = Subscriber(self.buffer)
+        if last_event_id:
+            try:
+                last = int(last_event_id)
+            except ValueError:
+                last = None
+            if last is not None:
+                missed = [f for eid, f in self.history if eid > last]
+                first_kept = self.history[0][0] if self.history else self._next_id
+                if first_kept > last + 1:
+                    # older than what we kept (or from before a restart, when history is empty): at least one event is gone
+                    sub.dropped += 1
+                for f in missed[-sub.buffer.maxlen:]:
+                    sub.buffer.append(f)
+                sub.dropped += max(0, len(missed) - sub.buffer.maxlen)
+                if sub.buffer or sub.dropped:
+                    sub.wake.set()
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "max_lag": max((len(s.buffer) for s in self.subscribers), default=0),
+        }
@@ -0,0 +1,181 @@
+import itertools
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Key = Tuple[str, str]
+
+
+def iou(a: Sequence[float], b: Sequence[float]) -> float:
+    """IoU of two [x1, y1, x2, y2] boxes."""
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class _Incident:
+    __slots__ = ("id", "cls", "bbox", "started", "last_seen", "last_emit", "frames", "max_score", "armed_at", "emitted", "last_payload")
+
+    def __init__(self, iid: str, det: Dict[str, Any], now: float, armed_at: float):
+        self.id = iid
+        self.cls = det.get("class_id")
+        self.bbox = det.get("bbox")
+        self.started = now
+        self.last_seen = now
+        self.last_emit = now
+        self.frames = 0
+        self.max_score = 0.0
+        self.armed_at = armed_at
+        self.emitted = False
+        self.last_payload: Dict[str, Any] = {}
+
+
+class DefectCoalescer:
+    """Turns per-frame defect detections into incident events per (line, camera).
+
+    A detection joins an open incident of the same class whose box overlaps by
+    at least ``iou_threshold`` (boxes are optional; without them class alone
+    matches). An incident emits ``started`` once, ``update`` every ``update_s``
+    while it persists (0 disables) and ``cleared`` after ``window_s`` without a
+    match. ``hold_off_s`` suppresses re-alarming the same class/region right
+    after it cleared: a new incident there only emits once the hold-off ends,
+    and emits nothing if it clears before then.
+    """
+
+    def __init__(
+        self,
+        window_s: float = 2.0,
+        iou_threshold: float = 0.3,
+        hold_off_s: float = 5.0,
+        update_s: float = 0.0,
+        on_suppress: Optional[Callable[[], None]] = None,
+    ):
+        self.on_suppress = on_suppress
+        self.window_s = window_s
+        self.iou_threshold = iou_threshold
+        self.hold_off_s = hold_off_s
+        self.update_s = update_s
+        self._open: Dict[Key, List[_Incident]] = {}
+        self._recent: Dict[Key, List[Tuple[float, Any, Any]]] = {}  # cleared at, class, bbox
+        self._ids = itertools.count(1)
+        self._prefix = format(int(time.time()), "x")
+        self.raw = 0
+        self.emitted: Dict[str, int] = {"started": 0, "update": 0, "cleared": 0}
+        self.suppressed = 0
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "DefectCoalescer":
+        return cls(
+            window_s=float(os.getenv("COALESCE_WINDOW_S", "2.0")),
+            iou_threshold=float(os.getenv("COALESCE_IOU", "0.3")),
+            hold_off_s=float(os.getenv("COALESCE_HOLD_OFF_S", "5.0")),
+            update_s=float(os.getenv("COALESCE_UPDATE_S", "0")),
+            **kwargs,
+        )
+
+    def _matches(self, cls: Any, bbox: Any, det: Dict[str, Any]) -> bool:
+        if cls != det.get("class_id"):
+            return False
+        if bbox is None or det.get("bbox") is None:
+            return True
+        return iou(bbox, det["bbox"]) >= self.iou_threshold
+
+    def _event(self, state: str, key: Key, inc: _Incident, now: float) -> Dict[str, Any]:
+        self.emitted[state] += 1
+        inc.last_emit = now
+        return {
+            "state": state,
+            "incident_id": inc.id,
+            "line_id": key[0],
+            "camera_id": key[1] or None,
+            "class_id": inc.cls,
+            "bbox": inc.bbox,
+            "frames": inc.frames,
+            "max_score": inc.max_score,
+            "started_ts": inc.started,
+            "duration_s": round(inc.last_seen - inc.started, 3),
+            "payload": inc.last_payload,
+        }
+
+    def observe(self, key: Key, detections: List[Dict[str, Any]], payload: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Feed one frame's above-threshold detections (may be empty); returns events to emit."""
+        now = time.time() if now is None else now
+        out = self._expire(key, now)
+        if not detections:
+            return out
+        self.raw += 1
+        incidents = self._open.setdefault(key, [])
+        touched = set()
+        for det in detections:
+            inc = next((i for i in incidents if i.id not in touched and self._matches(i.cls, i.bbox, det)), None)
+            if inc is None:
+                recent = [t for t, c, b in self._recent.get(key, []) if self._matches(c, b, det)]
+                armed_at = max(recent) + self.hold_off_s if recent else now
+                inc = _Incident(f"{self._prefix}-{next(self._ids)}", det, now, armed_at)
+                incidents.append(inc)
+            touched.add(inc.id)
+            inc.last_seen = now
+            inc.frames += 1
+            inc.max_score = max(inc.max_score, float(det.get("score", 0.0)))
+            if det.get("bbox") is not None:
+                inc.bbox = det["bbox"]
+            inc.last_payload = payload
+        for inc in incidents:
+            if inc.id not in touched:
+                continue
+            if not inc.emitted:
+                if now >= inc.armed_at:
+                    inc.emitted = True
+                    out.append(self._event("started", key, inc, now))
+                else:
+                    self.suppressed += 1
+                    if self.on_suppress:
+                        self.on_suppress()
+            elif self.update_s > 0 and now - inc.last_emit >= self.update_s:
+                out.append(self._event("update", key, inc, now))
+        return out
+
+    def _expire(self, key: Key, now: float) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        incidents = self._open.get(key)
+        recent = self._recent.get(key)
+        if recent:
+            self._recent[key] = [r for r in recent if now - r[0] < self.hold_off_s]
+        if not incidents:
+            return out
+        keep = []
+        for inc in incidents:
+            if now - inc.last_seen < self.window_s:
+                keep.append(inc)
+                continue
+            if inc.emitted:
+                out.append(self._event("cleared", key, inc, now))
+                if self.hold_off_s > 0:
+                    self._recent.setdefault(key, []).append((now, inc.cls, inc.bbox))
+        self._open[key] = keep
+        return out
+
+    def sweep(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Clear incidents on every key; call periodically so clears go out when frames stop."""
+        now = time.time() if now is None else now
+        out: List[Dict[str, Any]] = []
+        for key in list(self._open):
+            out.extend(self._expire(key, now))
+        return out
+
+    def active(self) -> int:
+        return sum(1 for incs in self._open.values() for i in incs if i.emitted)
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.emitted.values())
+        return {
+            "raw_defect_frames": self.raw,
+            "emitted": dict(self.emitted),
+            "suppressed_hold_off": self.suppressed,
+            "active_incidents": self.active(),
+            "reduction": round(1 - total / self.raw, 4) if self.raw else 0.0,
+        }
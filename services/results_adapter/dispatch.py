@@ -0,0 +1,211 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+@dataclass
+class SinkPolicy:
+    concurrency: int = 1
+    queue_max: int = 1000
+    timeout_s: float = 2.0
+    retries: int = 2
+    backoff_s: float = 0.2
+    breaker_failures: int = 5
+    breaker_reset_s: float = 10.0
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "SinkPolicy":
+        base = cls(**defaults)
+        prefix = f"SINK_{name.upper()}_"
+        return cls(
+            concurrency=int(os.getenv(prefix + "CONCURRENCY", base.concurrency)),
+            queue_max=int(os.getenv(prefix + "QUEUE_MAX", base.queue_max)),
+            timeout_s=float(os.getenv(prefix + "TIMEOUT_S", base.timeout_s)),
+            retries=int(os.getenv(prefix + "RETRIES", base.retries)),
+            backoff_s=float(os.getenv(prefix + "BACKOFF_S", base.backoff_s)),
+            breaker_failures=int(os.getenv(prefix + "BREAKER_FAILURES", base.breaker_failures)),
+            breaker_reset_s=float(os.getenv(prefix + "BREAKER_RESET_S", base.breaker_reset_s)),
+        )
+
+
+class CircuitBreaker:
+    """Opens after N consecutive failures; after ``reset_s`` admits a single probe call (half-open).
+
+    The probe's result closes the breaker or re-opens it for another
+    ``reset_s``. Every other caller is refused while the probe is out. A probe
+    that never reports back stops blocking after another ``reset_s``.
+
+    ``allow()`` returns a ticket (0 when refused) to pass back to ``record``:
+    while open, only the probe's own ticket counts, so calls that started
+    before the breaker opened cannot end the probe window.
+    """
+
+    def __init__(self, failures: int, reset_s: float):
+        self.threshold = max(1, failures)
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+        self._probe = 0
+        self._tickets = 0
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self._probe_at is not None else "open"
+
+    def allow(self) -> int:
+        if self.opened_at is not None:
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_s:
+                return 0
+            if self._probe_at is not None and now - self._probe_at < self.reset_s:
+                return 0  # a probe is already out
+        self._tickets += 1
+        if self.opened_at is not None:
+            self._probe_at = now
+            self._probe = self._tickets
+        return self._tickets
+
+    def record(self, ok: bool, ticket: Optional[int] = None) -> None:
+        if ticket is not None and self.opened_at is not None and ticket != self._probe:
+            return  # admitted before the breaker opened; only the probe decides now
+        self._probe_at = None
+        self._probe = 0
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+class SinkWorker:
+    """Bounded queue plus worker tasks for one sink, isolated from the others."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[bool]],
+        policy: SinkPolicy,
+        on_done: Optional[Callable[[str, bool, float], None]] = None,
+        on_drop: Optional[Callable[[str], None]] = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.on_done = on_done
+        self.on_drop = on_drop
+        self.breaker = CircuitBreaker(policy.breaker_failures, policy.breaker_reset_s)
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=max(1, self.policy.queue_max))
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(max(1, self.policy.concurrency))]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        self._tasks = []
+
+    def submit(self, item: Any) -> bool:
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait((time.perf_counter(), item))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.on_drop:
+                self.on_drop(self.name)
+            return False
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _deliver(self, item: Any) -> bool:
+        delay = self.policy.backoff_s
+        for attempt in range(self.policy.retries + 1):
+            ticket = self.breaker.allow()
+            if not ticket:
+                return False
+            try:
+                ok = bool(await asyncio.wait_for(self.handler(item), timeout=self.policy.timeout_s))
+            except Exception:
+                ok = False
+            self.breaker.record(ok, ticket)
+            if ok:
+                return True
+            if attempt < self.policy.retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+        return False
+
+    async def _run(self) -> None:
+        while True:
+            enqueued, item = await self._queue.get()
+            try:
+                ok = await self._deliver(item)
+                if ok:
+                    self.delivered += 1
+                else:
+                    self.failed += 1
+                if self.on_done:
+                    # lag: time from accept to delivery (or giving up)
+                    self.on_done(self.name, ok, (time.perf_counter() - enqueued) * 1000.0)
+            finally:
+                self._queue.task_done()
+
+    async def join(self) -> None:
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.depth(),
+            "queue_max": self.policy.queue_max,
+            "concurrency": self.policy.concurrency,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "circuit_open": self.breaker.open,
+            "circuit_state": self.breaker.state,
+        }
+
+
+class SinkFanout:
+    def __init__(self):
+        self.workers: Dict[str, SinkWorker] = {}
+
+    def add(self, worker: SinkWorker) -> SinkWorker:
+        self.workers[worker.name] = worker
+        return worker
+
+    def start(self) -> None:
+        for w in self.workers.values():
+            w.start()
+
+    async def stop(self) -> None:
+        for w in self.workers.values():
+            await w.stop()
+
+    def submit(self, item: Any, sinks: Optional[List[str]] = None) -> Dict[str, bool]:
+        names = sinks if sinks is not None else list(self.workers)
+        return {n: self.workers[n].submit(item) for n in names if n in self.workers}
+
+    def stats(self) -> Dict[str, Any]:
+        return {n: w.stats() for n, w in self.workers.items()}
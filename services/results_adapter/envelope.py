@@ -0,0 +1,36 @@
+import sys
+from typing import Any, Dict
+
+try:
+    from common.jsonenc import dumps
+    from common.ledger import canonical_v2
+except ImportError:  # imported from the repo root (tests)
+    from services.common.jsonenc import dumps
+    from services.common.ledger import canonical_v2
+
+
+class ResultEnvelope:
+    """One result record, JSON-encoded once.
+
+    ``body`` is the canonical (sorted, compact) encoding of ``record``. The
+    governance writer signs and stores those bytes, SSE sends them as the event
+    data and the stdout log line embeds them, so a result is serialized once
+    however many places it goes. Don't mutate ``record`` after construction.
+    """
+
+    __slots__ = ("record", "body")
+
+    def __init__(self, record: Dict[str, Any]):
+        self.record = record
+        self.body = canonical_v2(record)
+
+    def log_line(self, event: str = "result") -> bytes:
+        # splice the event name into the encoded object instead of re-encoding it
+        head = b'{"event":' + dumps(event)
+        return head + (b"," + self.body[1:] if self.body != b"{}" else b"}")
+
+    def write_log(self, event: str = "result") -> None:
+        out = sys.stdout.buffer
+        out.write(self.log_line(event) + b"\n")
+        out.flush()
+
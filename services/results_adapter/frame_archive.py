@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def frame_key(frame_id: Any, camera: Optional[str] = None, session: Optional[str] = None) -> str:
+    """``<camera>/<session>/<frame_id>``: frame ids restart per camera and per capture boot."""
+    return f"{camera or '-'}/{session or '-'}/{frame_id}"
+
+
+class FrameArchive:
+    """Recent-frame ring plus a content-addressed on-disk archive of defect frames.
+
+    Preview JPEGs are kept in memory keyed by ``frame_key(frame_id, camera,
+    session)`` (last ``ring_size``).
+    ``mark_defect`` queues the defect frame, the ``before`` frames preceding it
+    on the same camera and the next ``after`` frames as they arrive. A
+    background thread writes them as ``blobs/<sha[:2]>/<sha>.jpg`` and appends
+    to ``manifest.jsonl``. Past ``budget_bytes`` the oldest blobs are evicted.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ring_size: int = 300,
+        before: int = 5,
+        after: int = 5,
+        budget_bytes: int = 2 << 30,
+        queue_max: int = 1000,
+        on_persist: Optional[Callable[[int], None]] = None,
+        on_evict: Optional[Callable[[int], None]] = None,
+        on_drop: Optional[Callable[[], None]] = None,
+    ):
+        self.root = Path(root)
+        self.ring_size = max(1, ring_size)
+        self.before = before
+        self.after = after
+        self.budget_bytes = budget_bytes
+        self.on_persist = on_persist
+        self.on_evict = on_evict
+        self.on_drop = on_drop
+        self._ring: "OrderedDict[str, Tuple[str, float, bytes]]" = OrderedDict()
+        self._after: Dict[str, Optional[Tuple[int, str, str]]] = {}  # camera -> (remaining, defect key, line)
+        # frame key -> manifest entry, and sha -> size in write order (eviction order)
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._blobs: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_bytes = 0
+        self.persisted = 0
+        self.evicted = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max(1, queue_max))
+        self._thread: Optional[threading.Thread] = None
+        self._stale = 0
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "FrameArchive":
+        return cls(
+            root=Path(os.getenv("FRAME_ARCHIVE_DIR", "/app/data/frames")),
+            ring_size=int(os.getenv("FRAME_RING", "300")),
+            before=int(os.getenv("FRAME_CONTEXT_BEFORE", "5")),
+            after=int(os.getenv("FRAME_CONTEXT_AFTER", "5")),
+            budget_bytes=int(float(os.getenv("FRAME_ARCHIVE_MAX_MB", "2048")) * 1024 * 1024),
+            **kwargs,
+        )
+
+    @property
+    def manifest(self) -> Path:
+        return self.root / "manifest.jsonl"
+
+    def blob_path(self, sha: str) -> Path:
+        return self.root / "blobs" / sha[:2] / f"{sha}.jpg"
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load()
+        self._thread = threading.Thread(target=self._run, name="frame-archive", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _load(self) -> None:
+        if not self.manifest.exists():
+            return
+        with self.manifest.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                sha = entry.get("sha256")
+                if not sha or not self.blob_path(sha).exists():
+                    continue
+                key = entry.get("key") or frame_key(entry["frame_id"], entry.get("camera"), entry.get("session"))
+                if "defect_key" not in entry and entry.get("defect_frame_id") is not None:
+                    # written before frames were keyed by camera and session
+                    entry["defect_key"] = frame_key(entry["defect_frame_id"], entry.get("camera"), entry.get("session"))
+                self._index[key] = entry
+                if sha not in self._blobs:
+                    self._blobs[sha] = int(entry.get("size", 0))
+                    self.disk_bytes += self._blobs[sha]
+
+    def add(self, frame_id: str, jpeg: bytes, camera: Optional[str] = None, session: Optional[str] = None) -> None:
+        """Remember a preview frame; also archives it if a recent defect asked for frames after."""
+        cam = camera or ""
+        key = frame_key(frame_id, camera, session)
+        with self._lock:
+            self._ring[key] = (cam, session or "", frame_id, time.time(), jpeg)
+            self._ring.move_to_end(key)
+            while len(self._ring) > self.ring_size:
+                self._ring.popitem(last=False)
+            pending = self._after.get(cam)
+            if pending:
+                remaining, defect_key, line_id = pending
+                self._after[cam] = (remaining - 1, defect_key, line_id) if remaining > 1 else None
+                self._enqueue(key, self._ring[key], line_id, defect_key, "after")
+
+    def mark_defect(self, frame_id: str, line_id: str, camera: Optional[str] = None, session: Optional[str] = None) -> Optional[str]:
+        """Queue a defect frame with its context; returns its sha256, or None if not in the ring."""
+        key = frame_key(frame_id, camera, session)
+        with self._lock:
+            hit = self._ring.get(key)
+            if hit is None:
+                return None
+            cam, jpeg = hit[0], hit[4]
+            sha = hashlib.sha256(jpeg).hexdigest()
+            if self.before > 0:
+                # a capture restart starts a new session; its frames are not context for the old one
+                same_run = [(k, v) for k, v in self._ring.items() if v[0] == cam and v[1] == hit[1]]
+                pos = next(i for i, (k, _) in enumerate(same_run) if k == key)
+                for k, v in same_run[max(0, pos - self.before):pos]:
+                    self._enqueue(k, v, line_id, key, "before")
+            self._enqueue(key, hit, line_id, key, "defect", sha)
+            if self.after > 0:
+                self._after[cam] = (self.after, key, line_id)
+        return sha
+
+    def _enqueue(self, key: str, hit: Tuple[str, str, str, float, bytes], line_id: str, defect_key: str, role: str, sha: Optional[str] = None) -> None:
+        cam, session, frame_id, _, jpeg = hit
+        item = {"key": key, "frame_id": frame_id, "camera": cam, "session": session, "line_id": line_id, "defect_key": defect_key, "role": role, "jpeg": jpeg, "sha256": sha}
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            if self.on_drop:
+                self.on_drop()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            try:
+                self._persist(item)
+            except Exception as e:
+                print(f"[frame_archive] write failed for {item.get('key')}: {e}", flush=True)
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until everything queued so far is on disk."""
+        if self._thread and self._thread.is_alive():
+            self._queue.join()
+
+    def _persist(self, item: Dict[str, Any]) -> None:
+        jpeg = item.pop("jpeg")
+        sha = item["sha256"] or hashlib.sha256(jpeg).hexdigest()
+        item["sha256"] = sha
+        item["size"] = len(jpeg)
+        item["ts"] = time.time()
+        with self._lock:
+            old = self._index.get(item["key"])
+        if old is not None and old.get("role") == "defect" and item["role"] != "defect":
+            return  # already archived as a defect in its own right; keep that entry
+        path = self.blob_path(sha)
+        new_blob = not path.exists()
+        if new_blob:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(jpeg)
+            tmp.replace(path)
+        with self.manifest.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(item) + "\n")
+        with self._lock:
+            old = self._index.get(item["key"])
+            if old is not None and old["sha256"] != sha:
+                self._stale += 1
+            self._index[item["key"]] = item
+            if new_blob:
+                self._blobs[sha] = len(jpeg)
+                self.disk_bytes += len(jpeg)
+        self.persisted += 1
+        if self.on_persist:
+            self.on_persist(len(jpeg))
+        self._evict()
+
+    def _evict(self) -> None:
+        removed: List[str] = []
+        with self._lock:
+            while self.disk_bytes > self.budget_bytes and len(self._blobs) > 1:
+                sha, size = self._blobs.popitem(last=False)
+                self.disk_bytes -= size
+                removed.append(sha)
+            if removed:
+                gone = set(removed)
+                for key in [k for k, v in self._index.items() if v["sha256"] in gone]:
+                    del self._index[key]
+                    self._stale += 1
+        for sha in removed:
+            self.blob_path(sha).unlink(missing_ok=True)
+            self.evicted += 1
+            if self.on_evict:
+                self.on_evict(1)
+        if self._stale > max(1000, len(self._index)):
+            self._compact()
+
+    def _compact(self) -> None:
+        with self._lock:
+            entries = list(self._index.values())
+            self._stale = 0
+        tmp = self.manifest.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for e in entries:
+                f.write(json.dumps(e) + "\n")
+        tmp.replace(self.manifest)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """JPEG and metadata (by ``frame_key``) from the archive, else from the in-memory ring."""
+        with self._lock:
+            entry = self._index.get(key)
+            hit = self._ring.get(key)
+        if entry is not None:
+            try:
+                return self.blob_path(entry["sha256"]).read_bytes(), entry
+            except OSError:
+                pass
+        if hit is not None:
+            cam, session, frame_id, ts, jpeg = hit
+            return jpeg, {"key": key, "frame_id": frame_id, "camera": cam, "session": session, "ts": ts, "archived": False}
+        return None
+
+    def context(self, defect_key: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [e for e in self._index.values() if e.get("defect_key") == defect_key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ring": len(self._ring),
+            "archived_frames": len(self._index),
+            "disk_bytes": self.disk_bytes,
+            "budget_bytes": self.budget_bytes,
+            "queue_depth": self._queue.qsize(),
+            "persisted": self.persisted,
+            "evicted": self.evicted,
+            "dropped": self.dropped,
+        }
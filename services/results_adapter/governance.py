@@ -1,11 +1,32 @@
-import json
+import os
+import threading
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import BinaryIO, Dict, Any, Iterator, List, Optional, Callable, Tuple
 
 from nacl.signing import SigningKey, VerifyKey
-from nacl.exceptions import BadSignatureError
+
+try:
+    from common.ledger import canonical_v2, encode_batch, parse_line, signed_line, verify_wrapped, LedgerVerifier, ZERO_ROOT
+except ImportError:  # imported from the repo root (tests)
+    from services.common.ledger import canonical_v2, encode_batch, parse_line, signed_line, verify_wrapped, LedgerVerifier, ZERO_ROOT
+
+try:
+    from common.segments import ACTIVE, compress_segment, disk_usage, list_segments, iter_lines, iter_lines_reversed, next_segment_path, segment_id
+except ImportError:  # imported from the repo root (tests)
+    from services.common.segments import ACTIVE, compress_segment, disk_usage, list_segments, iter_lines, iter_lines_reversed, next_segment_path, segment_id
+
+try:
+    from record_index import append_index, ensure_index, find_records, index_paths, rename_index
+except ImportError:  # imported from the repo root (tests)
+    from services.results_adapter.record_index import append_index, ensure_index, find_records, index_paths, rename_index
+
+try:
+    from rollup import DayRollup, Rollup, RollupStore
+except ImportError:  # imported from the repo root (tests)
+    from services.results_adapter.rollup import DayRollup, Rollup, RollupStore
 
 
 @dataclass
@@ -17,6 +38,7 @@ class GovernanceLogger:
         self.keys_dir = self.base_dir / "keys"
         self.keys_dir.mkdir(parents=True, exist_ok=True)
         self._ensure_keys()
+        self.rollups = RollupStore()
 
     def _ensure_keys(self):
         sk_path = self.keys_dir / "ed25519.sk"
@@ -33,50 +55,142 @@ class GovernanceLogger:
     def _log_path(self, dt: datetime) -> Path:
         day_dir = self.base_dir / dt.strftime("%Y-%m-%d")
         day_dir.mkdir(parents=True, exist_ok=True)
-        return day_dir / "decision.log.jsonl"
+        return day_dir / ACTIVE
+
+    def encode_signed(self, record: Dict[str, Any], body: Optional[bytes] = None) -> bytes:
+        """v2 log line; ``body`` is ``canonical_v2(record)`` when the caller already has it."""
+        if body is None:
+            body = canonical_v2(record)
+        return signed_line(body, self.signing_key.sign(body).signature.hex())
 
     def append_signed(self, record: Dict[str, Any]):
-        data_bytes = json.dumps(record, sort_keys=True).encode()
-        sig = self.signing_key.sign(data_bytes).signature.hex()
-        wrapped = {"record": record, "sig": sig}
         p = self._log_path(datetime.utcnow())
-        with p.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(wrapped) + "\n")
+        with p.open("ab") as f:
+            start = f.tell()
+            f.write(self.encode_signed(record) + b"\n")
+            end = f.tell()
+        self.rollups.record_written(p.parent, [record], start, end)
+        self.index_written(p, [(start, end, [(start, record)])])
 
-    def enforce_retention(self, days: int = 30) -> int:
-        cutoff = datetime.utcnow().date() - timedelta(days=days)
-        removed = 0
+    def index_written(self, segment: Path, blocks) -> None:
+        try:
+            append_index(segment, blocks)
+        except Exception as e:
+            print(f"[governance] index append failed for {segment}: {e}", flush=True)
+
+    def find_records(self, **filters) -> Iterator[Dict[str, Any]]:
+        """Indexed lookup by ``frame_id``, ``corr_id``, ``start``/``end`` (epoch s) and ``line_id``."""
+        return find_records(self.base_dir, self.verify_key, **filters)
+
+    def rotate(self, day_dir: Path) -> Path:
+        """Close the active segment; it is compressed later by ``GovernanceMaintenance``."""
+        closed = next_segment_path(day_dir)
+        self.rollups.rotate(day_dir, closed)
+        rename_index(day_dir / ACTIVE, closed)
+        return closed
+
+    def _day_dirs(self) -> List[Path]:
+        out = []
         for day_dir in self.base_dir.glob("*"):
             try:
-                d = datetime.strptime(day_dir.name, "%Y-%m-%d").date()
+                datetime.strptime(day_dir.name, "%Y-%m-%d")
             except ValueError:
                 continue
-            if d < cutoff:
-                try:
-                    for fp in day_dir.glob("*"):
-                        fp.unlink(missing_ok=True)  # type: ignore[arg-type]
-                    day_dir.rmdir()
-                    removed += 1
-                except Exception:
-                    pass
-        return removed
+            out.append(day_dir)
+        return sorted(out)
 
-    def verify_record(self, wrapped: Dict[str, Any]) -> bool:
+    def _remove_day(self, day_dir: Path) -> bool:
         try:
-            data_bytes = json.dumps(wrapped["record"], sort_keys=True).encode()
-            sig = bytes.fromhex(wrapped["sig"])
-            self.verify_key.verify(data_bytes, sig)
+            for fp in day_dir.glob("*"):
+                fp.unlink(missing_ok=True)  # type: ignore[arg-type]
+            day_dir.rmdir()
             return True
-        except (KeyError, BadSignatureError, ValueError):
+        except Exception:
             return False
 
-    def summarize(self, date_from: str, date_to: str) -> Dict[str, Any]:
+    def enforce_retention(self, days: int = 30, max_disk_bytes: int = 0) -> int:
+        """Drop days older than ``days``, then oldest data until under ``max_disk_bytes``.
+
+        The budget removes whole days first and then closed segments of the
+        current day, never the active segment. Returns days plus segments removed.
+        """
+        cutoff = datetime.utcnow().date() - timedelta(days=days)
+        removed = 0
+        day_dirs = self._day_dirs()
+        for day_dir in list(day_dirs):
+            if datetime.strptime(day_dir.name, "%Y-%m-%d").date() < cutoff and self._remove_day(day_dir):
+                removed += 1
+                day_dirs.remove(day_dir)
+        if max_disk_bytes <= 0:
+            return removed
+        usage = sum(disk_usage(d) for d in day_dirs)
+        while usage > max_disk_bytes and len(day_dirs) > 1:
+            oldest = day_dirs.pop(0)
+            size = disk_usage(oldest)
+            if self._remove_day(oldest):
+                removed += 1
+                usage -= size
+        if usage > max_disk_bytes and day_dirs:
+            dropped = 0
+            for seg in list_segments(day_dirs[0]):
+                if usage <= max_disk_bytes or seg.name == ACTIVE:
+                    break
+                size = seg.stat().st_size
+                seg.unlink(missing_ok=True)
+                for p in index_paths(seg):
+                    p.unlink(missing_ok=True)
+                dropped += 1
+                usage -= size
+            if dropped:
+                removed += dropped
+                # the sidecar still counts the deleted segments; recount what is left
+                self.day_rollup(day_dirs[0], verify=True)
+        return removed
+
+    def verify_record(self, wrapped: Dict[str, Any], header: Optional[Dict[str, Any]] = None) -> bool:
+        return verify_wrapped(self.verify_key, wrapped, header)
+
+    def _scan(self, log: Path, offset: int, rollup: DayRollup) -> int:
+        """Verify and count complete log lines from ``offset``; returns the new offset."""
+        verifier = LedgerVerifier(self.verify_key)
+        for pos, line in iter_lines(log, offset):
+            if not line.endswith(b"\n"):
+                break  # partial line still being written
+            offset = pos + len(line)
+            if not line.strip():
+                continue
+            try:
+                wrapped = parse_line(line)
+            except ValueError:
+                rollup.day.total += 1
+                rollup.day.invalid += 1
+                continue
+            ok = verifier.feed(wrapped)
+            if ok is None:
+                continue
+            rec = wrapped.get("record") if isinstance(wrapped.get("record"), dict) else {}
+            rollup.add(rec, ok, hour="00")
+        return offset
+
+    def day_rollup(self, day_dir: Path, verify: bool = False) -> DayRollup:
+        """Rollup for one day; ``verify`` rebuilds it by re-checking every signature."""
+        if verify:
+            rollup = DayRollup(day_dir)
+            for seg in list_segments(day_dir):
+                end = self._scan(seg, 0, rollup)
+                if seg.name == ACTIVE:
+                    rollup.offset = end
+                else:
+                    rollup.segments[segment_id(seg)] = end
+            self.rollups.replace(day_dir, rollup)
+            return rollup
+        return self.rollups.read(day_dir, self._scan)
+
+    def summarize(self, date_from: str, date_to: str, verify: bool = False, by_hour: bool = False) -> Dict[str, Any]:
         start = datetime.strptime(date_from, "%Y-%m-%d").date()
         end = datetime.strptime(date_to, "%Y-%m-%d").date()
-        totals = 0
-        invalid = 0
-        detections = 0
-        latencies = []
+        total = Rollup()
+        hours: Dict[str, Any] = {}
         for day_dir in sorted(self.base_dir.glob("*")):
             try:
                 d = datetime.strptime(day_dir.name, "%Y-%m-%d").date()
@@ -84,25 +198,326 @@ class GovernanceLogger:
                 continue
             if d < start or d > end:
                 continue
-            log = day_dir / "decision.log.jsonl"
-            if not log.exists():
+            if not list_segments(day_dir):
                 continue
-            for line in log.read_text(encoding="utf-8").splitlines():
-                if not line.strip():
+            rollup = self.day_rollup(day_dir, verify=verify)
+            total.merge(rollup.day)
+            if by_hour:
+                for h, r in sorted(rollup.hours.items()):
+                    hours[f"{day_dir.name}T{h}"] = r.summary()
+        out = total.summary()
+        out["total_records"] = out["total"]
+        out["invalid_signatures"] = out["invalid"]
+        out["verified"] = verify
+        if by_hour:
+            out["hours"] = hours
+        return out
+
+
+class GroupCommitWriter:
+    """Background group-commit writer for the decision log.
+
+    Records are buffered and written together every ``batch_max`` records or
+    ``flush_ms``, through a day file that stays open. ``fsync`` is ``batch``
+    (every flush), ``interval`` (at most every ``fsync_interval_s``) or ``off``.
+    With ``batch_sign`` each flush is signed once as a hash-chained Merkle batch
+    instead of one signature per record; the chain runs through all segments
+    of a day and resumes from the day's last batch header after a restart. The
+    active segment is rotated at a flush boundary once it passes ``segment_bytes``.
+    """
+
+    def __init__(
+        self,
+        gov: GovernanceLogger,
+        batch_max: int = 256,
+        flush_ms: float = 50.0,
+        fsync: str = "batch",
+        fsync_interval_s: float = 1.0,
+        batch_sign: bool = False,
+        segment_bytes: int = 64 * 1024 * 1024,
+        on_flush: Optional[Callable[[int, float], None]] = None,
+        on_rotate: Optional[Callable[[Path], None]] = None,
+    ):
+        self.gov = gov
+        self.batch_max = max(1, batch_max)
+        self.flush_s = flush_ms / 1000.0
+        self.fsync = fsync
+        self.fsync_interval_s = fsync_interval_s
+        self.batch_sign = batch_sign
+        self.segment_bytes = segment_bytes
+        self.on_flush = on_flush
+        self.on_rotate = on_rotate
+        self.written = 0
+        self._pending: List[Tuple[Dict[str, Any], Optional[bytes]]] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self._file: Optional[BinaryIO] = None
+        self._file_path: Optional[Path] = None
+        self._last_fsync = 0.0
+        self._seq = 0
+        self._chain = ZERO_ROOT
+        self._chain_day: Optional[Path] = None  # day directory _seq/_chain belong to
+
+    @classmethod
+    def from_env(cls, gov: GovernanceLogger, **kwargs) -> "GroupCommitWriter":
+        return cls(
+            gov,
+            batch_max=int(os.getenv("GOVERNANCE_BATCH_MAX", "256")),
+            flush_ms=float(os.getenv("GOVERNANCE_FLUSH_MS", "50")),
+            fsync=os.getenv("GOVERNANCE_FSYNC", "batch").lower(),
+            batch_sign=os.getenv("GOVERNANCE_BATCH_SIGN", "false").lower() in ("1", "true", "yes"),
+            segment_bytes=int(float(os.getenv("GOVERNANCE_SEGMENT_MB", "64")) * 1024 * 1024),
+            **kwargs,
+        )
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        active = self.gov._log_path(datetime.utcnow())
+        if active.exists():
+            # cover anything an older writer appended without indexing
+            ensure_index(active)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="governance-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.flush()
+        with self._write_lock:
+            self._close()
+
+    def submit(self, record: Dict[str, Any], body: Optional[bytes] = None) -> None:
+        """Queue a record; pass ``body`` (its ``canonical_v2`` bytes) to skip re-encoding it."""
+        with self._cond:
+            self._pending.append((record, body))
+            if len(self._pending) >= self.batch_max:
+                self._cond.notify()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> None:
+        """Write whatever is buffered now, on the caller's thread."""
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stop and len(self._pending) < self.batch_max:
+                    self._cond.wait(timeout=self.flush_s)
+                batch, self._pending = self._pending, []
+                stopping = self._stop
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    print(f"[governance] write failed, {len(batch)} records lost: {e}", flush=True)
+            if stopping:
+                return
+
+    def _day_file(self) -> BinaryIO:
+        path = self.gov._log_path(datetime.utcnow())
+        if self._file is None or path != self._file_path:
+            self._close()
+            if path.parent != self._chain_day:
+                self._close_past_days(path.parent)
+                self._seq, self._chain = self._resume(path.parent)
+                self._chain_day = path.parent
+            self._file = path.open("ab")
+            self._file_path = path
+        return self._file
+
+    def _close_past_days(self, day_dir: Path) -> None:
+        """Rotate the active segment of every earlier day, so maintenance compresses it like any closed one."""
+        for past in self.gov._day_dirs():
+            if past.name >= day_dir.name:
+                break
+            try:
+                if (past / ACTIVE).stat().st_size == 0:
                     continue
-                wrapped = json.loads(line)
-                totals += 1
-                if not self.verify_record(wrapped):
-                    invalid += 1
-                rec = wrapped.get("record", {})
-                detections += len(rec.get("detections", []))
-                if "latency_ms" in rec and isinstance(rec["latency_ms"], (int, float)):
-                    latencies.append(float(rec["latency_ms"]))
-        p95 = 0.0
-        if latencies:
-            latencies.sort()
-            idx = int(0.95 * (len(latencies) - 1))
-            p95 = latencies[idx]
-        return {"total": totals, "invalid": invalid, "detections": detections, "latency_p95_ms": p95}
+                closed = self.gov.rotate(past)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"[governance] cannot close {past / ACTIVE}: {e}", flush=True)
+                continue
+            if self.on_rotate:
+                self.on_rotate(closed)
+
+    def _resume(self, day_dir: Path) -> Tuple[int, str]:
+        """``(seq, root)`` of the day's last batch header, newest segment first; a new day starts at ZERO_ROOT."""
+        for seg in reversed(list_segments(day_dir)):
+            try:
+                for line in iter_lines_reversed(seg):
+                    if not line.startswith(b'{"batch"'):
+                        continue
+                    try:
+                        header = parse_line(line)["batch"]
+                        return int(header["seq"]), str(header["root"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn last write
+            except (OSError, ValueError) as e:
+                print(f"[governance] cannot resume the batch chain from {seg}: {e}", flush=True)
+        return 0, ZERO_ROOT
+
+    def _close(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception:
+                pass
+            self._file.close()
+            self._file = None
+            self._file_path = None
 
+    def _write(self, items: List[Tuple[Dict[str, Any], Optional[bytes]]]) -> None:
+        with self._write_lock:
+            self._write_locked(items)
 
+    def _write_locked(self, items: List[Tuple[Dict[str, Any], Optional[bytes]]]) -> None:
+        t0 = time.perf_counter()
+        f = self._day_file()  # opening a day resumes its batch chain, so this comes first
+        records = [r for r, _ in items]
+        bodies = [b if b is not None else canonical_v2(r) for r, b in items]
+        # Chunk so a batch proof never grows past log2(batch_max) entries
+        lines: List[bytes] = []
+        # (first line, line count, [(line, record), ...]) per index block
+        groups: List[Tuple[int, int, List[Tuple[int, Dict[str, Any]]]]] = []
+        for i in range(0, len(records), self.batch_max):
+            chunk = records[i:i + self.batch_max]
+            chunk_bodies = bodies[i:i + self.batch_max]
+            base = len(lines)
+            if self.batch_sign:
+                self._seq += 1
+                batch_lines, self._chain = encode_batch(chunk_bodies, self._seq, self._chain, self.gov.signing_key)
+                lines.extend(batch_lines)
+                groups.append((base, len(batch_lines), [(base + 1 + k, r) for k, r in enumerate(chunk)]))
+            else:
+                lines.extend(self.gov.encode_signed(r, b) for r, b in zip(chunk, chunk_bodies))
+                groups.append((base, len(chunk), [(base + k, r) for k, r in enumerate(chunk)]))
+        start = f.tell()
+        f.write(b"\n".join(lines) + b"\n")
+        f.flush()
+        end = f.tell()
+        self.gov.rollups.record_written(self._file_path.parent, records, start, end)
+        # lines are bytes, so offsets follow from their lengths
+        offsets = [start]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line) + 1)
+        self.gov.index_written(self._file_path, [
+            (offsets[base], offsets[base + n], [(offsets[j], r) for j, r in recs]) for base, n, recs in groups
+        ])
+        now = time.monotonic()
+        if self.fsync == "batch" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval_s):
+            os.fsync(f.fileno())
+            self._last_fsync = now
+        self.written += len(records)
+        if self.on_flush:
+            self.on_flush(len(records), (time.perf_counter() - t0) * 1000.0)
+        if self.segment_bytes > 0 and end >= self.segment_bytes:
+            day_dir = self._file_path.parent
+            self._close()
+            closed = self.gov.rotate(day_dir)
+            if self.on_rotate:
+                self.on_rotate(closed)
+
+
+class GovernanceMaintenance:
+    """Background compression of closed segments plus scheduled retention."""
+
+    def __init__(
+        self,
+        gov: GovernanceLogger,
+        retention_days: int = 30,
+        max_disk_mb: float = 0.0,
+        interval_s: float = 3600.0,
+        block_kb: int = 1024,
+        on_compress: Optional[Callable[[int, int, float], None]] = None,
+        on_retention: Optional[Callable[[int], None]] = None,
+    ):
+        self.gov = gov
+        self.retention_days = retention_days
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.interval_s = interval_s
+        self.block_bytes = block_kb * 1024
+        self.on_compress = on_compress
+        self.on_retention = on_retention
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_retention = 0.0
+
+    @classmethod
+    def from_env(cls, gov: GovernanceLogger, **kwargs) -> "GovernanceMaintenance":
+        return cls(
+            gov,
+            retention_days=int(os.getenv("GOVERNANCE_RETENTION_DAYS", "30")),
+            max_disk_mb=float(os.getenv("GOVERNANCE_MAX_DISK_MB", "0")),
+            interval_s=float(os.getenv("GOVERNANCE_RETENTION_INTERVAL_S", "3600")),
+            **kwargs,
+        )
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="governance-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+
+    def wake(self, *_: Any) -> None:
+        self._wake.set()
+
+    def compress_pending(self) -> int:
+        done = 0
+        for day_dir in self.gov._day_dirs():
+            for seg in sorted(day_dir.glob("decision.*.jsonl")):
+                if self._stop.is_set():
+                    return done
+                if segment_id(seg) is None:
+                    continue
+                t0 = time.perf_counter()
+                raw = seg.stat().st_size
+                try:
+                    out = compress_segment(seg, self.block_bytes)
+                except Exception as e:
+                    print(f"[governance] compress {seg} failed: {e}", flush=True)
+                    continue
+                done += 1
+                if self.on_compress:
+                    self.on_compress(raw, out.stat().st_size, (time.perf_counter() - t0) * 1000.0)
+        return done
+
+    def run_retention(self) -> int:
+        removed = self.gov.enforce_retention(self.retention_days, self.max_disk_bytes)
+        self._last_retention = time.monotonic()
+        if self.on_retention:
+            self.on_retention(removed)
+        return removed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.compress_pending()
+            if time.monotonic() - self._last_retention >= self.interval_s or self._last_retention == 0.0:
+                try:
+                    self.run_retention()
+                except Exception as e:
+                    print(f"[governance] retention failed: {e}", flush=True)
+            self._wake.wait(timeout=min(self.interval_s, 60.0))
+            self._wake.clear()
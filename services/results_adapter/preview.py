@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple, Union
+
+
+class _Channel:
+    def __init__(self):
+        self.seq = 0
+        self.frame: bytes = b""
+        self.ts = 0.0
+        self.changed = asyncio.Event()
+
+
+class PreviewHub:
+    """Latest-frame fan-out for live preview, one channel per camera.
+
+    Only the newest JPEG per camera is held and every client gets that same
+    bytes object. Clients pace themselves to their own max FPS and always take
+    the newest frame when they are ready, so a slow client skips frames
+    instead of queueing them. Channels are created only by ``publish``: reading
+    a camera that never posted returns nothing or waits, so arbitrary
+    ``?camera=`` values cannot grow the hub.
+    """
+
+    def __init__(self, default_camera: str = "default", on_sent: Optional[Callable[[], None]] = None, on_skip: Optional[Callable[[int], None]] = None):
+        self.default_camera = default_camera
+        self.on_sent = on_sent
+        self.on_skip = on_skip
+        self._channels: Dict[str, _Channel] = {}
+        self._added: Optional[asyncio.Event] = None
+        self.clients = 0
+        self.published = 0
+        self.sent = 0
+        self.skipped = 0
+
+    def _channel(self, camera: Optional[str]) -> Optional[_Channel]:
+        return self._channels.get(camera or self.default_camera)
+
+    def publish(self, frame: bytes, camera: Optional[str] = None) -> int:
+        ch = self._channel(camera)
+        if ch is None:
+            ch = self._channels[camera or self.default_camera] = _Channel()
+            # wake clients waiting for a camera that had not posted yet
+            if self._added is not None:
+                self._added.set()
+                self._added = None
+        ch.frame = frame
+        ch.ts = time.time()
+        ch.seq += 1
+        self.published += 1
+        # wake everyone waiting on this camera, then arm a fresh event
+        ch.changed.set()
+        ch.changed = asyncio.Event()
+        return ch.seq
+
+    def _resolve(self, camera: Optional[str]) -> Optional[_Channel]:
+        if camera is None and self.default_camera not in self._channels and self._channels:
+            # no camera asked for and none posted without an ID: newest of any
+            return max(self._channels.values(), key=lambda c: c.ts)
+        return self._channel(camera)
+
+    def latest(self, camera: Optional[str] = None) -> Tuple[int, bytes]:
+        ch = self._resolve(camera)
+        if ch is None:
+            return 0, b""
+        return ch.seq, ch.frame
+
+    def cameras(self) -> Dict[str, Dict[str, float]]:
+        return {k: {"seq": c.seq, "age_s": round(time.time() - c.ts, 3) if c.ts else None} for k, c in self._channels.items()}
+
+    async def frames(
+        self,
+        camera: Optional[str] = None,
+        max_fps: Union[float, Callable[[], float]] = 10.0,
+        idle_s: float = 10.0,
+    ) -> AsyncIterator[bytes]:
+        """Yield frames for one client at most ``max_fps`` (a number or a getter, so
+        the rate can change mid-stream); b"" after ``idle_s`` without a new frame.
+
+        Without ``camera`` it follows the same camera as ``latest()``, checked
+        again whenever the current one goes idle."""
+        last_seq = 0
+        self.clients += 1
+        try:
+            ch = self._resolve(camera)
+            while ch is None:
+                if self._added is None:
+                    self._added = asyncio.Event()
+                try:
+                    await asyncio.wait_for(self._added.wait(), timeout=idle_s)
+                except asyncio.TimeoutError:
+                    yield b""
+                ch = self._resolve(camera)
+            while True:
+                started = time.monotonic()
+                if ch.seq == last_seq:
+                    try:
+                        await asyncio.wait_for(ch.changed.wait(), timeout=idle_s)
+                    except asyncio.TimeoutError:
+                        if camera is None and self._resolve(None) is not ch:
+                            ch, last_seq = self._resolve(None), 0
+                            continue
+                        yield b""
+                        continue
+                if last_seq and ch.seq > last_seq + 1:
+                    self.skipped += ch.seq - last_seq - 1
+                    if self.on_skip:
+                        self.on_skip(ch.seq - last_seq - 1)
+                last_seq = ch.seq
+                self.sent += 1
+                if self.on_sent:
+                    self.on_sent()
+                yield ch.frame
+                # the consumer resumes us only after the frame went out, so this paces real delivery
+                fps = max_fps() if callable(max_fps) else max_fps
+                wait = 1.0 / max(0.1, fps) - (time.monotonic() - started)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        finally:
+            self.clients -= 1
+
+    def stats(self) -> Dict[str, object]:
+        return {"clients": self.clients, "published": self.published, "sent": self.sent, "skipped": self.skipped, "cameras": self.cameras()}
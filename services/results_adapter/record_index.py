@@ -0,0 +1,211 @@
+import hashlib
+import json
+import math
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from common.ledger import parse_line, verify_wrapped
+    from common.segments import ACTIVE, iter_lines, list_segments, segment_size
+except ImportError:  # imported from the repo root (tests)
+    from services.common.ledger import parse_line, verify_wrapped
+    from services.common.segments import ACTIVE, iter_lines, list_segments, segment_size
+
+# Sparse per-segment index, next to each segment:
+#   <base>.keys.idx  (hash, offset) per record, for frame_id and corr_id
+#   <base>.time.idx  (ts_min, ts_max, start, end) per written block of lines
+# Offsets are into the uncompressed segment; a block starts at its batch header
+# when batch signing is on. Both files are append-only and read through memmap.
+KEY_DTYPE = np.dtype([("h", "<u8"), ("o", "<u8")])
+TIME_DTYPE = np.dtype([("t0", "<f8"), ("t1", "<f8"), ("o", "<u8"), ("e", "<u8")])
+REBUILD_BLOCK_LINES = 256
+
+Block = Tuple[int, int, List[Tuple[int, Dict[str, Any]]]]
+
+
+def key_hash(kind: str, value: Any) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{kind}:{value}".encode(), digest_size=8).digest(), "little")
+
+
+def record_time(record: Dict[str, Any]) -> float:
+    ts = record.get("ts")
+    if isinstance(ts, str):
+        try:
+            dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.timestamp()
+        except ValueError:
+            pass
+    return math.nan
+
+
+def index_paths(segment: Path) -> Tuple[Path, Path]:
+    base = segment.name.split(".jsonl")[0]
+    return segment.with_name(base + ".keys.idx"), segment.with_name(base + ".time.idx")
+
+
+def append_index(segment: Path, blocks: List[Block]) -> None:
+    """Index blocks the writer just appended: (start, end, [(offset, record), ...])."""
+    keys: List[Tuple[int, int]] = []
+    rows: List[Tuple[float, float, int, int]] = []
+    now = time.time()
+    for start, end, recs in blocks:
+        ts = [t for t in (record_time(r) for _, r in recs) if not math.isnan(t)] or [now]
+        rows.append((min(ts), max(ts), start, end))
+        for off, r in recs:
+            if r.get("frame_id") is not None:
+                keys.append((key_hash("frame_id", r["frame_id"]), off))
+            if r.get("corr_id"):
+                keys.append((key_hash("corr_id", r["corr_id"]), off))
+    keys_path, time_path = index_paths(segment)
+    with keys_path.open("ab") as f:
+        f.write(np.array(keys, dtype=KEY_DTYPE).tobytes())
+    with time_path.open("ab") as f:
+        f.write(np.array(rows, dtype=TIME_DTYPE).tobytes())
+
+
+def rename_index(active: Path, closed: Path) -> None:
+    for src, dst in zip(index_paths(active), index_paths(closed)):
+        if src.exists():
+            src.replace(dst)
+
+
+def _load(path: Path, dtype: np.dtype) -> np.ndarray:
+    try:
+        n = path.stat().st_size // dtype.itemsize
+    except OSError:
+        n = 0
+    if n == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(n,))
+
+
+def ensure_index(segment: Path) -> None:
+    """Index whatever part of a segment is not covered yet (older logs, lost index tail)."""
+    _, time_path = index_paths(segment)
+    rows = _load(time_path, TIME_DTYPE)
+    covered = int(rows["e"][-1]) if len(rows) else 0
+    if covered >= segment_size(segment):
+        return
+    if covered == 0:
+        for p in index_paths(segment):
+            p.unlink(missing_ok=True)
+    blocks: List[Block] = []
+    cur: Optional[List[Any]] = None
+    for off, line in iter_lines(segment, covered):
+        if not line.endswith(b"\n"):
+            break
+        try:
+            wrapped = parse_line(line)
+        except ValueError:
+            continue
+        if "batch" in wrapped or cur is None or ("sig" in wrapped and len(cur[2]) >= REBUILD_BLOCK_LINES):
+            if cur is not None:
+                blocks.append((cur[0], off, cur[2]))
+            cur = [off, off, []]
+        if isinstance(wrapped.get("record"), dict):
+            cur[2].append((off, wrapped["record"]))
+        cur[1] = off + len(line)
+    if cur is not None:
+        blocks.append((cur[0], cur[1], cur[2]))
+    if blocks:
+        append_index(segment, blocks)
+
+
+def _read_line(segment: Path, offset: int) -> Optional[Dict[str, Any]]:
+    for _, line in iter_lines(segment, offset, offset + 1):
+        try:
+            return parse_line(line)
+        except ValueError:
+            return None
+    return None
+
+
+def _header_for(segment: Path, rows: np.ndarray, offset: int) -> Optional[Dict[str, Any]]:
+    if not len(rows):
+        return None
+    i = int(np.searchsorted(rows["o"], offset, side="right")) - 1
+    if i < 0:
+        return None
+    first = _read_line(segment, int(rows["o"][i]))
+    return first.get("batch") if isinstance(first, dict) else None
+
+
+def find_records(
+    base_dir: Path,
+    verify_key,
+    frame_id: Optional[str] = None,
+    corr_id: Optional[str] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    line_id: Optional[str] = None,
+    limit: int = 100,
+) -> Iterator[Dict[str, Any]]:
+    """Signed records matching all given filters, with their verification status."""
+    day_dirs = []
+    for d in sorted(base_dir.glob("*")):
+        try:
+            day = datetime.strptime(d.name, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+        # records are filed by write time, which can trail the record ts by a little
+        if start is not None and day + 86400 + 3600 < start:
+            continue
+        if end is not None and day - 3600 > end:
+            continue
+        day_dirs.append(d)
+
+    found = 0
+    for day_dir in day_dirs:
+        for seg in list_segments(day_dir):
+            if seg.name != ACTIVE:
+                ensure_index(seg)
+            keys_path, time_path = index_paths(seg)
+            rows = _load(time_path, TIME_DTYPE)
+            if frame_id is not None or corr_id is not None:
+                keys = _load(keys_path, KEY_DTYPE)
+                h = key_hash("frame_id", frame_id) if frame_id is not None else key_hash("corr_id", corr_id)
+                offsets = sorted(int(o) for o in keys["o"][keys["h"] == np.uint64(h)])
+                candidates = ((o, _read_line(seg, o)) for o in offsets)
+            else:
+                mask = np.ones(len(rows), dtype=bool)
+                if start is not None:
+                    mask &= rows["t1"] >= start
+                if end is not None:
+                    mask &= rows["t0"] <= end
+                candidates = (
+                    (off, parse_line(line))
+                    for r in rows[mask]
+                    for off, line in iter_lines(seg, int(r["o"]), int(r["e"]))
+                    if line.strip()
+                )
+            for off, wrapped in candidates:
+                if not isinstance(wrapped, dict) or not isinstance(wrapped.get("record"), dict):
+                    continue
+                rec = wrapped["record"]
+                if frame_id is not None and str(rec.get("frame_id")) != str(frame_id):
+                    continue
+                if corr_id is not None and rec.get("corr_id") != corr_id:
+                    continue
+                if line_id is not None and rec.get("line_id") != line_id:
+                    continue
+                t = record_time(rec)
+                if (start is not None or end is not None) and math.isnan(t):
+                    continue
+                if (start is not None and t < start) or (end is not None and t > end):
+                    continue
+                header = None if "sig" in wrapped else _header_for(seg, rows, off)
+                yield {
+                    "record": rec,
+                    "valid": verify_wrapped(verify_key, wrapped, header),
+                    "segment": f"{day_dir.name}/{seg.name}",
+                    "offset": off,
+                }
+                found += 1
+                if found >= limit:
+                    return
@@ -0,0 +1,212 @@
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    from common.segments import ACTIVE, list_segments, segment_id, segment_size
+    from common.sketch import LatencySketch
+except ImportError:  # imported from the repo root (tests)
+    from services.common.segments import ACTIVE, list_segments, segment_id, segment_size
+    from services.common.sketch import LatencySketch
+
+
+class Rollup:
+    """Counters for one day or hour of decision records."""
+
+    def __init__(self):
+        self.total = 0
+        self.invalid = 0
+        self.detections = 0
+        self.by_class: Dict[str, int] = {}
+        self.latency = LatencySketch()
+
+    def add(self, record: Dict[str, Any], valid: bool = True) -> None:
+        self.total += 1
+        if not valid:
+            self.invalid += 1
+        dets = record.get("detections") or []
+        self.detections += len(dets)
+        for d in dets:
+            cls = str(d.get("class_id", "unknown")) if isinstance(d, dict) else "unknown"
+            self.by_class[cls] = self.by_class.get(cls, 0) + 1
+        lat = record.get("latency_ms")
+        if isinstance(lat, (int, float)):
+            self.latency.add(float(lat))
+
+    def merge(self, other: "Rollup") -> "Rollup":
+        self.total += other.total
+        self.invalid += other.invalid
+        self.detections += other.detections
+        for k, n in other.by_class.items():
+            self.by_class[k] = self.by_class.get(k, 0) + n
+        self.latency.merge(other.latency)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        p50, p95, p99 = self.latency.quantiles((0.50, 0.95, 0.99))
+        return {
+            "total": self.total,
+            "invalid": self.invalid,
+            "detections": self.detections,
+            "detections_by_class": dict(sorted(self.by_class.items())),
+            "latency_p50_ms": p50,
+            "latency_p95_ms": p95,
+            "latency_p99_ms": p99,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "invalid": self.invalid,
+            "detections": self.detections,
+            "by_class": self.by_class,
+            "latency": self.latency.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Rollup":
+        r = cls()
+        r.total = int(d.get("total", 0))
+        r.invalid = int(d.get("invalid", 0))
+        r.detections = int(d.get("detections", 0))
+        r.by_class = {str(k): int(n) for k, n in d.get("by_class", {}).items()}
+        r.latency = LatencySketch.from_dict(d.get("latency", {}))
+        return r
+
+
+def record_hour(record: Dict[str, Any], default: str) -> str:
+    ts = record.get("ts")
+    if isinstance(ts, str) and len(ts) >= 13 and ts[10] == "T":
+        return ts[11:13]
+    return default
+
+
+class DayRollup:
+    """``rollup.json`` sidecar next to a day's decision-log segments.
+
+    ``offset`` is how many bytes of the active segment are already counted and
+    ``segments`` the same per closed segment id; anything past them (a crash
+    between log write and sidecar write, or an external append) is picked up by
+    scanning only the tail.
+    """
+
+    FILENAME = "rollup.json"
+
+    def __init__(self, day_dir: Path):
+        self.day_dir = day_dir
+        self.offset = 0
+        self.segments: Dict[str, int] = {}
+        self.day = Rollup()
+        self.hours: Dict[str, Rollup] = {}
+
+    @property
+    def path(self) -> Path:
+        return self.day_dir / self.FILENAME
+
+    def add(self, record: Dict[str, Any], valid: bool = True, hour: Optional[str] = None) -> None:
+        h = record_hour(record, hour or datetime.utcnow().strftime("%H"))
+        self.day.add(record, valid)
+        self.hours.setdefault(h, Rollup()).add(record, valid)
+
+    @classmethod
+    def load(cls, day_dir: Path) -> "DayRollup":
+        r = cls(day_dir)
+        try:
+            d = json.loads(r.path.read_text(encoding="utf-8"))
+            r.offset = int(d.get("offset", 0))
+            r.segments = {str(k): int(v) for k, v in d.get("segments", {}).items()}
+            r.day = Rollup.from_dict(d.get("day", {}))
+            r.hours = {h: Rollup.from_dict(v) for h, v in d.get("hours", {}).items()}
+        except (OSError, ValueError):
+            r = cls(day_dir)
+        return r
+
+    def save(self) -> None:
+        doc = {"offset": self.offset, "segments": self.segments, "day": self.day.to_dict(), "hours": {h: v.to_dict() for h, v in sorted(self.hours.items())}}
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(doc), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+class RollupStore:
+    """Keeps the sidecars of the days being written in memory and persists them per flush."""
+
+    def __init__(self):
+        self._days: Dict[Path, DayRollup] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, day_dir: Path) -> DayRollup:
+        r = self._days.get(day_dir)
+        if r is None:
+            r = DayRollup.load(day_dir)
+            self._days[day_dir] = r
+        return r
+
+    def record_written(self, day_dir: Path, records: Iterable[Dict[str, Any]], start: int, end: int) -> None:
+        """Count records the writer just appended between byte offsets ``start`` and ``end``."""
+        with self._lock:
+            r = self._get(day_dir)
+            if r.offset != start:
+                # Sidecar is behind the log (older writer or crash); let the next read scan the gap
+                return
+            for rec in records:
+                r.add(rec)
+            r.offset = end
+            try:
+                r.save()
+            except OSError:
+                pass
+
+    def read(self, day_dir: Path, scan) -> DayRollup:
+        """Current rollup for ``day_dir``; ``scan(path, offset, rollup)`` counts a segment tail."""
+        with self._lock:
+            r = self._days.get(day_dir) or DayRollup.load(day_dir)
+            active = day_dir / ACTIVE
+            size = active.stat().st_size if active.exists() else 0
+            if size < r.offset:
+                # Active segment is not the one the sidecar saw; recount the day
+                r = DayRollup(day_dir)
+            changed = False
+            for seg in list_segments(day_dir):
+                sid = segment_id(seg)
+                if sid is None:
+                    continue
+                done = r.segments.get(sid, 0)
+                if done < segment_size(seg):
+                    r.segments[sid] = scan(seg, done, r)
+                    changed = True
+            if size > r.offset:
+                r.offset = scan(active, r.offset, r)
+                changed = True
+            if changed:
+                try:
+                    r.save()
+                except OSError:
+                    pass
+            if day_dir in self._days:
+                self._days[day_dir] = r
+            return r
+
+    def rotate(self, day_dir: Path, closed: Path) -> None:
+        """Rename the active segment to ``closed``, carrying its counted offset over."""
+        with self._lock:
+            r = self._get(day_dir)
+            (day_dir / ACTIVE).replace(closed)
+            r.segments[segment_id(closed)] = r.offset
+            r.offset = 0
+            try:
+                r.save()
+            except OSError:
+                pass
+
+    def replace(self, day_dir: Path, rollup: DayRollup) -> None:
+        with self._lock:
+            if day_dir in self._days:
+                self._days[day_dir] = rollup
+            try:
+                rollup.save()
+            except OSError:
+                pass
+
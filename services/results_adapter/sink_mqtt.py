@@ -1,10 +1,19 @@
 import os
-from typing import Optional
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
 
 try:
     import paho.mqtt.publish as publish
+    import paho.mqtt.client as mqtt
 except Exception:  # pragma: no cover
     publish = None
+    mqtt = None
+
+
+def _env_bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
 
 
 def publish_mqtt(topic: str, payload: bytes) -> bool:
@@ -40,3 +49,193 @@ def publish_mqtt(topic: str, payload: bytes) -> bool:
         return False
 
 
+
+
+class MqttPublisher:
+    """Long-lived MQTT client with a QoS 1 in-flight window and a bounded offline queue.
+
+    ``publish`` never blocks: messages go straight to the broker while connected and
+    under the in-flight window, otherwise into the queue (oldest dropped when full).
+    The paho network thread reconnects and drains the queue as acks come back.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 1883,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        qos: int = 1,
+        retain: bool = False,
+        tls_enabled: bool = False,
+        tls_insecure: bool = False,
+        client_id: str = "",
+        max_inflight: int = 20,
+        queue_max: int = 10000,
+        keepalive: int = 30,
+        on_send: Optional[Callable[[], None]] = None,
+        on_ack: Optional[Callable[[float], None]] = None,
+        on_drop: Optional[Callable[[], None]] = None,
+        client: Any = None,
+    ):
+        self.host = host
+        self.port = port
+        self.qos = qos
+        self.retain = retain
+        self.keepalive = keepalive
+        self.max_inflight = max(1, max_inflight)
+        self.on_send = on_send
+        self.on_ack = on_ack
+        self.on_drop = on_drop
+        self.connected = False
+        self.published = 0
+        self.acked = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self._ever_connected = False
+        self._queue: Deque[Tuple[str, bytes]] = deque(maxlen=max(1, queue_max))
+        self._inflight: Dict[int, float] = {}
+        self._sending = 0
+        self._acked_early: Set[int] = set()
+        self._lock = threading.Lock()
+        if client is None:
+            if mqtt is None:
+                raise RuntimeError("paho-mqtt not installed")
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+            if username:
+                client.username_pw_set(username, password or "")
+            if tls_enabled:
+                client.tls_set()
+                client.tls_insecure_set(tls_insecure)
+            client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.client = client
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "MqttPublisher":
+        return cls(
+            host=os.getenv("MQTT_BROKER", "localhost"),
+            port=int(os.getenv("MQTT_PORT", "1883")),
+            username=os.getenv("MQTT_USERNAME"),
+            password=os.getenv("MQTT_PASSWORD"),
+            qos=int(os.getenv("MQTT_QOS", "1")),
+            retain=_env_bool("MQTT_RETAIN"),
+            tls_enabled=_env_bool("MQTT_TLS_ENABLED"),
+            tls_insecure=_env_bool("MQTT_TLS_INSECURE"),
+            client_id=os.getenv("MQTT_CLIENT_ID", ""),
+            max_inflight=int(os.getenv("MQTT_MAX_INFLIGHT", "20")),
+            queue_max=int(os.getenv("MQTT_QUEUE_MAX", "10000")),
+            **kwargs,
+        )
+
+    def start(self) -> None:
+        self.client.connect_async(self.host, self.port, keepalive=self.keepalive)
+        self.client.loop_start()
+
+    def stop(self) -> None:
+        try:
+            self.client.disconnect()
+        finally:
+            self.client.loop_stop()
+
+    def publish(self, topic: str, payload: bytes) -> bool:
+        """Returns True when handed to the broker, False when queued for later."""
+        with self._lock:
+            if not (self.connected and not self._queue and len(self._inflight) + self._sending < self.max_inflight):
+                self._enqueue(topic, payload)
+                return False
+            self._sending += 1
+        # paho runs on_publish with its own message mutex held, and that callback
+        # takes self._lock; calling into paho here with self._lock held deadlocks.
+        t0 = time.perf_counter()
+        try:
+            info = self.client.publish(topic, payload=payload, qos=self.qos, retain=self.retain)
+        except Exception:
+            info = None
+        with self._lock:
+            self._sending -= 1
+            if info is None or info.rc != 0:
+                self._enqueue(topic, payload)
+                return False
+            self._sent(info.mid, t0)
+            return True
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "published": self.published,
+            "acked": self.acked,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "inflight": self.inflight(),
+            "queued": self.queue_depth(),
+        }
+
+    # Callers hold self._lock
+    def _send(self, topic: str, payload: bytes) -> bool:
+        t0 = time.perf_counter()
+        info = self.client.publish(topic, payload=payload, qos=self.qos, retain=self.retain)
+        if info.rc != 0:
+            return False
+        self._sent(info.mid, t0)
+        return True
+
+    def _sent(self, mid: int, t0: float) -> None:
+        self.published += 1
+        if mid in self._acked_early:
+            # the ack beat publish() back from paho
+            self._acked_early.discard(mid)
+        else:
+            self._inflight[mid] = t0
+        if self.on_send:
+            self.on_send()
+
+    def _enqueue(self, topic: str, payload: bytes) -> None:
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+            if self.on_drop:
+                self.on_drop()
+        self._queue.append((topic, payload))
+
+    def _drain(self) -> None:
+        while self.connected and self._queue and len(self._inflight) < self.max_inflight:
+            topic, payload = self._queue[0]
+            if not self._send(topic, payload):
+                break
+            self._queue.popleft()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if getattr(reason_code, "is_failure", bool(reason_code)):
+            return
+        with self._lock:
+            if self._ever_connected:
+                self.reconnects += 1
+            self._ever_connected = True
+            self.connected = True
+            # Unacked QoS 1 messages are retransmitted by paho on reconnect; only
+            # our own queue needs draining here.
+            self._drain()
+
+    def _on_disconnect(self, client, userdata, *args):
+        with self._lock:
+            self.connected = False
+            if self.qos == 0:
+                self._inflight.clear()
+
+    def _on_publish(self, client, userdata, mid, *args):
+        with self._lock:
+            t0 = self._inflight.pop(mid, None)
+            if t0 is None and self._sending:
+                self._acked_early.add(mid)
+            self.acked += 1
+            self._drain()
+        if t0 is not None and self.on_ack:
+            self.on_ack((time.perf_counter() - t0) * 1000.0)
@@ -1,24 +1,179 @@
+import asyncio
+import json
 import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-async def _write_async(endpoint: str, node_id: str, value) -> bool:
-    try:
-        from asyncua import Client, ua
-    except Exception:
-        return False
-    try:
-        async with Client(url=endpoint) as client:
-            node = client.get_node(node_id)
-            await node.write_value(ua.DataValue(ua.Variant(value, ua.VariantType.String)))
-            return True
-    except Exception:
-        return False
-
-async def write_defect_tag(line_id: str, payload) -> bool:
-    endpoint = os.getenv("OPCUA_ENDPOINT", "opc.tcp://localhost:4840")
-    node_id = os.getenv("OPCUA_DEFECT_NODE", f"ns=2;s=Factory.Lines.{line_id}.QA.Alert")
-    try:
-        return await _write_async(endpoint, node_id, str(payload))
-    except Exception:
-        return False
 
+class OpcUaSession:
+    """Persistent OPC UA session with cached node handles and coalesced writes.
 
+    Each defect writes Alert (JSON string), Score, Class and FrameId under
+    ``node_prefix`` for its line in one ``write_values`` request. Writes queued
+    while a request is in flight are merged: every pending line goes out in the
+    next request and only the latest payload per line is written.
+    """
+
+    FIELDS = ("Alert", "Score", "Class", "FrameId")
+
+    def __init__(
+        self,
+        endpoint: str,
+        node_prefix: str = "ns=2;s=Factory.Lines.{line}.QA",
+        alert_node: Optional[str] = None,
+        keepalive_s: float = 5.0,
+        timeout_s: float = 4.0,
+        on_write: Optional[Callable[[float, bool, int], None]] = None,
+        on_reconnect: Optional[Callable[[], None]] = None,
+        on_coalesce: Optional[Callable[[], None]] = None,
+    ):
+        self.endpoint = endpoint
+        self.node_prefix = node_prefix
+        self.alert_node = alert_node
+        self.keepalive_s = keepalive_s
+        self.timeout_s = timeout_s
+        self.on_write = on_write
+        self.on_reconnect = on_reconnect
+        self.on_coalesce = on_coalesce
+        self.connected = False
+        self.reconnects = 0
+        self.coalesced = 0
+        self._client = None
+        self._nodes: Dict[str, List[Any]] = {}
+        self._pending: Dict[str, Tuple[Dict[str, Any], Optional[bytes], List[asyncio.Future]]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self._connected_once = False
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "OpcUaSession":
+        return cls(
+            endpoint=os.getenv("OPCUA_ENDPOINT", "opc.tcp://localhost:4840"),
+            node_prefix=os.getenv("OPCUA_NODE_PREFIX", "ns=2;s=Factory.Lines.{line}.QA"),
+            alert_node=os.getenv("OPCUA_DEFECT_NODE") or None,
+            keepalive_s=float(os.getenv("OPCUA_KEEPALIVE_S", "5")),
+            **kwargs,
+        )
+
+    async def start(self) -> None:
+        if self._supervisor is None or self._supervisor.done():
+            self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
+        await self._disconnect()
+
+    async def _connect(self) -> None:
+        from asyncua import Client
+        client = Client(url=self.endpoint, timeout=self.timeout_s, watchdog_intervall=self.keepalive_s)
+        await client.connect()
+        self._client = client
+        self._nodes.clear()
+        self.connected = True
+        if self._connected_once:
+            self.reconnects += 1
+            if self.on_reconnect:
+                self.on_reconnect()
+        self._connected_once = True
+
+    async def _disconnect(self) -> None:
+        client, self._client = self._client, None
+        self.connected = False
+        if client is not None:
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+
+    async def _supervise(self) -> None:
+        backoff = 0.5
+        while True:
+            if not self.connected:
+                try:
+                    await self._connect()
+                    backoff = 0.5
+                except Exception:
+                    await self._disconnect()
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30.0)
+                    continue
+            await asyncio.sleep(self.keepalive_s)
+            try:
+                await self._client.check_connection()
+            except Exception:
+                await self._disconnect()
+
+    def _line_nodes(self, line_id: str) -> List[Any]:
+        nodes = self._nodes.get(line_id)
+        if nodes is None:
+            prefix = self.node_prefix.format(line=line_id)
+            ids = [f"{prefix}.{f}" for f in self.FIELDS]
+            if self.alert_node:
+                ids[0] = self.alert_node.format(line=line_id)
+            nodes = [self._client.get_node(i) for i in ids]
+            self._nodes[line_id] = nodes
+        return nodes
+
+    @staticmethod
+    def _values(payload: Dict[str, Any], body: Optional[bytes] = None) -> List[Any]:
+        from asyncua import ua
+        dets = payload.get("detections") or []
+        top = max(dets, key=lambda d: d.get("score", 0.0)) if dets else {}
+        return [
+            ua.Variant(body.decode() if body is not None else json.dumps(payload), ua.VariantType.String),
+            ua.Variant(float(top.get("score", 0.0)), ua.VariantType.Double),
+            ua.Variant(int(top.get("class_id", -1)), ua.VariantType.Int32),
+            ua.Variant(str(payload.get("frame_id", "")), ua.VariantType.String),
+        ]
+
+    async def write_defect(self, line_id: str, payload: Dict[str, Any], body: Optional[bytes] = None) -> bool:
+        """``body``, if given, is ``payload`` already encoded as JSON."""
+        if not self.connected:
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        prev = self._pending.get(line_id)
+        if prev is not None:
+            self.coalesced += 1
+            if self.on_coalesce:
+                self.on_coalesce()
+            prev[2].append(fut)
+            self._pending[line_id] = (payload, body, prev[2])
+        else:
+            self._pending[line_id] = (payload, body, [fut])
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return await fut
+
+    async def _flush(self) -> None:
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            nodes: List[Any] = []
+            values: List[Any] = []
+            ok = False
+            lost = False
+            t0 = time.perf_counter()
+            try:
+                from asyncua import ua
+                for line_id, (payload, body, _) in batch.items():
+                    nodes.extend(self._line_nodes(line_id))
+                    values.extend(self._values(payload, body))
+                await asyncio.wait_for(self._client.write_values(nodes, values), timeout=self.timeout_s)
+                ok = True
+            except ua.UaStatusCodeError:
+                # Server rejected a node/value (e.g. unknown node id); the session is fine
+                pass
+            except Exception:
+                lost = True
+                await self._disconnect()
+            if self.on_write:
+                self.on_write((time.perf_counter() - t0) * 1000.0, ok, len(nodes))
+            if lost:
+                # Session is gone; fail everything queued behind this request too
+                batch.update(self._pending)
+                self._pending = {}
+            for _, _, futs in batch.values():
+                for f in futs:
+                    if not f.done():
+                        f.set_result(ok)
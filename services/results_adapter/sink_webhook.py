@@ -1,13 +1,223 @@
-import requests
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 
+import httpx
 
-def send_webhook(url: str, payload) -> bool:
-    if not url:
-        return False
-    try:
-        r = requests.post(url, json=payload, timeout=3)
-        return r.status_code < 400
-    except Exception:
-        return False
+try:
+    from common.jsonenc import dumps
+except ImportError:  # imported from the repo root (tests)
+    from services.common.jsonenc import dumps
 
 
+def _events_json(events: List[Any]) -> bytes:
+    # events submitted as bytes are already-encoded JSON and go out untouched
+    return b"[" + b",".join(e if isinstance(e, (bytes, bytearray)) else dumps(e) for e in events) + b"]"
+
+
+class WebhookDispatcher:
+    """Batches events into one POST per window/size over a pooled async client.
+
+    Body: ``{"events": [...], "count": n}``; an event may be given as encoded
+    JSON bytes to avoid re-serializing it. Batches that fail are written to
+    ``spool_dir`` (one JSON file each, atomically renamed into place) and replayed
+    with exponential backoff, including after a restart. At most ``buffer_max``
+    events wait in memory; ``submit`` refuses more until a flush drains them.
+    Spool I/O runs on a worker thread so an fsync never stalls the event loop.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        spool_dir: Path,
+        batch_max: int = 50,
+        buffer_max: int = 10000,
+        window_s: float = 0.5,
+        timeout_s: float = 5.0,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 300.0,
+        headers: Optional[Dict[str, str]] = None,
+        on_batch: Optional[Callable[[bool, int, float], None]] = None,
+        on_error: Optional[Callable[[str], None]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.spool_dir = Path(spool_dir)
+        self.batch_max = max(1, batch_max)
+        self.buffer_max = max(self.batch_max, buffer_max)
+        self.window_s = window_s
+        self.timeout_s = timeout_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.headers = headers or {}
+        self.on_batch = on_batch
+        self.on_error = on_error
+        self.transport = transport
+        self.sent_events = 0
+        self.spooled_batches = 0
+        self.rejected_events = 0
+        self.errors = 0
+        self._buffer: List[Any] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = 0
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "WebhookDispatcher":
+        return cls(
+            url=os.getenv("WEBHOOK_URL", ""),
+            spool_dir=Path(os.getenv("WEBHOOK_SPOOL_DIR", "/app/data/webhook-spool")),
+            batch_max=int(os.getenv("WEBHOOK_BATCH_MAX", "50")),
+            buffer_max=int(os.getenv("WEBHOOK_BUFFER_MAX", "10000")),
+            window_s=float(os.getenv("WEBHOOK_BATCH_WINDOW_MS", "500")) / 1000.0,
+            timeout_s=float(os.getenv("WEBHOOK_TIMEOUT_S", "5")),
+            backoff_max_s=float(os.getenv("WEBHOOK_BACKOFF_MAX_S", "300")),
+            **kwargs,
+        )
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._wake = asyncio.Event()
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout_s,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+            transport=self.transport,
+        )
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._replay_loop())]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for t in tasks:
+            t.cancel()
+        # an in-flight batch is spooled by the loop itself; wait for that before closing the client
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Nothing buffered in memory may be lost on shutdown
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            try:
+                await self._spool(batch, attempts=0)
+            except OSError as e:
+                self._error("spool", e)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def submit(self, event: Any) -> bool:
+        """Buffer an event for the next batch; False if ``buffer_max`` events are already waiting."""
+        if len(self._buffer) >= self.buffer_max:
+            self.rejected_events += 1
+            return False
+        self._buffer.append(event)
+        if len(self._buffer) >= self.batch_max and self._wake is not None:
+            self._wake.set()
+        return True
+
+    def _error(self, where: str, exc: BaseException) -> None:
+        self.errors += 1
+        print(f"[webhook] {where} failed: {exc}", flush=True)
+        if self.on_error:
+            self.on_error(where)
+
+    def spool_files(self) -> List[Path]:
+        try:
+            return sorted(self.spool_dir.glob("*.json"))
+        except OSError:
+            return []
+
+    def spool_depth(self) -> int:
+        return len(self.spool_files())
+
+    async def _post(self, events: List[Any]) -> bool:
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            body = b'{"events":' + _events_json(events) + b',"count":%d}' % len(events)
+            r = await self._client.post(self.url, content=body, headers={"Content-Type": "application/json", **self.headers})
+            ok = r.status_code < 400
+        except Exception:
+            ok = False
+        if ok:
+            self.sent_events += len(events)
+        if self.on_batch:
+            self.on_batch(ok, len(events), (time.perf_counter() - t0) * 1000.0)
+        return ok
+
+    async def _spool(self, events: List[Any], attempts: int) -> Path:
+        self._seq += 1
+        name = f"{time.time_ns():020d}-{os.getpid()}-{self._seq:06d}.json"
+        doc = {"attempts": attempts, "next_at": time.time() + self._backoff(attempts), "events": events}
+        path = await asyncio.to_thread(self._write_spool, self.spool_dir / name, doc)
+        self.spooled_batches += 1
+        return path
+
+    def _write_spool(self, path: Path, doc: Dict[str, Any]) -> Path:
+        tmp = path.with_suffix(".tmp")
+        head = dumps({k: v for k, v in doc.items() if k != "events"})
+        with tmp.open("wb") as f:
+            f.write(head[:-1] + (b"," if len(head) > 2 else b"") + b'"events":' + _events_json(doc.get("events", [])) + b"}")
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(path)
+        return path
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_max_s, self.backoff_base_s * (2 ** attempts))
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.window_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._buffer:
+                batch, self._buffer = self._buffer[: self.batch_max], self._buffer[self.batch_max:]
+                try:
+                    ok = await self._post(batch)
+                except asyncio.CancelledError:
+                    try:
+                        await self._spool(batch, attempts=0)
+                    except OSError as e:
+                        self._error("spool", e)
+                    raise
+                if ok:
+                    continue
+                try:
+                    await self._spool(batch, attempts=1)
+                except OSError as e:
+                    # disk full or read-only: the batch is lost, but the loop must keep flushing
+                    self._error("spool", e)
+
+    async def _replay_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(1.0, self.window_s * 2))
+            try:
+                await self._replay_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._error("replay", e)
+
+    async def _replay_due(self) -> None:
+        now = time.time()
+        for path in self.spool_files():
+            try:
+                doc = json.loads(await asyncio.to_thread(path.read_text, encoding="utf-8"))
+            except Exception:
+                continue
+            if doc.get("next_at", 0) > now:
+                continue
+            if await self._post(doc.get("events", [])):
+                path.unlink(missing_ok=True)
+            else:
+                doc["attempts"] = int(doc.get("attempts", 0)) + 1
+                doc["next_at"] = time.time() + self._backoff(doc["attempts"])
+                await asyncio.to_thread(self._write_spool, path, doc)
+                # Endpoint is still down; keep order and wait for the next pass
+                break
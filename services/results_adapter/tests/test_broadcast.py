@@ -0,0 +1,45 @@
+import asyncio
+
+from services.results_adapter.broadcast import BroadcastHub
+
+
+def test_fanout_drop_oldest_and_resume():
+    async def run():
+        hub = BroadcastHub(buffer=3, history=10)
+        fast, slow = hub.subscribe(), hub.subscribe()
+        first = hub.publish('{"n": 0}')
+        got = await asyncio.wait_for(fast.next(timeout=1), 1)
+        assert got == [f'id: {first}\ndata: {{"n": 0}}\n\n'.encode()]
+
+        for n in range(1, 6):
+            hub.publish(f'{{"n": {n}}}')
+        # slow never read: it keeps the newest 3 and learns it lagged
+        out = await slow.next(timeout=1)
+        assert out[0].startswith(b"event: lag") and b'"dropped": 3' in out[0]
+        assert [b'"n": 3' in out[1], b'"n": 5' in out[3]] == [True, True]
+        assert hub.stats()["dropped"] == 3 + 2  # fast also overflowed
+        # frames are shared, not copied per subscriber
+        assert (await fast.next(timeout=1))[-1] is out[-1]
+
+        # reconnect with Last-Event-ID replays only what was missed
+        again = hub.subscribe(str(first + 3))
+        assert [b'"n": 4' in f for f in await again.next(timeout=1)] == [True, False]
+        assert await again.next(timeout=0.01) == []
+
+    asyncio.run(run())
+
+
+def test_reconnect_after_a_restart_reports_lag():
+    async def run():
+        before = BroadcastHub()
+        last = before.publish('{"n": 0}')
+        before.publish('{"n": 1}')  # never delivered: the process restarts here
+        await asyncio.sleep(0.01)
+        after = BroadcastHub()
+        sub = after.subscribe(str(last))
+        out = await sub.next(timeout=1)
+        assert len(out) == 1 and out[0].startswith(b"event: lag")
+        # a client that saw the newest event is not told it lagged
+        assert await after.subscribe(str(after._next_id - 1)).next(timeout=0.01) == []
+
+    asyncio.run(run())
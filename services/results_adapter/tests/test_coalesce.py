@@ -0,0 +1,56 @@
+from services.results_adapter.coalesce import DefectCoalescer, iou
+
+KEY = ("line-1", "cam-A")
+
+
+def _det(x=10, cls=0, score=0.9):
+    return {"bbox": [x, 10, x + 40, 40], "score": score, "class_id": cls}
+
+
+def _states(events):
+    return [e["state"] for e in events]
+
+
+def test_persistent_defect_emits_started_then_cleared():
+    co = DefectCoalescer(window_s=1.0, iou_threshold=0.3, hold_off_s=0, update_s=0)
+    out = []
+    for i in range(30):
+        # the box drifts a little frame to frame but stays the same defect
+        out += co.observe(KEY, [_det(10 + i % 3)], {"frame_id": i}, now=100 + i * 0.033)
+    assert _states(out) == ["started"]
+    assert out[0]["payload"]["frame_id"] == 0
+    assert co.observe(KEY, [], {"frame_id": 30}, now=101.2) == []
+    cleared = co.sweep(now=102.5)
+    assert _states(cleared) == ["cleared"]
+    assert cleared[0]["incident_id"] == out[0]["incident_id"] and cleared[0]["frames"] == 30
+    stats = co.stats()
+    assert stats["raw_defect_frames"] == 30 and stats["emitted"] == {"started": 1, "update": 0, "cleared": 1}
+    assert stats["active_incidents"] == 0
+
+
+def test_separate_classes_regions_and_cameras_are_separate_incidents():
+    co = DefectCoalescer(window_s=1.0)
+    out = co.observe(KEY, [_det(10), _det(10, cls=1), _det(300)], {}, now=0)
+    out += co.observe(("line-1", "cam-B"), [_det(10)], {}, now=0)
+    assert _states(out) == ["started"] * 4
+    assert len({e["incident_id"] for e in out}) == 4
+    assert iou([0, 0, 10, 10], [5, 0, 15, 10]) == 1 / 3
+
+
+def test_periodic_updates_and_hold_off():
+    co = DefectCoalescer(window_s=1.0, hold_off_s=5.0, update_s=2.0)
+    out = []
+    for i in range(6):
+        out += co.observe(KEY, [_det()], {}, now=i * 0.5)
+    assert _states(out) == ["started", "update"]
+    out = co.sweep(now=10)
+    assert _states(out) == ["cleared"]
+    # the same defect comes back inside the hold-off: no re-alarm until it ends
+    assert co.observe(KEY, [_det()], {}, now=11) == []
+    assert co.observe(KEY, [_det()], {}, now=12) == []
+    assert co.suppressed == 2
+    # a different region is not held off
+    assert _states(co.observe(KEY, [_det(300)], {}, now=12.5)) == ["started"]
+    # the held-off incident lapses silently; after the hold-off the defect alarms again
+    assert _states(co.observe(KEY, [_det()], {}, now=15.2)) == ["cleared", "started"]
+    assert co.emitted["cleared"] == 2
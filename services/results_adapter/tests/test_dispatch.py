@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from services.results_adapter.dispatch import CircuitBreaker, SinkFanout, SinkPolicy, SinkWorker
+
+
+async def _run():
+    fast_seen = []
+    calls = {"broken": 0}
+
+    async def fast(item):
+        fast_seen.append(item)
+        return True
+
+    async def slow(item):
+        await asyncio.sleep(10)
+        return True
+
+    async def broken(item):
+        calls["broken"] += 1
+        return False
+
+    done = []
+    fan = SinkFanout()
+    fan.add(SinkWorker("fast", fast, SinkPolicy(), on_done=lambda n, ok, lag: done.append((n, ok))))
+    fan.add(SinkWorker("slow", slow, SinkPolicy(queue_max=2, timeout_s=0.05, retries=0)))
+    fan.add(SinkWorker("broken", broken, SinkPolicy(retries=1, backoff_s=0.0, breaker_failures=3, breaker_reset_s=60)))
+    fan.start()
+
+    for i in range(5):
+        fan.submit(i)
+    await fan.workers["fast"].join()
+    # a hung sink neither blocks the fast one nor grows without bound
+    assert fast_seen == [0, 1, 2, 3, 4]
+    assert all(ok for _, ok in done)
+    assert fan.workers["slow"].dropped >= 2
+
+    await fan.workers["broken"].join()
+    stats = fan.stats()["broken"]
+    # breaker opens after 3 consecutive failures and later items fail fast
+    assert stats["circuit_open"] and stats["failed"] == 5 and calls["broken"] == 3
+    await fan.stop()
+
+
+def test_sink_isolation_queue_bound_and_breaker():
+    asyncio.run(_run())
+
+
+def test_breaker_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(failures=2, reset_s=0.05)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow() and not breaker.allow()  # concurrent callers wait for the probe
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_breaker_ignores_results_from_before_it_opened():
+    breaker = CircuitBreaker(failures=1, reset_s=0.05)
+    early = breaker.allow()  # in flight on another worker when the breaker opens
+    breaker.record(False, breaker.allow())
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    probe = breaker.allow()
+    assert probe and breaker.state == "half_open"
+    breaker.record(True, early)  # stale: must not close it or end the probe window
+    assert breaker.state == "half_open" and not breaker.allow()
+    breaker.record(True, probe)
+    assert breaker.state == "closed" and breaker.allow()
@@ -0,0 +1,43 @@
+import json
+
+from nacl.signing import SigningKey
+
+from services.common.ledger import canonical, encode_batch, parse_line, signed_line, verify_wrapped
+from services.results_adapter.envelope import ResultEnvelope
+
+
+def test_envelope_body_is_signed_logged_and_verifiable():
+    sk = SigningKey.generate()
+    rec = {"frame_id": 7, "label": "é", "latency_ms": 1e-7, "detections": [{"score": 0.9}]}
+    env = ResultEnvelope(rec)
+    line = signed_line(env.body, sk.sign(env.body).signature.hex())
+    wrapped = parse_line(line + b"\n")
+    assert wrapped["v"] == 2 and wrapped["record"] == rec and wrapped["_signed"] == env.body
+    assert verify_wrapped(sk.verify_key, wrapped)
+    log = json.loads(env.log_line())
+    assert log["event"] == "result" and log["frame_id"] == 7
+
+
+def test_v2_verifies_signed_bytes_whatever_encoder_wrote_them():
+    sk = SigningKey.generate()
+    rec = {"latency_ms": 1e-7, "frame_id": "a"}
+    # stdlib spelling of the float ("1e-07") differs from orjson's ("1e-7")
+    body = json.dumps(rec, sort_keys=True, separators=(",", ":")).encode()
+    line = signed_line(body, sk.sign(body).signature.hex())
+    assert verify_wrapped(sk.verify_key, parse_line(line))
+    tampered = line.replace(b'"a"', b'"b"')
+    assert not verify_wrapped(sk.verify_key, parse_line(tampered))
+
+
+def test_v1_lines_and_v2_batches_verify():
+    sk = SigningKey.generate()
+    rec = {"frame_id": "old", "detections": []}
+    v1 = json.dumps({"record": rec, "sig": sk.sign(canonical(rec)).signature.hex()})
+    assert verify_wrapped(sk.verify_key, parse_line(v1))
+
+    recs = [{"frame_id": str(i)} for i in range(3)]
+    lines, _ = encode_batch([ResultEnvelope(r).body for r in recs], 1, "00" * 32, sk)
+    header = parse_line(lines[0])["batch"]
+    parsed = [parse_line(l) for l in lines[1:]]
+    assert [p["record"] for p in parsed] == recs
+    assert all(verify_wrapped(sk.verify_key, p, header) for p in parsed)
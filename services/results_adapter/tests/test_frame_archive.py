@@ -0,0 +1,87 @@
+import hashlib
+
+from services.results_adapter.frame_archive import FrameArchive, frame_key
+
+
+def _jpeg(i: int) -> bytes:
+    return b"\xff\xd8" + bytes([i % 256]) * 100 + b"\xff\xd9"
+
+
+def test_defect_frame_and_context_are_archived(tmp_path):
+    arch = FrameArchive(tmp_path, ring_size=50, before=2, after=2)
+    arch.start()
+    try:
+        for i in range(10):
+            arch.add(str(i), _jpeg(i), "cam-A")
+            arch.add(f"b{i}", _jpeg(200 + i), "cam-B")
+        sha = arch.mark_defect("5", "line-1", "cam-A")
+        assert sha == hashlib.sha256(_jpeg(5)).hexdigest()
+        assert arch.mark_defect("missing", "line-1", "cam-A") is None
+        assert arch.mark_defect("5", "line-1", "cam-B") is None
+        for i in range(10, 14):
+            arch.add(str(i), _jpeg(i), "cam-A")
+        arch.flush()
+
+        key = frame_key("5", "cam-A")
+        roles = {e["frame_id"]: e["role"] for e in arch.context(key)}
+        assert roles == {"3": "before", "4": "before", "5": "defect", "10": "after", "11": "after"}
+        jpeg, meta = arch.get(key)
+        assert jpeg == _jpeg(5) and meta["sha256"] == sha and meta["camera"] == "cam-A"
+        assert arch.blob_path(sha).read_bytes() == _jpeg(5)
+    finally:
+        arch.stop()
+
+    # the manifest is reloaded on restart
+    again = FrameArchive(tmp_path)
+    again.start()
+    try:
+        assert again.get(frame_key("5", "cam-A"))[1]["sha256"] == sha
+        assert again.get(frame_key("12", "cam-A")) is None
+        assert again.disk_bytes == 5 * len(_jpeg(0))
+    finally:
+        again.stop()
+
+
+def test_budget_evicts_oldest(tmp_path):
+    size = len(_jpeg(0))
+    arch = FrameArchive(tmp_path, ring_size=100, before=0, after=0, budget_bytes=3 * size)
+    arch.start()
+    try:
+        for i in range(6):
+            arch.add(str(i), _jpeg(i), "cam")
+            arch.mark_defect(str(i), "line-1", "cam")
+            arch.flush()
+        assert arch.disk_bytes <= 3 * size
+        assert arch.evicted == 3
+        # evicted frames still serve from the ring while it holds them, but not from disk
+        assert arch.get(frame_key("0", "cam"))[1].get("archived") is False
+        assert arch.get(frame_key("5", "cam"))[1]["sha256"]
+        assert len(list((tmp_path / "blobs").rglob("*.jpg"))) == 3
+    finally:
+        arch.stop()
+
+
+def test_same_frame_id_on_two_cameras_and_after_a_capture_restart(tmp_path):
+    arch = FrameArchive(tmp_path, ring_size=50, before=1, after=0)
+    arch.start()
+    try:
+        for i in range(3):
+            arch.add(str(i), _jpeg(i), "cam-A", "boot1")
+            arch.add(str(i), _jpeg(100 + i), "cam-B", "boot1")
+        # cam-B's frame 2 arrived last; cam-A's defect must still archive cam-A's pixels
+        sha_a = arch.mark_defect("2", "line-1", "cam-A", "boot1")
+        assert sha_a == hashlib.sha256(_jpeg(2)).hexdigest()
+        # cam-A restarts and counts from 0 again
+        arch.add("2", _jpeg(50), "cam-A", "boot2")
+        sha_a2 = arch.mark_defect("2", "line-1", "cam-A", "boot2")
+        assert sha_a2 == hashlib.sha256(_jpeg(50)).hexdigest()
+        arch.flush()
+
+        assert arch.get(frame_key("2", "cam-A", "boot1"))[0] == _jpeg(2)
+        assert arch.get(frame_key("2", "cam-A", "boot2"))[0] == _jpeg(50)
+        assert arch.get(frame_key("2", "cam-B", "boot1"))[1]["archived"] is False
+        roles = {(e["camera"], e["session"], e["frame_id"]): e["role"] for e in arch.context(frame_key("2", "cam-A", "boot1"))}
+        assert roles == {("cam-A", "boot1", "1"): "before", ("cam-A", "boot1", "2"): "defect"}
+        assert [e["session"] for e in arch.context(frame_key("2", "cam-A", "boot2"))] == ["boot2"]
+    finally:
+        arch.stop()
@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from services.common.ledger import LedgerVerifier, ZERO_ROOT
+from services.results_adapter.governance import GovernanceLogger, GroupCommitWriter
+
+
+def _lines(gov: GovernanceLogger):
+    return [json.loads(l) for l in gov._log_path(datetime.utcnow()).read_text().splitlines() if l.strip()]
+
+
+def test_group_commit_per_record_signatures(tmp_path: Path):
+    gov = GovernanceLogger(base_dir=tmp_path)
+    flushes = []
+    w = GroupCommitWriter(gov, batch_max=4, flush_ms=10_000, on_flush=lambda n, ms: flushes.append(n))
+    for i in range(10):
+        w.submit({"frame_id": str(i), "detections": []})
+    w.flush()
+    lines = _lines(gov)
+    assert len(lines) == 10 and flushes == [10]
+    assert all(gov.verify_record(l) for l in lines)
+
+
+def test_group_commit_batch_signing_verifies_each_record(tmp_path: Path):
+    gov = GovernanceLogger(base_dir=tmp_path)
+    w = GroupCommitWriter(gov, batch_max=3, flush_ms=5, batch_sign=True)
+    w.start()
+    for i in range(7):
+        w.submit({"frame_id": str(i), "detections": [{"score": 0.9}]})
+    w.stop()
+    lines = _lines(gov)
+    headers = [l for l in lines if "batch" in l]
+    records = [l for l in lines if "record" in l]
+    assert len(records) == 7 and [h["batch"]["seq"] for h in headers] == list(range(1, len(headers) + 1))
+
+    v = LedgerVerifier(gov.verify_key)
+    assert [r for r in (v.feed(l) for l in lines) if r is not None] == [True] * 7
+    assert v.chain_breaks == 0
+
+    # tampering with one record only invalidates that record
+    lines[1]["record"]["frame_id"] = "x"
+    v = LedgerVerifier(gov.verify_key)
+    results = [r for r in (v.feed(l) for l in lines) if r is not None]
+    assert results.count(False) == 1
+
+
+def test_batch_chain_resumes_after_a_restart(tmp_path: Path):
+    gov = GovernanceLogger(base_dir=tmp_path)
+    for run in range(2):
+        w = GroupCommitWriter(gov, batch_max=2, flush_ms=10_000, batch_sign=True)
+        for i in range(4):
+            w.submit({"frame_id": f"{run}-{i}", "detections": []})
+        w.flush()
+        w.stop()
+    lines = _lines(gov)
+    headers = [l["batch"] for l in lines if "batch" in l]
+    # one chain across both writers: seq keeps counting and only the first header starts at ZERO_ROOT
+    assert [h["seq"] for h in headers] == [1, 2, 3, 4]
+    assert [h["prev"] == ZERO_ROOT for h in headers] == [True, False, False, False]
+    v = LedgerVerifier(gov.verify_key)
+    assert all(r for r in (v.feed(l) for l in lines) if r is not None) and v.chain_breaks == 0
+
+    # a chain restarted mid-file is a break
+    restarted = dict(lines[-3], batch={**lines[-3]["batch"], "prev": ZERO_ROOT})
+    v = LedgerVerifier(gov.verify_key)
+    for l in lines[:-3] + [restarted]:
+        v.feed(l)
+    assert v.chain_breaks == 1
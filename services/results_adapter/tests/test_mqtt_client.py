@@ -0,0 +1,80 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from services.results_adapter.sink_mqtt import MqttPublisher
+
+
+class _FakeClient:
+    def __init__(self):
+        self.sent = []
+        self._mid = 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self._mid += 1
+        self.sent.append((self._mid, topic, payload))
+        return SimpleNamespace(rc=0, mid=self._mid)
+
+
+def test_offline_queue_inflight_window_and_acks():
+    fake = _FakeClient()
+    acks = []
+    pub = MqttPublisher("broker", qos=1, max_inflight=2, queue_max=3, client=fake, on_ack=acks.append)
+
+    # offline: bounded queue drops the oldest
+    for i in range(4):
+        assert pub.publish("t", str(i).encode()) is False
+    assert pub.queue_depth() == 3 and pub.dropped == 1
+
+    # connect drains up to the in-flight window
+    pub._on_connect(fake, None, {}, 0)
+    assert [p for _, _, p in fake.sent] == [b"1", b"2"]
+    assert pub.inflight() == 2 and pub.queue_depth() == 1
+
+    # an ack frees a slot and sends the next queued message
+    pub._on_publish(fake, None, 1)
+    assert [p for _, _, p in fake.sent] == [b"1", b"2", b"3"]
+    assert pub.acked == 1 and len(acks) == 1 and pub.queue_depth() == 0
+
+    pub._on_disconnect(fake, None, {}, 0)
+    assert pub.publish("t", b"4") is False
+    pub._on_connect(fake, None, {}, 0)
+    assert pub.stats()["reconnects"] == 1
+
+
+def test_publish_does_not_hold_lock_across_paho_publish():
+    # paho calls on_publish with its message mutex held; publish() takes that
+    # same mutex, so holding our lock across it would deadlock the two threads.
+    mutex = threading.RLock()
+    fake = _FakeClient()
+    inner = fake.publish
+
+    def publish(*a, **kw):
+        time.sleep(0.0005)  # let the network thread grab the mutex first
+        if not mutex.acquire(timeout=2):
+            raise RuntimeError("deadlocked against on_publish")
+        try:
+            return inner(*a, **kw)
+        finally:
+            mutex.release()
+
+    fake.publish = publish
+    pub = MqttPublisher("broker", qos=1, max_inflight=4, client=fake)
+    pub._on_connect(fake, None, {}, 0)
+
+    def acker():
+        mid = 0
+        while mid < 50:
+            with mutex:
+                if mid < len(fake.sent):
+                    mid += 1
+                    pub._on_publish(fake, None, mid)
+
+    t = threading.Thread(target=acker, daemon=True)
+    t.start()
+    for i in range(50):
+        pub.publish("t", b"x")
+    t.join(5)
+    assert not t.is_alive()
+    assert pub.published == pub.acked == 50
+    assert pub.inflight() == 0 and pub.queue_depth() == 0
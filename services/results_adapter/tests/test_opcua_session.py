@@ -0,0 +1,59 @@
+import asyncio
+import socket
+
+import pytest
+
+asyncua = pytest.importorskip("asyncua")
+from asyncua import Server, ua
+
+from services.results_adapter.sink_opcua import OpcUaSession
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _run():
+    endpoint = f"opc.tcp://127.0.0.1:{_free_port()}/edgesight/"
+    server = Server()
+    await server.init()
+    server.set_endpoint(endpoint)
+    idx = await server.register_namespace("urn:edgesight:test")
+    qa = await server.nodes.objects.add_object(idx, "QA")
+    initial = {"Alert": ua.Variant("", ua.VariantType.String), "Score": ua.Variant(0.0, ua.VariantType.Double),
+               "Class": ua.Variant(0, ua.VariantType.Int32), "FrameId": ua.Variant("", ua.VariantType.String)}
+    nodes = {}
+    for name, val in initial.items():
+        node = await qa.add_variable(ua.NodeId(f"Factory.Lines.line-1.QA.{name}", idx), name, val)
+        await node.set_writable()
+        nodes[name] = node
+    writes = []
+    async with server:
+        sess = OpcUaSession(endpoint, node_prefix=f"ns={idx};s=Factory.Lines.{{line}}.QA", keepalive_s=0.2,
+                            on_write=lambda ms, ok, n: writes.append((ok, n)))
+        await sess.start()
+        for _ in range(50):
+            if sess.connected:
+                break
+            await asyncio.sleep(0.1)
+        assert sess.connected
+        results = await asyncio.gather(*[
+            sess.write_defect("line-1", {"frame_id": str(i), "detections": [{"score": 0.5 + i / 100, "class_id": 2}]})
+            for i in range(5)
+        ])
+        assert all(results)
+        assert await nodes["FrameId"].read_value() == "4"
+        assert await nodes["Class"].read_value() == 2
+        assert abs(await nodes["Score"].read_value() - 0.54) < 1e-9
+        # concurrent writes for one line collapse into a single 4-node request
+        assert sess.coalesced == 4 and writes == [(True, 4)]
+        # unknown node ids are rejected without tearing down the session
+        assert await sess.write_defect("line-9", {"frame_id": "x"}) is False
+        assert sess.connected
+        await sess.stop()
+
+
+def test_session_batched_writes_against_local_server():
+    asyncio.run(_run())
@@ -0,0 +1,96 @@
+import asyncio
+
+from services.results_adapter.preview import PreviewHub
+
+
+def test_slow_clients_skip_frames_and_share_bytes():
+    async def run():
+        hub = PreviewHub()
+        fast = hub.frames("cam1", max_fps=1000)
+        slow = hub.frames("cam1", max_fps=1000)
+        hub.publish(b"f1", "cam1")
+        a = await fast.__anext__()
+        b = await slow.__anext__()
+        assert a == b"f1" and a is b
+        hub.publish(b"f2", "cam1")
+        assert await fast.__anext__() == b"f2"
+        hub.publish(b"f3", "cam1")
+        hub.publish(b"f4", "cam1")
+        # slow was not ready for f2/f3: it gets the newest frame, no backlog
+        assert await slow.__anext__() == b"f4"
+        assert hub.skipped == 2
+        assert await fast.__anext__() == b"f4"
+        assert hub.skipped == 3  # fast skipped f3
+
+        # other cameras are independent
+        hub.publish(b"x", "cam2")
+        assert hub.latest("cam2") == (1, b"x") and hub.latest("cam1")[1] == b"f4"
+        assert hub.clients == 2
+        await fast.aclose()
+        await slow.aclose()
+        assert hub.clients == 0
+
+    asyncio.run(run())
+
+
+def test_rate_limit_paces_delivery():
+    async def run():
+        hub = PreviewHub()
+        stream = hub.frames(max_fps=20)
+
+        async def producer():
+            for i in range(30):
+                hub.publish(bytes([i]))
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(producer())
+        got = []
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        while loop.time() - t0 < 0.16:
+            got.append(await asyncio.wait_for(stream.__anext__(), 1))
+        await task
+        # ~20 fps over ~0.16 s: far fewer than the ~30 frames published
+        assert 2 <= len(got) <= 5
+        await stream.aclose()
+
+    asyncio.run(run())
+
+
+def test_reading_unknown_cameras_does_not_create_channels():
+    async def run():
+        hub = PreviewHub()
+        assert hub.latest("nope") == (0, b"")
+        assert hub.latest() == (0, b"")
+        stream = hub.frames("cam9", max_fps=1000, idle_s=0.05)
+        assert await stream.__anext__() == b""  # idle while the camera has never posted
+        assert hub.cameras() == {}
+        hub.publish(b"other", "cam1")
+        assert await stream.__anext__() == b""  # another camera appearing is not ours
+        hub.publish(b"f1", "cam9")
+        assert await stream.__anext__() == b"f1"
+        assert set(hub.cameras()) == {"cam1", "cam9"}
+        await stream.aclose()
+        assert hub.clients == 0
+
+    asyncio.run(run())
+
+
+def test_frames_without_a_camera_follows_the_newest_camera():
+    async def run():
+        hub = PreviewHub()
+        stream = hub.frames(max_fps=1000, idle_s=0.05)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        hub.publish(b"a1", "cam-A")  # capture with CAMERA_ID set: nothing posts to "default"
+        assert await asyncio.wait_for(first, 1) == b"a1"
+        assert hub.latest() == (1, b"a1")
+        hub.publish(b"a2", "cam-A")
+        assert await stream.__anext__() == b"a2"
+        # cam-A stops and cam-B takes over: the stream moves once cam-A goes idle
+        hub.publish(b"b1", "cam-B")
+        assert await asyncio.wait_for(stream.__anext__(), 1) == b"b1"
+        assert "default" not in hub.cameras()
+        await stream.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.common.profiler import EventLoopLagMonitor, ProfilerBusy, SamplingProfiler, install_profiler
+
+
+def _spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profile_samples_other_threads_as_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="capture worker", daemon=True)
+    worker.start()
+    profiler = SamplingProfiler(max_seconds=1.0)
+    try:
+        prof = profiler.run(0.3, hz=200, thread="capture")
+    finally:
+        stop.set()
+        worker.join()
+    assert prof.samples > 20 and prof.sampler_cpu_s < prof.duration_s
+    lines = prof.collapsed().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    # thread name first (spaces are not allowed inside collapsed frames), then outermost to innermost
+    assert stack.startswith("capture_worker;") and "test_profiler.py:_spin" in stack and int(count) > 0
+    assert all(line.startswith("capture_worker;") for line in lines)
+    assert prof.to_dict()["top"][0]["samples"] > 0
+
+
+def test_one_profile_at_a_time_and_loop_stays_responsive():
+    profiler = SamplingProfiler()
+
+    async def run():
+        first = asyncio.ensure_future(profiler.profile(0.3, hz=50))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+        ticks = 0
+        while not first.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return await first, ticks
+
+    prof, ticks = asyncio.run(run())
+    assert ticks > 10
+    assert any(s.startswith("MainThread;") for s in prof.stacks)
+
+
+def test_loop_lag_monitor_reports_a_blocked_loop():
+    lags = []
+    monitor = EventLoopLagMonitor(lags.append, interval_s=0.02)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        time.sleep(0.15)  # block the loop
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.run(run())
+    assert lags and min(lags) < 20
+    assert monitor.max_ms >= 100
+
+
+def test_install_profiler_adds_the_route_and_loop_lag_hook():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    router, startup = install_profiler(app)
+    assert any(r.path == "/debug/profile" for r in router.routes)
+    with TestClient(app) as client:
+        r = client.get("/debug/profile", params={"seconds": 0.1, "hz": 50, "format": "json"})
+        assert r.status_code == 200 and r.json()["samples"] > 0
+        assert client.get("/debug/profile", params={"seconds": 0.1}).headers["content-type"].startswith("text/plain")
+    # a second app in the same process reuses the histogram instead of re-registering it
+    install_profiler(FastAPI())
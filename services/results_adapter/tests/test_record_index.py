@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from services.results_adapter.governance import GovernanceLogger, GovernanceMaintenance, GroupCommitWriter
+from services.results_adapter.record_index import index_paths
+
+
+def test_lookup_by_frame_corr_id_and_time(tmp_path: Path):
+    gov = GovernanceLogger(base_dir=tmp_path)
+    w = GroupCommitWriter(gov, batch_max=8, flush_ms=10_000, batch_sign=True, segment_bytes=16 * 1024)
+    t0 = datetime.now(timezone.utc).replace(microsecond=0)
+    for i in range(300):
+        ts = (t0 + timedelta(seconds=i)).isoformat().replace("+00:00", "Z")
+        w.submit({"frame_id": str(i), "corr_id": f"c-{i}", "line_id": f"line-{i % 3}", "ts": ts, "detections": []})
+        if i % 8 == 7:
+            w.flush()
+    w.stop()
+    GovernanceMaintenance(gov, block_kb=4).compress_pending()
+
+    hit = list(gov.find_records(frame_id="42"))
+    assert len(hit) == 1 and hit[0]["record"]["corr_id"] == "c-42" and hit[0]["valid"]
+    assert hit[0]["segment"].endswith(".zb")
+    assert [r["record"]["frame_id"] for r in gov.find_records(corr_id="c-299")] == ["299"]
+    assert list(gov.find_records(frame_id="nope")) == []
+
+    start = (t0 + timedelta(seconds=100)).timestamp()
+    end = (t0 + timedelta(seconds=109)).timestamp()
+    rows = list(gov.find_records(start=start, end=end, line_id="line-1"))
+    assert sorted(int(r["record"]["frame_id"]) for r in rows) == [100, 103, 106, 109]
+    assert all(r["valid"] for r in rows)
+
+    # a segment that lost its index is rebuilt on first query
+    seg = Path(tmp_path / t0.strftime("%Y-%m-%d")).glob("decision.000001.jsonl.zb").__next__()
+    for p in index_paths(seg):
+        p.unlink()
+    assert len(list(gov.find_records(frame_id="0"))) == 1
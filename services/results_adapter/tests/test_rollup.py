@@ -0,0 +1,61 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from services.results_adapter.governance import GovernanceLogger, GroupCommitWriter
+from services.common.sketch import LatencySketch, RollingSketch
+
+
+def test_sketch_quantiles_and_merge():
+    a, b = LatencySketch(), LatencySketch()
+    for v in range(1, 501):
+        a.add(float(v))
+    for v in range(501, 1001):
+        b.add(float(v))
+    a.merge(LatencySketch.from_dict(b.to_dict()))
+    assert a.count == 1000
+    assert abs(a.quantile(0.95) - 950) / 950 < 0.02
+    assert abs(a.quantile(0.5) - 500) / 500 < 0.02
+    assert a.quantiles((0.99, 0.5)) == [a.quantile(0.99), a.quantile(0.5)]
+
+
+def test_sketch_memory_is_bounded():
+    s = LatencySketch(max_bins=64)
+    for i in range(1, 100_000):
+        s.add(i * 0.01)
+    assert len(s.buckets) <= 64 and s.count == 99_999
+    assert abs(s.quantile(0.99) - 990) / 990 < 0.02
+
+
+def test_rolling_windows():
+    r = RollingSketch(slot_s=10, horizon_s=3600)
+    r.add(1000.0, now=0)        # an hour ago: out of every window
+    r.add(50.0, now=3000)       # within 1h only
+    for _ in range(9):
+        r.add(5.0, now=3590)    # within 1m
+    assert r.window(60, now=3600).count == 9
+    assert r.window(3600, now=3600).count == 10
+    assert abs(r.window(3600, now=3600).quantile(1.0) - 50) < 1
+
+
+def test_rollup_tracks_writes_and_catches_up(tmp_path: Path):
+    gov = GovernanceLogger(base_dir=tmp_path)
+    w = GroupCommitWriter(gov, batch_max=8, flush_ms=10_000)
+    ts = datetime.utcnow().strftime("%Y-%m-%dT%H:00:00Z")
+    for i in range(5):
+        w.submit({"frame_id": str(i), "ts": ts, "detections": [{"class_id": i % 2, "score": 0.9}], "latency_ms": 10.0 + i})
+    w.flush()
+    day = datetime.utcnow().strftime("%Y-%m-%d")
+    sidecar = json.loads((tmp_path / day / "rollup.json").read_text())
+    assert sidecar["day"]["total"] == 5
+
+    # an append the writer did not see (e.g. another process) is picked up from the offset
+    log = gov._log_path(datetime.utcnow())
+    with log.open("a") as f:
+        f.write(json.dumps({"record": {"frame_id": "x", "detections": []}, "sig": "00"}) + "\n")
+    out = gov.summarize(day, day, by_hour=True)
+    assert out["total"] == 6 and out["invalid"] == 1
+    assert out["detections_by_class"] == {"0": 3, "1": 2}
+    assert out["hours"][f"{day}T{ts[11:13]}"]["total"] == 5
+
+    assert gov.summarize(day, day, verify=True)["invalid_signatures"] == 1
@@ -0,0 +1,96 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from services.common.segments import iter_lines, list_segments, plan_chunks, segment_id, segment_size
+from services.governance_exporter.generate_report import find_logs, verify_and_aggregate
+from services.results_adapter.governance import GovernanceLogger, GovernanceMaintenance, GroupCommitWriter
+
+
+def _write(gov, n, **kw):
+    w = GroupCommitWriter(gov, batch_max=10, flush_ms=10_000, **kw)
+    for i in range(n):
+        w.submit({"frame_id": str(i), "detections": [{"class_id": 0}], "latency_ms": 5.0})
+        if i % 10 == 9:
+            w.flush()
+    w.flush()
+    w.stop()
+
+
+def test_rotation_compression_and_transparent_reads(tmp_path: Path):
+    gov = GovernanceLogger(base_dir=tmp_path)
+    rotated = []
+    _write(gov, 200, batch_sign=True, segment_bytes=8 * 1024, on_rotate=rotated.append)
+    day = tmp_path / datetime.utcnow().strftime("%Y-%m-%d")
+    assert len(rotated) >= 2
+
+    plain = [p.read_bytes() for p in list_segments(day)]
+    GovernanceMaintenance(gov, block_kb=2).compress_pending()
+    segs = list_segments(day)
+    assert all(p.suffix == ".zb" for p in segs[:-1]) and segs[-1].name == "decision.log.jsonl"
+
+    # compressed segments read back byte-identical, including from a block offset
+    for raw, seg in zip(plain, segs):
+        assert b"".join(l for _, l in iter_lines(seg)) == raw
+        assert segment_size(seg) == len(raw)
+        chunks = plan_chunks(seg, 2048)
+        assert b"".join(l for a, b in chunks for _, l in iter_lines(seg, a, b)) == raw
+
+    d = day.name
+    out = gov.summarize(d, d)
+    assert out["total"] == 200 and out["invalid"] == 0
+    assert gov.summarize(d, d, verify=True)["total"] == 200
+
+    logs = find_logs(tmp_path, datetime.utcnow().date(), datetime.utcnow().date())
+    rep = verify_and_aggregate(logs, gov.verify_key, workers=2, chunk_mb=0.002)
+    assert rep["total"] == 200 and rep["invalid"] == 0 and rep["chain_breaks"] == 0
+
+
+def test_retention_disk_budget_keeps_active_segment(tmp_path: Path):
+    gov = GovernanceLogger(base_dir=tmp_path)
+    old = tmp_path / "2000-01-01"
+    old.mkdir()
+    (old / "decision.log.jsonl").write_text("{}\n")
+    _write(gov, 200, segment_bytes=8 * 1024)
+    gov.append_signed({"frame_id": "last", "detections": []})
+    assert gov.enforce_retention(days=30, max_disk_bytes=10 * 1024) >= 2
+    day = tmp_path / datetime.utcnow().strftime("%Y-%m-%d")
+    assert not old.exists() and (day / "decision.log.jsonl").exists()
+    assert sum(p.stat().st_size for p in list_segments(day)) <= 10 * 1024 + 8 * 1024
+    # the sidecar forgets the deleted segments and counts only what is left
+    left = sum(1 for seg in list_segments(day) for _, l in iter_lines(seg) if l.strip())
+    assert left < 201
+    sidecar = json.loads((day / "rollup.json").read_text())
+    assert set(sidecar["segments"]) == {segment_id(p) for p in list_segments(day) if p.name != "decision.log.jsonl"}
+    assert gov.summarize(day.name, day.name)["total"] == left
+
+
+def test_day_rollover_closes_the_previous_days_segment(tmp_path: Path, monkeypatch):
+    from services.results_adapter import governance
+
+    class Clock(datetime):
+        now_ = datetime(2030, 1, 1, 23, 59)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.now_
+
+    monkeypatch.setattr(governance, "datetime", Clock)
+    gov = GovernanceLogger(base_dir=tmp_path)
+    rotated = []
+    w = GroupCommitWriter(gov, batch_max=10, flush_ms=10_000, batch_sign=True, on_rotate=rotated.append)
+    for i in range(20):
+        w.submit({"frame_id": str(i), "detections": []})
+    w.flush()
+    Clock.now_ = datetime(2030, 1, 2, 0, 0, 1)
+    w.submit({"frame_id": "after-midnight", "detections": []})
+    w.flush()
+    w.stop()
+
+    old, new = tmp_path / "2030-01-01", tmp_path / "2030-01-02"
+    assert [p.parent for p in rotated] == [old]
+    assert not (old / "decision.log.jsonl").exists() and (new / "decision.log.jsonl").exists()
+    GovernanceMaintenance(gov, block_kb=2).compress_pending()
+    assert [p.suffix for p in list_segments(old)] == [".zb"]
+    assert gov.summarize("2030-01-01", "2030-01-01")["total"] == 20
+    assert gov.summarize("2030-01-01", "2030-01-01", verify=True)["invalid"] == 0
@@ -0,0 +1,114 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from services.common.stream import StreamClient, StreamError, decode, encode, serve
+
+
+def _app(credits=4):
+    app = FastAPI()
+
+    async def handler(header, payload):
+        await asyncio.sleep(header.get("delay", 0))
+        if header.get("fail"):
+            raise ValueError("boom")
+        return {"n": len(payload)}, payload[::-1]
+
+    @app.websocket("/s")
+    async def s(websocket: WebSocket):
+        await serve(websocket, handler, credits=credits)
+
+    return app
+
+
+def test_encode_decode_roundtrip():
+    header, payload = decode(encode({"frame_id": 7, "shape": [3, 2]}, b"\x00\x01"))
+    assert header == {"frame_id": 7, "shape": [3, 2]} and payload == b"\x00\x01"
+    with pytest.raises(ValueError):
+        decode(b"\x00\x00\x00\x09{}")
+
+
+def test_serve_grants_credits_and_replies_out_of_order():
+    with TestClient(_app(credits=3)).websocket_connect("/s") as ws:
+        assert decode(ws.receive_bytes())[0] == {"credit": 3}
+        ws.send_bytes(encode({"frame_id": "slow", "delay": 0.2}, b"ab"))
+        ws.send_bytes(encode({"frame_id": "fast"}, b"xyz"))
+        ws.send_bytes(encode({"frame_id": "bad", "fail": True}))
+        replies = [decode(ws.receive_bytes()) for _ in range(3)]
+    assert [h["frame_id"] for h, _ in replies][-1] == "slow"
+    by_id = {h["frame_id"]: (h, p) for h, p in replies}
+    assert by_id["fast"] == ({"n": 3, "frame_id": "fast", "credit": 1}, b"zyx")
+    assert by_id["bad"][0]["error"] == "boom"
+    assert all(h["credit"] == 1 for h, _ in replies)
+
+
+@pytest.fixture()
+def server_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(_app(credits=2), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 5
+    while not server.started and time.time() < deadline:
+        time.sleep(0.02)
+    yield f"ws://127.0.0.1:{port}/s"
+    server.should_exit = True
+
+
+def test_client_pipelines_within_credits(server_url):
+    async def run():
+        client = StreamClient(server_url)
+        futs = [await client.send({"frame_id": i, "delay": 0.05}, bytes([i])) for i in range(2)]
+        assert client.inflight == 2 and client.stats()["credits"] == 0
+        # a third frame has to wait for a reply to hand a credit back
+        t0 = time.perf_counter()
+        third = await client.send({"frame_id": 2}, b"\x02")
+        assert time.perf_counter() - t0 >= 0.03
+        replies = [await f for f in futs + [third]]
+        assert [p for _, p in replies] == [b"\x00", b"\x01", b"\x02"]
+        with pytest.raises(StreamError, match="boom"):
+            await client.request({"frame_id": "x", "fail": True}, timeout=2)
+        stats = client.stats()
+        await client.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["completed"] == 3 and stats["failed"] == 1 and stats["connects"] == 1
+
+
+def test_client_fails_pending_when_connection_drops(server_url):
+    async def run():
+        client = StreamClient(server_url)
+        fut = await client.send({"frame_id": 1, "delay": 5}, b"")
+        await client._ws.close()
+        with pytest.raises(StreamError):
+            await asyncio.wait_for(fut, 2)
+        # the next send reconnects
+        header, _ = await client.request({"frame_id": 2}, b"ok", timeout=2)
+        await client.close()
+        return header, client.connects
+
+    header, connects = asyncio.run(run())
+    assert header["n"] == 2 and connects == 2
+
+
+def test_same_frame_id_from_two_cameras_gets_each_its_own_reply(server_url):
+    async def run():
+        client = StreamClient(server_url)
+        # capture frame ids are per-camera counters, so two cameras send "5" at once
+        a = await client.send({"frame_id": "5", "camera_id": "cam-A", "delay": 0.05}, b"AA")
+        b = await client.send({"frame_id": "5", "camera_id": "cam-B"}, b"BBB")
+        replies = [await a, await b]
+        await client.close()
+        return replies
+
+    (ha, pa), (hb, pb) = asyncio.run(run())
+    assert (ha["n"], pa) == (2, b"AA") and (hb["n"], pb) == (3, b"BBB")
+    assert ha["frame_id"] == hb["frame_id"] == "5" and "seq" not in ha
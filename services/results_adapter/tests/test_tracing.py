@@ -0,0 +1,93 @@
+import time
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace.id_generator import RandomIdGenerator
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+from services.common.tracing import SamplingSettings, Tracing, frame_span, keep
+
+
+def _tracing(**settings):
+    counts, batches = {}, []
+    tracing = Tracing(
+        SamplingSettings(**settings),
+        on_span=lambda d, n: counts.__setitem__(d, counts.get(d, 0) + n),
+        on_export=lambda n, ok, ms: batches.append((n, ok)),
+    )
+    exporter = InMemorySpanExporter()
+    provider = tracing.build(exporter, schedule_delay_millis=10)
+    return tracing, provider, exporter, counts, batches
+
+
+def _request(tracer, name, child=True, carrier=None):
+    ctx = TraceContextTextMapPropagator().extract(carrier) if carrier else None
+    with tracer.start_as_current_span(name, context=ctx) as root:
+        if child:
+            with tracer.start_as_current_span(name + "/infer"):
+                pass
+    return root
+
+
+def test_unsampled_traces_are_kept_for_defects_errors_and_slow_requests():
+    tracing, provider, exporter, counts, batches = _tracing(ratio=0.0, slow_ms=50)
+    tracer = provider.get_tracer("t")
+    _request(tracer, "plain")
+    with tracer.start_as_current_span("defect"):
+        with tracer.start_as_current_span("defect/infer"):
+            keep("defect")
+    with tracer.start_as_current_span("failed") as span:
+        span.set_status(Status(StatusCode.ERROR))
+    with tracer.start_as_current_span("slow"):
+        time.sleep(0.06)
+    provider.force_flush()
+    names = sorted(s.name for s in exporter.get_finished_spans())
+    assert names == ["defect", "defect/infer", "failed", "slow"]
+    assert all(s.context.trace_flags.sampled for s in exporter.get_finished_spans())
+    assert counts == {"dropped": 2, "kept": 4}
+    assert sum(n for n, _ in batches) == 4 and all(ok for _, ok in batches)
+
+
+def test_parent_decision_wins_and_ratio_changes_at_runtime():
+    tracing, provider, exporter, counts, _ = _tracing(ratio=0.0)
+    tracer = provider.get_tracer("t")
+    sampled = {"traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"}
+    _request(tracer, "upstream-sampled", carrier=sampled)
+    assert tracing.settings.update({"trace_ratio": 1, "trace_keep": False}) == {"trace_ratio": 1.0, "trace_keep": False}
+    _request(tracer, "head-sampled")
+    unsampled = {"traceparent": "00-0af7651916cd43dd8448eb211c80319d-b7ad6b7169203331-00"}
+    root = _request(tracer, "upstream-unsampled", carrier=unsampled)
+    assert not root.is_recording() and root.get_span_context().trace_id  # keep off: not even recorded
+    provider.force_flush()
+    names = sorted(s.name for s in exporter.get_finished_spans())
+    assert names == ["head-sampled", "head-sampled/infer", "upstream-sampled", "upstream-sampled/infer"]
+    assert counts == {"sampled": 4}
+
+
+def test_ratio_samples_roughly_that_fraction_of_new_traces():
+    settings = SamplingSettings(ratio=0.25)
+    ids = [RandomIdGenerator().generate_trace_id() for _ in range(4000)]
+    share = sum(settings.head_sampled(i) for i in ids) / len(ids)
+    assert 0.2 < share < 0.3
+    assert SamplingSettings(ratio=0).head_sampled(1) is False and SamplingSettings(ratio=1).head_sampled(2**128 - 1)
+
+
+def test_stream_frames_are_kept_per_frame_not_per_connection():
+    tracing, provider, exporter, counts, _ = _tracing(ratio=0.0)
+    tracer = provider.get_tracer("t")
+    with trace.use_span(tracer.start_span("websocket"), end_on_exit=True) as conn:
+        with frame_span("infer.frame", {"frame_id": "1"}, tracer):
+            keep("defect")
+        with frame_span("infer.frame", {"frame_id": "2"}, tracer):
+            pass
+        upstream = {"frame_id": "3", "traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00"}
+        with frame_span("infer.frame", upstream, tracer) as span:
+            assert format(span.get_span_context().trace_id, "032x") == "0af7651916cd43dd8448eb211c80319c"
+            keep("defect")
+        provider.force_flush()
+        # exported while the connection is still open
+        kept = exporter.get_finished_spans()
+        assert [s.attributes["frame_id"] for s in kept] == ["1", "3"]
+        assert all(s.links[0].context.span_id == conn.get_span_context().span_id for s in kept)
+        assert len({s.context.trace_id for s in kept}) == 2
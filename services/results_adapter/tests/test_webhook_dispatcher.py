@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import httpx
+
+from services.results_adapter.sink_webhook import WebhookDispatcher
+
+
+async def _run(spool):
+    received = []
+    state = {"up": False}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if not state["up"]:
+            return httpx.Response(503)
+        received.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    transport = httpx.MockTransport(handler)
+    d = WebhookDispatcher("http://mes/hook", spool, batch_max=3, window_s=0.05, backoff_base_s=0.01, transport=transport)
+    await d.start()
+    for i in range(5):
+        d.submit({"frame_id": i})
+    await asyncio.sleep(0.2)
+    # endpoint down: both batches (3 + 2) were spooled, nothing lost
+    assert received == [] and d.spool_depth() == 2
+    await d.stop()
+
+    # a fresh dispatcher (restart) replays the spool once the endpoint is back
+    state["up"] = True
+    d2 = WebhookDispatcher("http://mes/hook", spool, batch_max=3, window_s=0.05, backoff_base_s=0.01, transport=transport)
+    await d2.start()
+    for _ in range(50):
+        if d2.spool_depth() == 0:
+            break
+        await asyncio.sleep(0.05)
+    d2.submit({"frame_id": 5})
+    await asyncio.sleep(0.2)
+    await d2.stop()
+    frames = [e["frame_id"] for batch in received for e in batch["events"]]
+    assert sorted(frames) == [0, 1, 2, 3, 4, 5]
+    assert received[0]["count"] == 3 and d2.spool_depth() == 0
+
+
+def test_batches_spool_and_replay(tmp_path):
+    asyncio.run(_run(tmp_path / "spool"))
+
+
+async def _run_spool_errors(spool):
+    errors = []
+    transport = httpx.MockTransport(lambda request: httpx.Response(503))
+    d = WebhookDispatcher("http://mes/hook", spool, batch_max=2, buffer_max=4, window_s=0.02, transport=transport, on_error=errors.append)
+    await d.start()
+    d.spool_dir.rmdir()
+    d.spool_dir.write_text("not a directory")  # every spool write now fails
+    assert all(d.submit({"frame_id": i}) for i in range(4))
+    assert d.submit({"frame_id": 4}) is False and d.rejected_events == 1
+    await asyncio.sleep(0.2)
+    # the flush loop survived the failed spool writes and keeps draining the buffer
+    assert "spool" in errors and d._tasks[0].done() is False
+    assert d.submit({"frame_id": 5})
+    await asyncio.sleep(0.1)
+    assert d._buffer == []
+    tasks = list(d._tasks)
+    await d.stop()
+    # stop() waits for the cancelled loops before closing the client
+    assert all(t.done() for t in tasks) and d._client is None
+
+
+def test_spool_errors_do_not_stop_flushing(tmp_path):
+    asyncio.run(_run_spool_errors(tmp_path / "spool"))
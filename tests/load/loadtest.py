@@ -0,0 +1,393 @@
+"""End-to-end load test: all four services as local processes against plant stand-ins.
+
+Starts inference, preprocess, the results adapter and one capture process per
+camera (uvicorn subprocesses, OTEL off), plus an in-process MQTT broker, OPC
+UA server and webhook receiver. Warms up, then measures for ``--duration``
+seconds from /metrics deltas and /proc samples. The JSON report covers
+throughput, drop rate, p50/p95/p99 per stage, and CPU (cores) and peak RSS
+per service. With ``--baseline`` it exits 1 on a regression beyond the
+baseline's tolerance; ``--write-baseline`` records the run as a new baseline.
+
+    python -m tests.load.loadtest --cameras 2 --fps 10 --duration 30 \\
+        --baseline tests/load/baselines/default.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from tests.load.standins import MqttBrokerStandIn, OpcUaServerStandIn, WebhookReceiverStandIn
+
+ROOT = Path(__file__).resolve().parents[2]
+SERVICES = ROOT / "services"
+
+# stage -> (service, histogram)
+STAGES = {
+    "capture_send": ("capture", "capture_latency_est_ms"),
+    "preprocess": ("preprocess", "preprocess_time_ms"),
+    "inference": ("inference", "model_infer_ms"),
+    "e2e": ("results_adapter", "e2e_latency_ms"),
+    "governance_flush": ("results_adapter", "governance_flush_ms"),
+    "mqtt_ack": ("results_adapter", "mqtt_ack_latency_ms"),
+    "opcua_write": ("results_adapter", "opcua_write_ms"),
+    "webhook_batch": ("results_adapter", "webhook_batch_ms"),
+}
+QUANTILES = (0.5, 0.95, 0.99)
+
+Sample = Dict[str, Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+    out = {}
+    for fam in text_string_to_metric_families(text):
+        for s in fam.samples:
+            out[(s.name, tuple(sorted(s.labels.items())))] = s.value
+    return out
+
+
+def counter(sample, name: str) -> float:
+    return sum(v for (n, _), v in sample.items() if n == name)
+
+
+def histogram_delta(before, after, name: str) -> List[Tuple[float, float]]:
+    """Cumulative (le, count) buckets of ``name`` gained between two scrapes, summed over labels."""
+    buckets: Dict[float, float] = {}
+    for (n, labels), v in after.items():
+        if n != name + "_bucket":
+            continue
+        le = float(dict(labels)["le"])
+        buckets[le] = buckets.get(le, 0.0) + v - before.get((n, labels), 0.0)
+    return sorted(buckets.items())
+
+
+def quantile(buckets: List[Tuple[float, float]], q: float) -> Optional[float]:
+    """Linear interpolation inside the bucket holding the q-th observation (like histogram_quantile)."""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    target = q * buckets[-1][1]
+    prev_le, prev_count = 0.0, 0.0
+    for le, count in buckets:
+        if count >= target:
+            if le == float("inf"):
+                return prev_le
+            if count == prev_count:
+                return le
+            return prev_le + (le - prev_le) * (target - prev_count) / (count - prev_count)
+        prev_le, prev_count = le, count
+    return prev_le
+
+
+class ProcStats:
+    """CPU seconds and peak RSS of one process from /proc (Linux)."""
+
+    TICK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak_rss_mb = 0.0
+
+    def cpu_s(self) -> float:
+        try:
+            fields = Path(f"/proc/{self.pid}/stat").read_text().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.TICK
+        except (OSError, IndexError, ValueError):
+            return 0.0
+
+    def sample_rss(self) -> None:
+        try:
+            for line in Path(f"/proc/{self.pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    self.peak_rss_mb = max(self.peak_rss_mb, int(line.split()[1]) / 1024.0)
+                    return
+        except OSError:
+            pass
+
+
+class Stack:
+    """The four services as uvicorn subprocesses wired to each other and the stand-ins."""
+
+    def __init__(self, args, workdir: Path, mqtt_port: int, opcua_endpoint: str, webhook_url: str):
+        self.args = args
+        self.workdir = workdir
+        self.ports = {"inference": _free_port(), "preprocess": _free_port(), "results_adapter": _free_port()}
+        self.procs: Dict[str, subprocess.Popen] = {}
+        self.urls: Dict[str, str] = {}
+        base = {
+            **os.environ,
+            "PYTHONPATH": str(SERVICES), "PYTHONFAULTHANDLER": "1",
+            "OTEL_ENABLED": "0",
+            "OFFLINE_FORCE": "1",
+            "LINE_ID": "line-1",
+        }
+        stream = args.transport == "stream"
+        adapter = f"127.0.0.1:{self.ports['results_adapter']}"
+        self.env = {
+            "inference": {**base, "INFER_CONFIG_PATH": str(workdir / "inference-config.json")},
+            "preprocess": {
+                **base,
+                "INFERENCE_URL": f"http://127.0.0.1:{self.ports['inference']}/infer",
+                "RESULTS_URL": f"http://{adapter}/result",
+                "INFERENCE_STREAM_URL": f"ws://127.0.0.1:{self.ports['inference']}/infer/stream" if stream else "",
+                "RESULTS_STREAM_URL": f"ws://{adapter}/result/stream" if stream else "",
+            },
+            "results_adapter": {
+                **base,
+                "GOVERNANCE_DIR": str(workdir / "governance"),
+                "FRAME_ARCHIVE_DIR": str(workdir / "frames"),
+                "WEBHOOK_SPOOL_DIR": str(workdir / "webhook-spool"),
+                "MQTT_BROKER": "127.0.0.1",
+                "MQTT_PORT": str(mqtt_port),
+                "OPCUA_ENABLED": "true",
+                "OPCUA_ENDPOINT": opcua_endpoint,
+                "WEBHOOK_URL": webhook_url,
+                # the synthetic defect never clears, so coalescing would leave the sinks idle
+                "COALESCE_ENABLED": "true" if args.coalesce else "false",
+            },
+        }
+        self.capture_env = {
+            **base,
+            "PREPROCESS_URL": f"http://127.0.0.1:{self.ports['preprocess']}/frame",
+            "PREPROCESS_STREAM_URL": f"ws://127.0.0.1:{self.ports['preprocess']}/frame/stream" if stream else "",
+            "PREVIEW_URL": f"http://{adapter}/frame_preview",
+            "CAMERA_URL": args.source,
+            "FRAME_RATE_CAP": str(args.fps),
+            "FRAME_WIDTH": str(args.width),
+            "FRAME_HEIGHT": str(args.height),
+            "CAPTURE_AUTOSTART": "true",
+        }
+
+    def _spawn(self, name: str, service: str, port: int, env: Dict[str, str]) -> None:
+        log = open(self.workdir / f"{name}.log", "wb")
+        self.procs[name] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=SERVICES / service, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        self.urls[name] = f"http://127.0.0.1:{port}"
+
+    def _wait_ready(self, names: List[str], timeout: float = 60.0) -> None:
+        deadline = time.time() + timeout
+        for name in names:
+            while True:
+                if self.procs[name].poll() is not None:
+                    raise RuntimeError(f"{name} exited; see {self.workdir / (name + '.log')}")
+                try:
+                    with urllib.request.urlopen(self.urls[name] + "/healthz", timeout=1) as r:
+                        if r.status == 200:
+                            break
+                except Exception:
+                    pass
+                if time.time() > deadline:
+                    raise RuntimeError(f"{name} not healthy after {timeout}s")
+                time.sleep(0.2)
+
+    def start(self) -> None:
+        for svc in ("inference", "results_adapter", "preprocess"):
+            self._spawn(svc, svc, self.ports[svc], self.env[svc])
+        self._wait_ready(["inference", "results_adapter", "preprocess"])
+        for i in range(self.args.cameras):
+            self._spawn(f"capture-{i}", "capture", _free_port(), {**self.capture_env, "CAMERA_ID": f"cam-{i}"})
+        self._wait_ready([n for n in self.procs if n.startswith("capture-")])
+
+    def scrape(self) -> Sample:
+        out: Sample = {}
+        for name, url in self.urls.items():
+            try:
+                with urllib.request.urlopen(url + "/metrics", timeout=5) as r:
+                    out[name] = parse_metrics(r.read().decode())
+            except Exception:
+                out[name] = {}
+        return out
+
+    def stop(self) -> None:
+        for p in self.procs.values():
+            p.terminate()
+        for p in self.procs.values():
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+def _by_service(sample: Sample, service: str) -> Dict:
+    """Metrics of all processes of one service (captures are summed)."""
+    merged: Dict = {}
+    for name, metrics in sample.items():
+        if name == service or name.startswith(service + "-"):
+            for k, v in metrics.items():
+                merged[k] = merged.get(k, 0.0) + v
+    return merged
+
+
+def build_report(args, before: Sample, after: Sample, duration: float, cpu: Dict[str, float], rss: Dict[str, float], standins: Dict[str, Any]) -> Dict[str, Any]:
+    cap0, cap1 = _by_service(before, "capture"), _by_service(after, "capture")
+    ad0, ad1 = before.get("results_adapter", {}), after.get("results_adapter", {})
+
+    def delta(b, a, name):
+        return counter(a, name) - counter(b, name)
+
+    offered = sum(delta(cap0, cap1, n) for n in ("capture_frames_sent_total", "capture_send_failures_total", "capture_frames_dropped_total"))
+    results = delta(ad0, ad1, "results_received_total")
+    stages = {}
+    for stage, (service, hist) in STAGES.items():
+        b = histogram_delta(_by_service(before, service), _by_service(after, service), hist)
+        if not b or b[-1][1] <= 0:
+            continue
+        stages[stage] = {"count": int(b[-1][1]), **{f"p{int(q * 100)}_ms": round(quantile(b, q), 2) for q in QUANTILES}}
+    services = {}
+    for name in sorted(cpu):
+        svc = "capture" if name.startswith("capture-") else name
+        s = services.setdefault(svc, {"cpu_cores": 0.0, "rss_mb": 0.0, "processes": 0})
+        s["cpu_cores"] = round(s["cpu_cores"] + cpu[name] / duration, 3)
+        s["rss_mb"] = round(s["rss_mb"] + rss[name], 1)
+        s["processes"] += 1
+    return {
+        "profile": {"cameras": args.cameras, "fps": args.fps, "duration_s": args.duration, "source": args.source, "transport": args.transport, "coalesce": args.coalesce, "size": f"{args.width}x{args.height}"},
+        "throughput_fps": round(results / duration, 2),
+        "offered_fps": round(offered / duration, 2),
+        "target_fps": args.cameras * args.fps,
+        "drop_rate": round(max(0.0, 1.0 - results / offered), 4) if offered else None,
+        "stages": stages,
+        "services": services,
+        "sinks": {
+            "mqtt_published": int(delta(ad0, ad1, "mqtt_published_total")),
+            "opcua_writes": stages.get("opcua_write", {}).get("count", 0),
+            "webhook_events": int(delta(ad0, ad1, "webhook_sent_total")),
+            **{f"standin_{k}": v for k, v in standins.items()},
+        },
+    }
+
+
+def _lookup(report: Dict[str, Any], path: str) -> Optional[float]:
+    cur: Any = report
+    for part in path.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return None
+        cur = cur[part]
+    return cur if isinstance(cur, (int, float)) else None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Regressions of ``report`` against ``baseline`` ({"tolerance", "min": {path: v}, "max": {path: v}})."""
+    tol = float(baseline.get("tolerance", 0.2))
+    problems = []
+    for key, want in baseline.get("profile", {}).items():
+        got = report.get("profile", {}).get(key)
+        if got != want:
+            problems.append(f"profile.{key}={got!r} differs from baseline {want!r}; numbers are not comparable")
+    for path, floor in baseline.get("min", {}).items():
+        v = _lookup(report, path)
+        if v is None or v < floor * (1 - tol):
+            problems.append(f"{path}={v} below baseline {floor} (-{tol:.0%})")
+    for path, ceil in baseline.get("max", {}).items():
+        v = _lookup(report, path)
+        if v is None:
+            # a stage that stopped reporting (e.g. MQTT acks stalled) is a regression, not a pass
+            problems.append(f"{path} missing from report (baseline {ceil})")
+        elif v > ceil * (1 + tol) + float(baseline.get("slack", {}).get(path, 0)):
+            problems.append(f"{path}={v} above baseline {ceil} (+{tol:.0%})")
+    return problems
+
+
+def baseline_from(report: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    mx = {"drop_rate": report["drop_rate"] or 0.0}
+    for stage, s in report["stages"].items():
+        mx[f"stages.{stage}.p99_ms"] = s["p99_ms"]
+    for svc, s in report["services"].items():
+        mx[f"services.{svc}.cpu_cores"] = s["cpu_cores"]
+        mx[f"services.{svc}.rss_mb"] = s["rss_mb"]
+    return {
+        "profile": report["profile"],
+        "tolerance": tolerance,
+        # absolute allowance on top of the relative tolerance, for values that are near zero
+        "slack": {"drop_rate": 0.02, **{k: 5.0 for k in mx if k.endswith("_ms")}},
+        "min": {"throughput_fps": report["throughput_fps"]},
+        "max": mx,
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    mqtt = MqttBrokerStandIn()
+    await mqtt.start()
+    opcua = OpcUaServerStandIn(["line-1"])
+    await opcua.start()
+    webhook = WebhookReceiverStandIn()
+    webhook.start()
+    workdir = Path(tempfile.mkdtemp(prefix="edgesight-load-"))
+    stack = Stack(args, workdir, mqtt.port, opcua.endpoint, webhook.url)
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, stack.start)
+        await asyncio.sleep(args.warmup)
+        procs = {name: ProcStats(p.pid) for name, p in stack.procs.items()}
+        before = await loop.run_in_executor(None, stack.scrape)
+        cpu0 = {n: p.cpu_s() for n, p in procs.items()}
+        t0 = time.perf_counter()
+        while time.perf_counter() - t0 < args.duration:
+            for p in procs.values():
+                p.sample_rss()
+            await asyncio.sleep(1.0)
+        after = await loop.run_in_executor(None, stack.scrape)
+        duration = time.perf_counter() - t0
+        cpu = {n: p.cpu_s() - cpu0[n] for n, p in procs.items()}
+        rss = {n: p.peak_rss_mb for n, p in procs.items()}
+        standins = {"mqtt_received": mqtt.published, "webhook_events_received": webhook.events}
+        report = build_report(args, before, after, duration, cpu, rss, standins)
+        report["logs"] = str(workdir)
+        return report
+    finally:
+        await loop.run_in_executor(None, stack.stop)
+        webhook.stop()
+        await opcua.stop()
+        await mqtt.stop()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--cameras", type=int, default=2)
+    ap.add_argument("--fps", type=float, default=10)
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--warmup", type=float, default=5)
+    ap.add_argument("--source", default="synthetic", help='"synthetic" or a replayed clip, e.g. "file:/data/line1.mp4"')
+    ap.add_argument("--width", type=int, default=640)
+    ap.add_argument("--height", type=int, default=360)
+    ap.add_argument("--transport", choices=("http", "stream"), default="http")
+    ap.add_argument("--coalesce", action="store_true", help="keep defect coalescing on (sinks then see one incident, not every frame)")
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    ap.add_argument("--baseline", help="fail (exit 1) on regressions against this baseline JSON")
+    ap.add_argument("--write-baseline", help="record this run as a baseline JSON")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="relative tolerance for --write-baseline")
+    args = ap.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    status = 0
+    if args.baseline:
+        problems = compare(report, json.loads(Path(args.baseline).read_text()))
+        report["regressions"] = problems
+        status = 1 if problems else 0
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    if args.write_baseline:
+        Path(args.write_baseline).write_text(json.dumps(baseline_from(report, args.tolerance), indent=2) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
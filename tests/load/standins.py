@@ -0,0 +1,166 @@
+"""Plant-side stand-ins for load tests: an MQTT broker, an OPC UA server and a webhook receiver.
+
+Each one runs in the harness process and only counts what it receives.
+"""
+import asyncio
+import json
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+class MqttBrokerStandIn:
+    """Just enough MQTT 3.1.1 for a publisher: CONNECT, PUBLISH (QoS 0/1), PING, DISCONNECT.
+
+    SUBSCRIBE is acknowledged but nothing is forwarded.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.published = 0
+        self.bytes = 0
+        self.topics: Dict[str, int] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @staticmethod
+    async def _read_packet(reader: asyncio.StreamReader):
+        first = (await reader.readexactly(1))[0]
+        length, mult = 0, 1
+        while True:
+            b = (await reader.readexactly(1))[0]
+            length += (b & 0x7F) * mult
+            if not b & 0x80:
+                break
+            mult *= 128
+        return first >> 4, first & 0x0F, await reader.readexactly(length)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                ptype, flags, body = await self._read_packet(reader)
+                if ptype == 1:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif ptype == 3:  # PUBLISH
+                    qos = (flags >> 1) & 0x03
+                    (tlen,) = struct.unpack_from(">H", body)
+                    topic = body[2:2 + tlen].decode(errors="replace")
+                    pos = 2 + tlen
+                    if qos:
+                        (mid,) = struct.unpack_from(">H", body, pos)
+                        pos += 2
+                        writer.write(b"\x40\x02" + struct.pack(">H", mid) if qos == 1 else b"\x50\x02" + struct.pack(">H", mid))
+                    self.published += 1
+                    self.bytes += len(body) - pos
+                    self.topics[topic] = self.topics.get(topic, 0) + 1
+                elif ptype == 6:  # PUBREL (QoS 2)
+                    writer.write(b"\x70\x02" + body[:2])
+                elif ptype == 8:  # SUBSCRIBE
+                    n = (len(body) - 2) // 3 or 1
+                    writer.write(bytes([0x90, 2 + n]) + body[:2] + b"\x00" * n)
+                elif ptype == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif ptype == 14:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"published": self.published, "bytes": self.bytes}
+
+
+class OpcUaServerStandIn:
+    """asyncua server exposing the results adapter's default nodes for the given lines."""
+
+    FIELDS = {"Alert": ("", "String"), "Score": (0.0, "Double"), "Class": (0, "Int32"), "FrameId": ("", "String")}
+
+    def __init__(self, lines: List[str], port: int = 0, host: str = "127.0.0.1"):
+        self.lines = lines
+        self.host = host
+        self.port = port
+        self.endpoint = ""
+        self.server = None
+
+    async def start(self) -> None:
+        from asyncua import Server, ua
+        if not self.port:
+            self.port = _free_port()
+        self.endpoint = f"opc.tcp://{self.host}:{self.port}"
+        server = Server()
+        await server.init()
+        server.set_endpoint(self.endpoint)
+        server.set_security_policy([ua.SecurityPolicyType.NoSecurity])
+        idx = await server.register_namespace("urn:edgesight:loadtest")
+        objects = server.nodes.objects
+        for line in self.lines:
+            folder = await objects.add_object(ua.NodeId(f"Factory.Lines.{line}", idx), f"{line}")
+            for field, (default, vtype) in self.FIELDS.items():
+                var = await folder.add_variable(ua.NodeId(f"Factory.Lines.{line}.QA.{field}", idx), field, ua.Variant(default, getattr(ua.VariantType, vtype)))
+                await var.set_writable()
+        await server.start()
+        self.server = server
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            await self.server.stop()
+
+
+class WebhookReceiverStandIn:
+    """HTTP server that accepts webhook batches and counts their events."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.batches = 0
+        self.events = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    doc = json.loads(body or b"null")
+                    n = len(doc.get("events", [])) if isinstance(doc, dict) else (len(doc) if isinstance(doc, list) else 1)
+                except Exception:
+                    n = 1
+                with receiver._lock:
+                    receiver.batches += 1
+                    receiver.events += n
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.port = self._httpd.server_address[1]
+        self.url = f"http://{host}:{self.port}/hook"
+
+    def start(self) -> None:
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self.batches, "events": self.events}
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import struct
+
+import pytest
+
+from tests.load.loadtest import baseline_from, compare, histogram_delta, main, parse_metrics, quantile
+from tests.load.standins import MqttBrokerStandIn
+
+METRICS = """\
+# TYPE stage_ms histogram
+stage_ms_bucket{le="5.0",svc="a"} %d
+stage_ms_bucket{le="10.0",svc="a"} %d
+stage_ms_bucket{le="+Inf",svc="a"} %d
+stage_ms_count{svc="a"} %d
+stage_ms_sum{svc="a"} 0
+"""
+
+
+def test_quantiles_from_histogram_deltas():
+    before = parse_metrics(METRICS % (10, 10, 10, 10))
+    after = parse_metrics(METRICS % (60, 110, 110, 110))
+    buckets = histogram_delta(before, after, "stage_ms")
+    assert buckets == [(5.0, 50.0), (10.0, 100.0), (float("inf"), 100.0)]
+    assert quantile(buckets, 0.5) == 5.0
+    assert quantile(buckets, 0.75) == 7.5
+    assert quantile(buckets, 0.99) == pytest.approx(9.9)
+    assert quantile([], 0.5) is None
+
+
+def _report(fps=20.0, p99=30.0, rss=100.0):
+    return {
+        "profile": {"cameras": 2, "fps": 10.0},
+        "throughput_fps": fps,
+        "drop_rate": 0.0,
+        "stages": {"e2e": {"count": 100, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": p99}},
+        "services": {"inference": {"cpu_cores": 0.5, "rss_mb": rss, "processes": 1}},
+    }
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = baseline_from(_report(), tolerance=0.25)
+    assert compare(_report(fps=16.0, p99=40.0, rss=120.0), baseline) == []
+    problems = compare(_report(fps=14.0, p99=45.0, rss=130.0), baseline)
+    assert [p.split("=")[0] for p in problems] == ["throughput_fps", "stages.e2e.p99_ms", "services.inference.rss_mb"]
+    silent = _report()
+    silent["stages"]["e2e"]["p99_ms"] = None  # no observations in the window
+    del silent["services"]["inference"]
+    assert [p.split(" ")[0] for p in compare(silent, baseline)] == [
+        "stages.e2e.p99_ms", "services.inference.cpu_cores", "services.inference.rss_mb"]
+    other = _report()
+    other["profile"]["cameras"] = 4
+    assert compare(other, baseline)[0].startswith("profile.cameras=4")
+
+
+def test_mqtt_standin_acks_qos1_publish():
+    async def run():
+        broker = MqttBrokerStandIn()
+        await broker.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", broker.port)
+        connect = b"\x00\x04MQTT\x04\x02\x00\x1e\x00\x01c"
+        writer.write(bytes([0x10, len(connect)]) + connect)
+        assert await reader.readexactly(4) == b"\x20\x02\x00\x00"
+        body = b"\x00\x03a/b" + struct.pack(">H", 7) + b"hello"
+        writer.write(bytes([0x32, len(body)]) + body)
+        await writer.drain()
+        assert await reader.readexactly(4) == b"\x40\x02\x00\x07"
+        writer.close()
+        await broker.stop()
+        return broker
+
+    broker = asyncio.run(run())
+    assert broker.stats() == {"published": 1, "bytes": 5} and broker.topics == {"a/b": 1}
+
+
+@pytest.mark.skipif(os.getenv("EDGESIGHT_LOAD") != "1", reason="set EDGESIGHT_LOAD=1 to run the full load test")
+def test_full_stack_against_committed_baseline(tmp_path):
+    baseline = os.path.join(os.path.dirname(__file__), "baselines", "default.json")
+    assert main(["--duration", "30", "--out", str(tmp_path / "report.json"), "--baseline", baseline]) == 0
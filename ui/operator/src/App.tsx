@@ -29,7 +29,8 @@ export default function App() {
   const evtSourceRef = useRef<EventSource | null>(null)
   const canvasRef = useRef<HTMLCanvasElement | null>(null)
   const animCanvasRef = useRef<HTMLCanvasElement | null>(null)
-  const [frameUrl, setFrameUrl] = useState<string>('')
+  // MJPEG push stream; the browser renders it directly in the <img>
+  const [frameUrl] = useState<string>(`${apiBase}/preview/stream?fps=10`)
   const [classFilter, setClassFilter] = useState<string>('')
   const [legend, setLegend] = useState<Record<string, string>>({})
   const [avgPreMs, setAvgPreMs] = useState<number>(0)
@@ -282,8 +283,6 @@ export default function App() {
       if (typeof cfg?.offline_force === 'boolean') { setOffline(cfg.offline_force); offlineRef.current = cfg.offline_force }
     }).catch(()=>{})
     const id = setInterval(() => {
-      setFrameUrl(`${apiBase}/last_frame?nocache=${Date.now()}`)
-
       if (offlineRef.current) {
         // Synthesize telemetry when offline
         setAdapterUp(true)